@@ -2,8 +2,10 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 import os
+from app.replicas import RoutingSession
 
-db = SQLAlchemy()
+# Reads can be routed to replicas (see app/replicas.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 login_manager = LoginManager()
 
 def create_app(config_name='config'):
@@ -17,6 +19,20 @@ def create_app(config_name='config'):
     login_manager.login_view = 'auth.login'
     login_manager.login_message = 'Please log in to access this page.'
     
+    from app import database, instrumentation, metrics, profiling, jobs, identity, replicas, templating
+    # SQLite pragmas (WAL, busy timeout) on every new connection
+    database.init_app(app)
+    replicas.init_app(app)
+    # Request/SQL timings, /metrics and opt-in ?__profile=1
+    instrumentation.init_app(app)
+    metrics.init_app(app)
+    profiling.init_app(app)
+    jobs.init_app(app)
+    # Loads current_user from a cache of user identities
+    identity.init_app(app)
+    # Templates compiled at build time, if any
+    templating.init_app(app)
+    
     # Create upload folder if it doesn't exist
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     
@@ -35,9 +51,4 @@ def create_app(config_name='config'):
         from flask import render_template
         return render_template('index.html')
     
-    # Load user for login manager
-    @login_manager.user_loader
-    def load_user(user_id):
-        from app.models import User
-        return User.query.get(int(user_id))
     return app
@@ -0,0 +1,303 @@
+"""
+Batch import of lecture notes.
+
+Used by the lecturer batch upload endpoint and by `import_notes.py`. Files
+are staged, hashed and, with Supabase, uploaded by a bounded pool of
+BULK_IMPORT_WORKERS threads. The resulting notes are then inserted and
+indexed in a single transaction. Every file gets its own result, so one bad
+file doesn't fail the rest of the batch.
+
+    items = [ImportItem('week1.pdf', 'Intro to Python', 'CSC101', lambda: open(path, 'rb'))]
+    for result in import_notes(items, uploader_id=lecturer.id):
+        print(result.filename, result.note_id or result.error)
+
+A batch can also come as a zip archive (`items_from_zip`) with an optional
+CSV manifest of `filename,course_code,course_title` rows (`read_manifest`)
+giving each file its own course.
+
+Bulk deletes (`delete_notes`) remove every note matching a filter with
+set-based statements and queue the stored files for removal in large
+batches (see app/storage.py), so cleaning up a semester costs a handful of
+statements and storage calls instead of one of each per note.
+"""
+
+import csv
+import io
+import os
+from datetime import datetime, time, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from werkzeug.utils import secure_filename
+from app import db
+from app.models import Note, Blob
+from app.search import index_notes, unindex_notes
+from app.storage import validate_upload, stage_stream, acquire_blob, upload_blob_now, release_note_files, IN_CLAUSE_SIZE
+from app.http_cache import bump_notes_version
+from app.catalog import record_notes_added, record_notes_removed
+from app.download_stats import forget_notes
+from app.jobs import enqueue, notify
+
+
+class ImportItem:
+    """
+    One file to import; `open_stream` returns a readable binary stream.
+    `size` is the declared size, if known before reading (zip entries).
+    """
+
+    def __init__(self, filename, course_title, course_code, open_stream, size=None):
+        self.filename = filename
+        self.course_title = course_title
+        self.course_code = course_code
+        self.open_stream = open_stream
+        self.size = size
+
+
+class ImportResult:
+    """Outcome of importing one file"""
+
+    def __init__(self, filename, note_id=None, error=None, duplicate=False):
+        self.filename = filename
+        self.note_id = note_id
+        self.error = error
+        self.duplicate = duplicate  # Content was already stored; only a reference was added
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def to_dict(self):
+        return {
+            'filename': self.filename,
+            'ok': self.ok,
+            'note_id': self.note_id,
+            'error': self.error,
+            'duplicate': self.duplicate,
+        }
+
+
+def read_manifest(text):
+    """Parse a CSV manifest into {filename: (course_title, course_code)}"""
+    manifest = {}
+    for row in csv.DictReader(io.StringIO(text)):
+        filename = secure_filename(os.path.basename((row.get('filename') or '').strip()))
+        if filename:
+            manifest[filename] = ((row.get('course_title') or '').strip(), (row.get('course_code') or '').strip())
+    return manifest
+
+
+def make_item(name, open_stream, course_title='', course_code='', manifest=None, size=None):
+    """An ImportItem for a file name, taking its course from the manifest if listed there"""
+    filename = secure_filename(os.path.basename(name))
+    if manifest and filename in manifest:
+        course_title, course_code = manifest[filename]
+    return ImportItem(filename, course_title, course_code, open_stream, size)
+
+
+def items_from_zip(archive, course_title='', course_code='', manifest=None):
+    """ImportItems for the files in a zipfile.ZipFile, skipping directories and hidden files"""
+    items = []
+    for info in archive.infolist():
+        basename = os.path.basename(info.filename)
+        if info.is_dir() or not basename or basename.startswith('.') or '__MACOSX' in info.filename:
+            continue
+        items.append(make_item(
+            basename,
+            lambda info=info: archive.open(info),
+            course_title,
+            course_code,
+            manifest,
+            # Reading an entry stops at its declared size
+            size=info.file_size
+        ))
+    return items
+
+
+def check_batch_limits(items):
+    """
+    Error message if a batch has more than BULK_IMPORT_MAX_FILES files or its
+    declared sizes add up to more than BULK_IMPORT_MAX_SIZE, else None.
+    Check before staging anything: a small zip can expand to many large files.
+    """
+    config = current_app.config
+    if len(items) > config['BULK_IMPORT_MAX_FILES']:
+        return f"Too many files (at most {config['BULK_IMPORT_MAX_FILES']} per batch)."
+    if sum(item.size or 0 for item in items) > config['BULK_IMPORT_MAX_SIZE']:
+        return 'Files are too large in total.'
+    return None
+
+
+def import_notes(items, uploader_id, workers=None):
+    """
+    Import many files as notes of one lecturer.
+
+    Returns:
+        A list of ImportResult, in the order of `items`
+    """
+    app = current_app._get_current_object()
+    workers = workers or app.config['BULK_IMPORT_WORKERS']
+    max_size = app.config['MAX_UPLOAD_SIZE']
+    results = [ImportResult(item.filename) for item in items]
+
+    def stage(index):
+        with app.app_context():
+            with items[index].open_stream() as stream:
+                return stage_stream(stream, max_size=max_size)
+
+    def upload(index):
+        with app.app_context():
+            path, digest, _ = staged[index]
+            return upload_blob_now(path, digest)
+
+    def run_all(pool, fn, indexes):
+        """Run fn over indexes in the pool; returns {index: value} and records failures"""
+        futures = {index: pool.submit(fn, index) for index in indexes}
+        values = {}
+        for index, future in futures.items():
+            try:
+                values[index] = future.result()
+            except Exception as e:
+                results[index].error = str(e)
+        return values
+
+    for index, item in enumerate(items):
+        results[index].error = validate_upload(item.course_title, item.course_code, item.filename)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        staged = run_all(pool, stage, [i for i, result in enumerate(results) if result.ok])
+
+        # Upload each distinct new file once; later copies just reference it
+        digests = {digest for _, digest, _ in staged.values()}
+        known = set(db.session.scalars(db.select(Blob.digest).where(Blob.digest.in_(digests)))) if digests else set()
+        first_of = {}
+        for index, (_, digest, _) in staged.items():
+            if digest not in known:
+                first_of.setdefault(digest, index)
+        uploaded = run_all(pool, upload, list(first_of.values()))
+
+    stored_paths = {staged[index][1]: path for index, path in uploaded.items()}
+    for index, (path, digest, _) in list(staged.items()):
+        first = first_of.get(digest)
+        if first is not None and first not in uploaded:
+            results[index].error = results[first].error
+        if not results[index].ok:
+            os.remove(path)
+            del staged[index]
+
+    # One transaction for every note in the batch
+    notes = {}
+    # Files stored for new blobs, which a failed transaction would orphan
+    new_files = dict(stored_paths)
+    try:
+        for index, (path, digest, size) in staged.items():
+            item = items[index]
+            blob = acquire_blob(path, digest, size, stored_paths.get(digest))
+            if first_of.get(digest) == index:
+                new_files[digest] = blob.file_path
+            notes[index] = Note(
+                course_title=item.course_title,
+                course_code=item.course_code,
+                filename=item.filename,
+                file_path=blob.file_path,
+                blob_digest=digest,
+                file_size=size,
+                uploaded_by=uploader_id
+            )
+            results[index].duplicate = digest in known or first_of.get(digest) != index
+        db.session.add_all(notes.values())
+        db.session.flush()
+        index_notes(list(notes.values()))
+        record_notes_added(notes.values())
+        bump_notes_version()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        for index in staged:
+            results[index].error = f'Failed to save note: {str(e)}'
+            if os.path.exists(staged[index][0]):
+                os.remove(staged[index][0])
+        discard_files(new_files)
+        return results
+
+    for index, note in notes.items():
+        results[index].note_id = note.id
+    notify()
+    return results
+
+
+def discard_files(files):
+    """
+    Queue the removal of files stored for blobs that were never committed;
+    `files` maps digests to file paths. The delete job keeps any file whose
+    blob another request has committed in the meantime.
+    """
+    if not files:
+        return
+    try:
+        for digest, file_path in files.items():
+            enqueue('storage.delete', file_path=file_path, digest=digest)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error('Could not queue removal of %d orphaned file(s): %s', len(files), e)
+        return
+    notify()
+
+
+def filter_notes(course_code=None, since=None, until=None, uploader_id=None):
+    """
+    Query for the notes matching every given filter.
+    `since` and `until` are inclusive; plain dates cover the whole day.
+    """
+    query = Note.query
+    if course_code:
+        query = query.filter(Note.course_code == course_code)
+    if since:
+        if not isinstance(since, datetime):
+            since = datetime.combine(since, time.min)
+        query = query.filter(Note.upload_date >= since)
+    if until:
+        if not isinstance(until, datetime):
+            until = datetime.combine(until + timedelta(days=1), time.min)
+            query = query.filter(Note.upload_date < until)
+        else:
+            query = query.filter(Note.upload_date <= until)
+    if uploader_id is not None:
+        query = query.filter(Note.uploaded_by == uploader_id)
+    return query
+
+
+def delete_notes(query):
+    """
+    Delete every note matched by a query in one transaction.
+    Their stored files are removed by background jobs once no other note
+    shares them; failed removals are retried, so no file is left behind.
+
+    Returns:
+        A (notes_deleted, files_queued, job_ids) tuple; job_ids are the
+        storage.delete_batch jobs removing the files
+    """
+    rows = db.session.execute(
+        query.with_entities(Note.id, Note.course_code, Note.file_path, Note.file_size, Note.blob_digest)
+        .order_by(None).statement
+    ).all()
+    if not rows:
+        return 0, 0, []
+
+    note_ids = [row.id for row in rows]
+    try:
+        unindex_notes(note_ids)
+        forget_notes(note_ids)
+        for i in range(0, len(note_ids), IN_CLAUSE_SIZE):
+            Note.query.filter(Note.id.in_(note_ids[i:i + IN_CLAUSE_SIZE])).delete(synchronize_session=False)
+        files_queued, job_ids = release_note_files([(row.file_path, row.blob_digest) for row in rows])
+        record_notes_removed(rows)
+        bump_notes_version()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    # Deleted rows may still sit in the identity map
+    db.session.expire_all()
+    notify()
+    return len(rows), files_queued, job_ids
@@ -0,0 +1,174 @@
+"""
+Course catalog: per-course aggregates of the notes table.
+
+Each row of `courses` holds a course code's latest title, note count, total
+file size and latest upload date. The counts are adjusted with SQL
+increments in the same transaction as every note insert or delete, so
+browsing by course reads one small table instead of scanning notes:
+
+    note = Note(...)
+    db.session.add(note)
+    db.session.flush()
+    record_notes_added([note])
+    db.session.commit()
+
+`check_catalog()` recomputes the aggregates from the notes table and
+reports (and optionally repairs) any drift.
+"""
+
+import collections
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import Course, Note
+
+FIELDS = ('course_title', 'note_count', 'total_bytes', 'latest_upload')
+
+
+def record_notes_added(notes):
+    """Add flushed notes to their courses' aggregates (runs in the caller's transaction)"""
+    added = collections.defaultdict(list)
+    for note in notes:
+        added[note.course_code].append(note)
+
+    for course_code, course_notes in added.items():
+        latest = max(course_notes, key=lambda note: (note.upload_date, note.id))
+        _add_to_course(
+            course_code,
+            latest.course_title,
+            len(course_notes),
+            sum(note.file_size or 0 for note in course_notes),
+            latest.upload_date
+        )
+
+
+def _add_to_course(course_code, course_title, count, size, upload_date):
+    # Concurrent uploads to one course serialize on this row instead of losing counts
+    newer = db.or_(Course.latest_upload.is_(None), Course.latest_upload <= upload_date)
+    updated = db.session.execute(
+        db.update(Course)
+        .where(Course.course_code == course_code)
+        .values(
+            note_count=Course.note_count + count,
+            total_bytes=Course.total_bytes + size,
+            course_title=db.case((newer, course_title), else_=Course.course_title),
+            latest_upload=db.case((newer, upload_date), else_=Course.latest_upload)
+        )
+    ).rowcount
+    if updated:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(Course(
+                course_code=course_code,
+                course_title=course_title,
+                note_count=count,
+                total_bytes=size,
+                latest_upload=upload_date
+            ))
+    except IntegrityError:
+        # Created concurrently by another upload
+        _add_to_course(course_code, course_title, count, size, upload_date)
+
+
+def record_notes_removed(rows):
+    """
+    Take deleted notes out of their courses' aggregates (runs in the caller's
+    transaction, after the notes' delete has been flushed).
+    `rows` have course_code and file_size, e.g. the deleted Note objects.
+    """
+    removed = collections.defaultdict(lambda: [0, 0])
+    for row in rows:
+        removed[row.course_code][0] += 1
+        removed[row.course_code][1] += row.file_size or 0
+
+    for course_code, (count, size) in removed.items():
+        db.session.execute(
+            db.update(Course)
+            .where(Course.course_code == course_code)
+            .values(note_count=Course.note_count - count, total_bytes=Course.total_bytes - size)
+        )
+        # The latest note may have gone; the newest remaining one is one index seek away
+        latest = latest_note(course_code)
+        if latest is None:
+            db.session.execute(db.delete(Course).where(Course.course_code == course_code))
+        else:
+            db.session.execute(
+                db.update(Course)
+                .where(Course.course_code == course_code)
+                .values(course_title=latest.course_title, latest_upload=latest.upload_date)
+            )
+
+
+def latest_note(course_code):
+    """The (course_title, upload_date) of a course's newest note, or None"""
+    return db.session.execute(
+        db.select(Note.course_title, Note.upload_date)
+        .where(Note.course_code == course_code)
+        .order_by(Note.upload_date.desc(), Note.id.desc())
+        .limit(1)
+    ).first()
+
+
+def compute_catalog():
+    """Aggregates computed from the notes table, as {course_code: {field: value}}"""
+    totals = db.session.execute(
+        db.select(
+            Note.course_code,
+            db.func.count(Note.id),
+            db.func.coalesce(db.func.sum(Note.file_size), 0),
+            db.func.max(Note.upload_date)
+        ).group_by(Note.course_code)
+    ).all()
+    catalog = {}
+    for course_code, count, size, latest_upload in totals:
+        catalog[course_code] = {
+            'course_title': latest_note(course_code).course_title,
+            'note_count': count,
+            'total_bytes': int(size),
+            'latest_upload': latest_upload,
+        }
+    return catalog
+
+
+def check_catalog(repair=False):
+    """
+    Compare the courses table with aggregates recomputed from the notes.
+
+    Args:
+        repair: Rewrite mismatched, missing and stale rows (and commit)
+
+    Returns:
+        A list of (course_code, field, stored, actual) differences; field is
+        None for a course missing from one side
+    """
+    actual = compute_catalog()
+    stored = {course.course_code: course for course in Course.query.all()}
+    differences = []
+
+    for course_code, values in actual.items():
+        course = stored.get(course_code)
+        if course is None:
+            differences.append((course_code, None, None, values))
+            if repair:
+                db.session.add(Course(course_code=course_code, **values))
+            continue
+        for field in FIELDS:
+            if getattr(course, field) != values[field]:
+                differences.append((course_code, field, getattr(course, field), values[field]))
+                if repair:
+                    setattr(course, field, values[field])
+
+    for course_code, course in stored.items():
+        if course_code not in actual:
+            differences.append((course_code, None, course, None))
+            if repair:
+                db.session.delete(course)
+
+    if repair:
+        db.session.commit()
+    return differences
+
+
+def rebuild_catalog():
+    """Recompute every course aggregate from the notes table"""
+    return check_catalog(repair=True)
@@ -0,0 +1,54 @@
+"""
+Per-connection database setup.
+
+The connection pool itself is sized from SQLALCHEMY_ENGINE_OPTIONS (see
+ENGINE_PROFILES in config.py). SQLite also needs a few pragmas on every new
+connection, because they are per-connection settings or, for the journal
+mode, must be switched on once for the file:
+
+- journal_mode=WAL: readers keep reading while a writer commits, instead of
+  failing with "database is locked".
+- busy_timeout: a writer waits for the write lock instead of failing at once.
+- synchronous=NORMAL: safe with WAL and avoids an fsync on every commit.
+"""
+
+from sqlalchemy import event
+from app import db
+
+
+def _set_sqlite_pragmas(app):
+    journal_mode = app.config.get('SQLITE_JOURNAL_MODE')
+    synchronous = app.config.get('SQLITE_SYNCHRONOUS')
+    busy_timeout = app.config.get('SQLITE_BUSY_TIMEOUT')
+
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            if busy_timeout is not None:
+                cursor.execute(f'PRAGMA busy_timeout = {int(busy_timeout)}')
+            if journal_mode:
+                cursor.execute(f'PRAGMA journal_mode = {journal_mode}')
+            if synchronous:
+                cursor.execute(f'PRAGMA synchronous = {synchronous}')
+        finally:
+            cursor.close()
+
+    return on_connect
+
+
+def pool_status(engine=None):
+    """Checked-out and idle connections of an engine's pool, for diagnostics"""
+    pool = (engine or db.engine).pool
+    status = {'class': type(pool).__name__}
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        if hasattr(pool, name):
+            status[name] = getattr(pool, name)()
+    return status
+
+
+def init_app(app):
+    """Install the SQLite pragmas on every SQLite engine of the app"""
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite' and engine.url.database not in (None, '', ':memory:'):
+                event.listen(engine, 'connect', _set_sqlite_pragmas(app))
@@ -0,0 +1,289 @@
+"""
+Per-note download counts and the "popular this week" ranking.
+
+Counting a download with an UPDATE in the download request would make the
+most popular notes' rows a write hot spot. Instead each process adds
+downloads up in memory, per note and day:
+
+    record_download(note.id)
+
+Every DOWNLOAD_STATS_FLUSH_INTERVAL seconds (sooner once
+DOWNLOAD_STATS_MAX_PENDING notes are waiting, and at exit) the buffered
+counts are added to the `note_download_stats` table with one batched
+upsert. A background thread flushes; with JOB_WORKERS = 0 (serverless) the
+download request that finds a flush due runs it instead.
+
+After a flush, at most every POPULAR_NOTES_REFRESH seconds, the
+POPULAR_NOTES_COUNT most downloaded notes of the last POPULAR_NOTES_DAYS
+days are written to `popular_notes`, so the student dashboard reads a
+finished ranking instead of aggregating on every request.
+
+Counts not yet flushed are lost if the process is killed, and appear with
+up to one flush interval of delay.
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.http_cache import bump_version
+from app.models import Note, NoteDownloadStat, PopularNote
+from app.storage import IN_CLAUSE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Version counter for conditional pages, bumped when the ranking changes
+POPULAR_VERSION = 'popular'
+
+_counter_lock = threading.Lock()
+
+
+def downloads_version(uploader_id):
+    """Version counter bumped when download counts of an uploader's notes are written"""
+    return f'downloads:{uploader_id}'
+
+
+class DownloadCounter:
+    """Download counts of one application and process, buffered until the next flush"""
+
+    def __init__(self, app):
+        self.app = app
+        self.pid = os.getpid()
+        self.pending = {}  # (note_id, day) -> downloads
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.last_flush = time.monotonic()
+        self.last_ranking = None
+        self.stopping = threading.Event()
+        self.thread = None
+        self.stats = {'recorded': 0, 'flushed': 0, 'flushes': 0, 'flush_errors': 0}
+
+    def start(self):
+        if self.app.config['JOB_WORKERS'] > 0 and self.app.config['DOWNLOAD_STATS_FLUSH_INTERVAL'] > 0:
+            self.thread = threading.Thread(target=self._run, name='download-stats-flusher', daemon=True)
+            self.thread.start()
+        # Write what is still buffered on a clean shutdown
+        atexit.register(self.stop)
+
+    def stop(self, timeout=5):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+        self.flush()
+
+    def _run(self):
+        while not self.stopping.wait(self.app.config['DOWNLOAD_STATS_FLUSH_INTERVAL']):
+            self.flush()
+
+    def record(self, note_id, count=1):
+        """Add downloads to the buffer; returns whether a flush is due"""
+        key = (note_id, datetime.utcnow().date())
+        with self.lock:
+            self.pending[key] = self.pending.get(key, 0) + count
+            self.stats['recorded'] += count
+            pending = len(self.pending)
+        return (pending >= self.app.config['DOWNLOAD_STATS_MAX_PENDING']
+                or time.monotonic() - self.last_flush >= self.app.config['DOWNLOAD_STATS_FLUSH_INTERVAL'])
+
+    def flush(self):
+        """Write the buffered counts (and refresh the ranking when due); returns the downloads written"""
+        with self.flush_lock:
+            with self.lock:
+                pending, self.pending = self.pending, {}
+            self.last_flush = time.monotonic()
+
+            with self.app.app_context():
+                written = 0
+                if pending:
+                    try:
+                        written = write_counts(pending)
+                        db.session.commit()
+                    except Exception:
+                        db.session.rollback()
+                        logger.exception('Failed to write %s download counts', len(pending))
+                        self._restore(pending)
+                        return 0
+                    self._record(flushed=written, flushes=1)
+
+                refresh_every = self.app.config['POPULAR_NOTES_REFRESH']
+                if self.last_ranking is None or time.monotonic() - self.last_ranking >= refresh_every:
+                    try:
+                        refresh_popular_notes()
+                        self.last_ranking = time.monotonic()
+                    except Exception:
+                        db.session.rollback()
+                        logger.exception('Failed to refresh popular notes')
+                db.session.remove()
+            return written
+
+    def _restore(self, pending):
+        """Put counts back after a failed flush, so the next one retries them"""
+        with self.lock:
+            for key, count in pending.items():
+                self.pending[key] = self.pending.get(key, 0) + count
+            self.stats['flush_errors'] += 1
+
+    def _record(self, **increments):
+        with self.lock:
+            for key, value in increments.items():
+                self.stats[key] += value
+
+
+def _get_counter(app):
+    """The download counter for this app and process, started on first use"""
+    counter = app.extensions.get('download_counter')
+    if counter is not None and counter.pid == os.getpid():
+        return counter
+
+    # First use, or we are a forked child whose parent's flusher didn't survive
+    with _counter_lock:
+        counter = app.extensions.get('download_counter')
+        if counter is None or counter.pid != os.getpid():
+            counter = DownloadCounter(app)
+            app.extensions['download_counter'] = counter
+            counter.start()
+    return counter
+
+
+def record_download(note_id):
+    """Count a download of a note (buffered; see the module docstring)"""
+    app = current_app._get_current_object()
+    if not app.config['DOWNLOAD_STATS_ENABLED']:
+        return
+    counter = _get_counter(app)
+    if counter.record(note_id) and counter.thread is None:
+        # No background thread: the request that finds a flush due writes the batch
+        counter.flush()
+
+
+def flush_download_stats():
+    """Write this process's buffered counts now (e.g. from scripts and benchmarks)"""
+    return _get_counter(current_app._get_current_object()).flush()
+
+
+def get_download_stats():
+    """This process's counters: downloads recorded, written, flushes and failed flushes"""
+    counter = current_app.extensions.get('download_counter')
+    if counter is None:
+        return {'recorded': 0, 'flushed': 0, 'flushes': 0, 'flush_errors': 0, 'pending': 0}
+    with counter.lock:
+        return dict(counter.stats, pending=sum(counter.pending.values()))
+
+
+def _upsert_statement():
+    """INSERT that adds to an existing (note_id, day) row instead of failing"""
+    table = NoteDownloadStat.__table__
+    dialect = db.engine.dialect.name
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        statement = insert(table)
+        return statement.on_duplicate_key_update(downloads=table.c.downloads + statement.inserted.downloads)
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    statement = insert(table)
+    return statement.on_conflict_do_update(
+        index_elements=['note_id', 'day'],
+        set_={'downloads': table.c.downloads + statement.excluded.downloads}
+    )
+
+
+def write_counts(counts):
+    """
+    Add {(note_id, day): downloads} to the stats table in one batched upsert
+    (in the caller's transaction). Counts for notes deleted meanwhile are dropped.
+
+    Returns:
+        The number of downloads written
+    """
+    note_ids = sorted({note_id for note_id, _ in counts})
+    uploaders = {}  # note_id -> uploaded_by, for the notes that still exist
+    for i in range(0, len(note_ids), IN_CLAUSE_SIZE):
+        uploaders.update(db.session.execute(
+            db.select(Note.id, Note.uploaded_by).where(Note.id.in_(note_ids[i:i + IN_CLAUSE_SIZE]))
+        ).all())
+
+    rows = [
+        {'note_id': note_id, 'day': day, 'downloads': count}
+        for (note_id, day), count in sorted(counts.items()) if note_id in uploaders
+    ]
+    if rows:
+        db.session.execute(_upsert_statement(), rows)
+        # Only the dashboards of lecturers whose notes were downloaded change
+        for uploader_id in sorted({uploaders[row['note_id']] for row in rows}):
+            bump_version(downloads_version(uploader_id))
+    return sum(row['downloads'] for row in rows)
+
+
+def refresh_popular_notes():
+    """
+    Recompute the ranking of the most downloaded notes of the last
+    POPULAR_NOTES_DAYS days. Returns whether it changed.
+    """
+    config = current_app.config
+    since = datetime.utcnow().date() - timedelta(days=config['POPULAR_NOTES_DAYS'] - 1)
+    downloads = db.func.sum(NoteDownloadStat.downloads).label('downloads')
+    ranking = db.session.execute(
+        db.select(NoteDownloadStat.note_id, downloads)
+        .where(NoteDownloadStat.day >= since)
+        .group_by(NoteDownloadStat.note_id)
+        .order_by(downloads.desc(), NoteDownloadStat.note_id.desc())
+        .limit(config['POPULAR_NOTES_COUNT'])
+    ).all()
+    current = db.session.execute(
+        db.select(PopularNote.note_id, PopularNote.downloads).order_by(PopularNote.rank)
+    ).all()
+    if [tuple(row) for row in ranking] == [tuple(row) for row in current]:
+        db.session.rollback()
+        return False
+
+    now = datetime.utcnow()
+    try:
+        db.session.execute(db.delete(PopularNote))
+        db.session.add_all([
+            PopularNote(rank=rank, note_id=note_id, downloads=count, computed_at=now)
+            for rank, (note_id, count) in enumerate(ranking, start=1)
+        ])
+        # Dashboards showing the ranking are revalidated
+        bump_version(POPULAR_VERSION)
+        db.session.commit()
+    except IntegrityError:
+        # Another process refreshed it at the same time
+        db.session.rollback()
+        return False
+    return True
+
+
+def get_popular_notes():
+    """The precomputed ranking, most downloaded first"""
+    return (
+        PopularNote.query
+        .options(db.joinedload(PopularNote.note).joinedload(Note.uploader))
+        .order_by(PopularNote.rank)
+        .all()
+    )
+
+
+def get_download_counts(note_ids):
+    """All-time downloads written so far for the given notes, as {note_id: downloads}"""
+    if not note_ids:
+        return {}
+    return dict(db.session.execute(
+        db.select(NoteDownloadStat.note_id, db.func.sum(NoteDownloadStat.downloads))
+        .where(NoteDownloadStat.note_id.in_(note_ids))
+        .group_by(NoteDownloadStat.note_id)
+    ).all())
+
+
+def forget_notes(note_ids):
+    """Remove deleted notes' statistics and ranking entries (in the caller's transaction)"""
+    for i in range(0, len(note_ids), IN_CLAUSE_SIZE):
+        batch = note_ids[i:i + IN_CLAUSE_SIZE]
+        db.session.execute(db.delete(PopularNote).where(PopularNote.note_id.in_(batch)))
+        db.session.execute(db.delete(NoteDownloadStat).where(NoteDownloadStat.note_id.in_(batch)))
@@ -0,0 +1,58 @@
+"""
+Local file downloads handed to the front proxy.
+
+By default a local download is sent with send_file: the open file goes to
+the WSGI server's `wsgi.file_wrapper`, which servers such as gunicorn send
+with os.sendfile (zero-copy), and other servers read and write in chunks.
+Either way a worker is busy until the last byte is out.
+
+With FILE_OFFLOAD set, Flask only authorizes the download and answers with
+an empty response naming the file, and the proxy serves the bytes (range
+requests included):
+
+- 'accel' (nginx): `X-Accel-Redirect: FILE_OFFLOAD_PREFIX<path in UPLOAD_FOLDER>`
+  needs an internal location mapped to UPLOAD_FOLDER:
+
+      location /protected-uploads/ {
+          internal;
+          alias /srv/lnsp/uploads/;
+      }
+
+- 'sendfile' (Apache mod_xsendfile, lighttpd): `X-Sendfile: <absolute path>`;
+  UPLOAD_FOLDER must be allowed (e.g. `XSendFilePath /srv/lnsp/uploads`).
+
+Only files inside UPLOAD_FOLDER are offloaded. Never enable it without such
+a proxy in front: the client would get an empty file.
+"""
+
+import mimetypes
+import os
+from urllib.parse import quote
+from flask import current_app
+
+
+def offload_file(path, download_name):
+    """
+    A response telling the proxy to send a file as an attachment, or None
+    when offloading is off or the file isn't in UPLOAD_FOLDER (the caller
+    then sends it itself).
+    """
+    mode = current_app.config['FILE_OFFLOAD']
+    if mode not in ('accel', 'sendfile'):
+        return None
+
+    root = os.path.realpath(current_app.config['UPLOAD_FOLDER'])
+    path = os.path.realpath(path)
+    if os.path.commonpath([root, path]) != root:
+        return None
+
+    response = current_app.response_class(
+        mimetype=mimetypes.guess_type(download_name)[0] or 'application/octet-stream'
+    )
+    if mode == 'accel':
+        relative = os.path.relpath(path, root).replace(os.sep, '/')
+        response.headers['X-Accel-Redirect'] = current_app.config['FILE_OFFLOAD_PREFIX'] + quote(relative)
+    else:
+        response.headers['X-Sendfile'] = path
+    response.headers.set('Content-Disposition', 'attachment', filename=download_name)
+    return response
@@ -0,0 +1,206 @@
+"""
+Render cache for the note listings on the dashboards.
+
+The note table and pagination of a dashboard page only change when notes
+are uploaded or deleted, yet every request would query the page of notes
+and render it through Jinja. Instead the rendered fragment is cached under
+the page's arguments, the release (get_app_version) and the current
+values of version counters (see app/http_cache.py) that every upload and
+delete bumps:
+
+    listing = cached_fragment(
+        'student_notes', (search_course, cursor, page), (NOTES_VERSION,),
+        lambda: render_template('_student_notes.html', notes=...)
+    )
+
+A write changes the version, so later requests miss and render the new
+state; entries for old versions are never read again and age out.
+
+FRAGMENT_CACHE selects the backend: 'memory' (the default) keeps up to
+FRAGMENT_CACHE_SIZE fragments per process; 'file' stores them in
+FRAGMENT_CACHE_DIR, shared by all processes on the host, so one render
+serves every worker; 'none' renders every time. Entries expire after
+FRAGMENT_CACHE_TTL seconds either way.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from flask import current_app
+from markupsafe import Markup
+from app.cache import TTLCache
+from app.http_cache import get_versions, get_app_version
+
+TEMP_PREFIX = '.tmp-'
+
+_backend = None
+_backend_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+class MemoryBackend:
+    """Fragments in a bounded LRU of this process"""
+
+    def __init__(self, maxsize, ttl):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, html):
+        self._cache.set(key, html)
+
+    def clear(self):
+        self._cache.clear()
+
+
+class FileBackend:
+    """
+    Fragments as files in a directory that processes on the same host share.
+
+    Files are written atomically and named by a hash of the key. Every
+    `maxsize // 10` writes, the oldest files beyond `maxsize` are removed.
+    """
+
+    def __init__(self, root, maxsize, ttl):
+        self.root = root
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._writes = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.root, hashlib.sha256(key.encode()).hexdigest())
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if os.path.getmtime(path) < time.time() - self.ttl:
+                return None
+            with open(path, encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def set(self, key, html):
+        fd, temp_path = tempfile.mkstemp(prefix=TEMP_PREFIX, dir=self.root)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(html)
+            os.replace(temp_path, self._path(key))
+        except OSError:
+            _remove(temp_path)
+            return
+        with self._lock:
+            self._writes += 1
+            due = self._writes >= max(self.maxsize // 10, 1)
+            if due:
+                self._writes = 0
+        if due:
+            self.prune()
+
+    def prune(self):
+        """Remove expired files, then the oldest ones beyond maxsize"""
+        files = []
+        for entry in os.scandir(self.root):
+            try:
+                files.append((entry.stat().st_mtime, entry.path))
+            except OSError:
+                continue
+        files.sort()
+        expired = time.time() - self.ttl
+        excess = len(files) - self.maxsize
+        for i, (mtime, path) in enumerate(files):
+            if i >= excess and mtime >= expired:
+                break
+            _remove(path)
+
+    def clear(self):
+        for entry in os.scandir(self.root):
+            _remove(entry.path)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def get_fragment_cache():
+    """The process-wide fragment cache backend, or None when FRAGMENT_CACHE is 'none'"""
+    global _backend
+    config = current_app.config
+    if config['FRAGMENT_CACHE'] not in ('memory', 'file'):
+        return None
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if config['FRAGMENT_CACHE'] == 'file':
+                    _backend = FileBackend(config['FRAGMENT_CACHE_DIR'], config['FRAGMENT_CACHE_SIZE'],
+                                           config['FRAGMENT_CACHE_TTL'])
+                else:
+                    _backend = MemoryBackend(config['FRAGMENT_CACHE_SIZE'], config['FRAGMENT_CACHE_TTL'])
+    return _backend
+
+
+def cached_fragment(name, key_parts, version_names, render):
+    """
+    The rendered fragment for these arguments at the current versions,
+    calling `render()` (which queries and renders) only on a miss.
+
+    Args:
+        name: Identifies the fragment; include the route's name
+        key_parts: Everything besides the versions that changes the output
+            (page, cursor, search term, uploader, ...)
+        version_names: Version counters bumped by every write the fragment shows
+        render: Returns the fragment's HTML
+
+    Returns:
+        The HTML as Markup, safe to insert into a template
+    """
+    cache = get_fragment_cache()
+    if cache is None:
+        return Markup(render())
+
+    versions = [f'{v}={value}' for v, value in zip(version_names, get_versions(*version_names))]
+    # File backend entries outlive a deploy that changes the templates
+    key = '\x1f'.join([name, get_app_version(), *map(str, key_parts), *versions])
+    html = cache.get(key)
+    if html is not None:
+        _count('hits')
+        return Markup(html)
+    _count('misses')
+    html = str(render())
+    cache.set(key, html)
+    return Markup(html)
+
+
+def _count(stat):
+    with _stats_lock:
+        _stats[stat] += 1
+
+
+def get_fragment_stats():
+    """This process's hits, misses and hit ratio"""
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+    return stats
+
+
+def _reset_backend():
+    """Forked children create their own backend instead of sharing locks"""
+    global _backend, _backend_lock, _stats_lock
+    _backend = None
+    _backend_lock = threading.Lock()
+    _stats_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_backend)
@@ -0,0 +1,182 @@
+"""
+HTTP conditional requests for note downloads and listing pages.
+
+Note files never change once uploaded, so a download is identified by the
+note's content digest (a strong ETag) and its upload date (Last-Modified).
+A browser revalidating a file it already has gets a 304 before any storage
+is touched.
+
+Listing pages get a weak ETag derived from a version counter that is bumped
+in the same transaction as every note insert or delete:
+
+    @student_bp.route('/dashboard')
+    @login_required
+    @student_required
+    @conditional_page(NOTES_VERSION)
+    def dashboard():
+        ...
+
+Pages are `private, no-cache`: browsers keep them but revalidate on every
+visit, so a new or deleted note shows up immediately.
+"""
+
+import hashlib
+import os
+from functools import wraps
+from flask import g, request, session, make_response, current_app
+from flask_login import current_user
+from sqlalchemy.exc import IntegrityError
+from werkzeug.http import is_resource_modified, parse_date, quote_etag
+from app import db
+from app.models import Counter
+
+NOTES_VERSION = 'notes'
+
+
+def get_versions(*names):
+    """Current values of version counters (0 if never bumped), read in one query once per request"""
+    versions = g.setdefault('_versions', {})
+    missing = [name for name in names if name not in versions]
+    if missing:
+        versions.update(dict.fromkeys(missing, 0))
+        versions.update(db.session.execute(
+            db.select(Counter.name, Counter.value).where(Counter.name.in_(missing))
+        ).all())
+    return [versions[name] or 0 for name in names]
+
+
+def get_version(name):
+    """Current value of a version counter (0 if it was never bumped)"""
+    return get_versions(name)[0]
+
+
+def bump_version(name):
+    """Increment a version counter in the caller's transaction"""
+    g.pop('_versions', None)
+    bumped = db.session.execute(
+        db.update(Counter).where(Counter.name == name).values(value=Counter.value + 1)
+    ).rowcount
+    if bumped:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(Counter(name=name, value=1))
+    except IntegrityError:
+        # Created concurrently by another request
+        bump_version(name)
+
+
+def bump_notes_version():
+    """Invalidate cached listing pages; call whenever notes are added or removed"""
+    bump_version(NOTES_VERSION)
+
+
+def get_app_version():
+    """
+    APP_VERSION, or else a digest of the names, sizes and modification times
+    of the templates and static files: pages rendered by another release
+    must not revalidate. Computed once per process (per call while
+    templates auto-reload).
+    """
+    app = current_app
+    if app.config['APP_VERSION']:
+        return app.config['APP_VERSION']
+    version = app.extensions.get('app_version')
+    if version is None or app.jinja_env.auto_reload:
+        digest = hashlib.sha1()
+        for root in (os.path.join(app.root_path, app.template_folder), app.static_folder):
+            for folder, _, files in sorted(os.walk(root or '')):
+                for name in sorted(files):
+                    path = os.path.join(folder, name)
+                    stat = os.stat(path)
+                    digest.update(f'{os.path.relpath(path, root)}:{stat.st_size}:{stat.st_mtime_ns}\n'.encode())
+        version = app.extensions['app_version'] = digest.hexdigest()[:12]
+    return version
+
+
+def page_etag(*version_names):
+    """Weak ETag for the current page, the current user, the release and the given versions"""
+    parts = [request.full_path, str(current_user.get_id()), get_app_version()]
+    parts += [f'{name}={value}' for name, value in zip(version_names, get_versions(*version_names))]
+    return hashlib.sha1('\n'.join(parts).encode()).hexdigest()
+
+
+def conditional_page(*version_names):
+    """
+    Answer repeat visits to a listing page with 304 Not Modified until one
+    of the named version counters changes. A name may also be a function
+    returning it, called per request (e.g. a counter per user).
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            # A pending flash message changes the page once; render it
+            if not current_app.config['HTTP_CACHING'] or session.get('_flashes'):
+                return f(*args, **kwargs)
+
+            etag = page_etag(*[name() if callable(name) else name for name in version_names])
+            if not is_resource_modified(request.environ, etag=etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response
+        return decorated_function
+    return decorator
+
+
+def note_etag(note):
+    """Strong ETag for a note's file, or None for files stored before content addressing"""
+    return note.blob_digest
+
+
+def note_not_modified(note):
+    """
+    A 304 response if the client's copy of the note's file is current, else None.
+    Checked before storage is touched.
+    """
+    if not current_app.config['HTTP_CACHING']:
+        return None
+    etag = note_etag(note)
+    if not is_resource_modified(request.environ, etag=etag, last_modified=note.upload_date):
+        response = current_app.response_class(status=304)
+        set_note_validators(response, note)
+        return response
+    return None
+
+
+def range_applies(note):
+    """
+    Whether a Range request should be honoured, following If-Range: a range
+    is only served if the client's partial copy matches the stored file.
+    """
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    etag = note_etag(note)
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        # Weak ETags never satisfy If-Range
+        return etag is not None and if_range == quote_etag(etag)
+    date = parse_date(if_range)
+    return date is not None and note.upload_date is not None and \
+        date.replace(tzinfo=None) >= note.upload_date.replace(microsecond=0)
+
+
+def set_note_validators(response, note):
+    """Add ETag, Last-Modified and Cache-Control for a note's file"""
+    etag = note_etag(note)
+    if etag:
+        response.set_etag(etag)
+    if note.upload_date:
+        response.last_modified = note.upload_date
+    response.cache_control.private = True
+    max_age = current_app.config['DOWNLOAD_CACHE_MAX_AGE']
+    if max_age:
+        response.cache_control.max_age = max_age
+    else:
+        response.cache_control.no_cache = True
+    return response
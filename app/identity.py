@@ -0,0 +1,110 @@
+"""
+Cached user identity for Flask-Login.
+
+Views only need the current user's id, name and role, so `current_user` is
+an `Identity` built from a bounded in-process cache instead of a `User` row
+loaded on every request. With USER_SESSION_CLAIMS the identity is also
+stored in the (signed) session cookie at login, so even a cold cache needs
+no query until the claims are USER_CLAIMS_MAX_AGE seconds old.
+
+Entries are dropped on logout and whenever a User row is updated or deleted
+in this process; other processes pick up changes when their cached entry
+(USER_CACHE_TTL) or the session claims expire.
+"""
+
+import time
+from flask import current_app, session
+from flask_login import UserMixin
+from sqlalchemy import event
+from app import db
+from app.cache import TTLCache
+from app.models import User
+from app.replicas import replica_reads
+
+CLAIMS_KEY = '_identity'
+
+_user_cache = TTLCache(maxsize=10000, ttl=300)
+
+
+class Identity(UserMixin):
+    """The fields of a User that requests need, detached from the database"""
+
+    def __init__(self, id, name, role):
+        self.id = id
+        self.name = name
+        self.role = role
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.name, user.role)
+
+    def __repr__(self):
+        return f'<Identity {self.id} {self.role}>'
+
+
+def _claims_valid(claims, user_id):
+    max_age = current_app.config['USER_CLAIMS_MAX_AGE']
+    return claims.get('id') == user_id and time.time() - claims.get('iat', 0) < max_age
+
+
+def _query_identity(user_id):
+    row = db.session.execute(
+        db.select(User.id, User.name, User.role).where(User.id == user_id)
+    ).first()
+    return Identity(*row) if row else None
+
+
+def load_user(user_id):
+    """Flask-Login user loader: session claims, then the cache, then the database"""
+    user_id = int(user_id)
+    claims = session.get(CLAIMS_KEY) if current_app.config['USER_SESSION_CLAIMS'] else None
+    if claims and _claims_valid(claims, user_id):
+        return Identity(claims['id'], claims['name'], claims['role'])
+
+    identity = _user_cache.get(user_id)
+    if identity is None:
+        # Names and roles are never edited in place, so a replica's copy is current enough
+        with replica_reads():
+            identity = _query_identity(user_id)
+        if identity is None:
+            return None
+        _user_cache.set(user_id, identity)
+    if current_app.config['USER_SESSION_CLAIMS']:
+        # Missing or expired claims: refresh them for the next requests
+        remember_identity(identity)
+    return identity
+
+
+def remember_identity(identity):
+    """Cache an identity and, if enabled, store it as session claims (call at login)"""
+    _user_cache.set(identity.id, identity)
+    if current_app.config['USER_SESSION_CLAIMS']:
+        session[CLAIMS_KEY] = {
+            'id': identity.id,
+            'name': identity.name,
+            'role': identity.role,
+            'iat': int(time.time()),
+        }
+
+
+def forget_user(user_id):
+    """Drop a user's cached identity and the current session's claims (call at logout)"""
+    _user_cache.pop(int(user_id))
+    session.pop(CLAIMS_KEY, None)
+
+
+def _invalidate_user(mapper, connection, user):
+    _user_cache.pop(user.id)
+
+
+def init_app(app):
+    """Install the cached user loader"""
+    global _user_cache
+    from app import login_manager
+
+    _user_cache = TTLCache(maxsize=app.config['USER_CACHE_SIZE'], ttl=app.config['USER_CACHE_TTL'])
+    login_manager.user_loader(load_user)
+
+    for name in ('after_update', 'after_delete'):
+        if not event.contains(User, name, _invalidate_user):
+            event.listen(User, name, _invalidate_user)
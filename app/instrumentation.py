@@ -0,0 +1,134 @@
+"""
+Request instrumentation.
+
+Counts the SQL statements each request executes so views and tests can check
+that a page costs a constant number of queries, however many rows it shows.
+Every request's latency, statement count and SQL time are also recorded in
+the metrics served at /metrics (see app/metrics.py).
+
+Usage in tests:
+
+    with count_queries() as counter:
+        client.get('/student/dashboard')
+    assert counter.count <= 4
+
+`counter.statements` holds the SQL of each statement, to check which
+tables were queried.
+
+With QUERY_COUNT_HEADER enabled, every response also carries an
+`X-Query-Count` header.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from flask import g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from werkzeug.wsgi import ClosingIterator, FileWrapper
+from app import metrics
+
+_counters = []
+_counters_lock = threading.Lock()
+
+
+class QueryCounter:
+    """Number and SQL of the statements executed while the counter is active"""
+
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+
+@contextmanager
+def count_queries():
+    """Count every SQL statement executed inside the `with` block"""
+    counter = QueryCounter()
+    with _counters_lock:
+        _counters.append(counter)
+    try:
+        yield counter
+    finally:
+        with _counters_lock:
+            _counters.remove(counter)
+
+
+def get_query_count():
+    """Number of SQL statements executed so far in the current app context"""
+    return g.get('query_count', 0) if has_app_context() else 0
+
+
+def get_query_seconds():
+    """Time spent in SQL statements so far in the current app context"""
+    return g.get('query_seconds', 0.0) if has_app_context() else 0.0
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context():
+        g.query_count = g.get('query_count', 0) + 1
+    for counter in _counters:
+        counter.count += 1
+        counter.statements.append(statement)
+    conn.info['query_started'] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('query_started', None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    metrics.SQL_STATEMENT_SECONDS.observe(elapsed)
+    if has_app_context():
+        g.query_seconds = g.get('query_seconds', 0.0) + elapsed
+
+
+def _start_timer():
+    g.request_started = time.perf_counter()
+
+
+def _record_request(response):
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    endpoint = request.endpoint or 'unmatched'
+    method = request.method
+    metrics.REQUESTS.inc(endpoint=endpoint, method=method, status=str(response.status_code))
+    metrics.REQUEST_SQL_QUERIES.observe(get_query_count(), endpoint=endpoint)
+    metrics.REQUEST_SQL_SECONDS.observe(get_query_seconds(), endpoint=endpoint)
+
+    def observe():
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint, method=method)
+
+    if not response.direct_passthrough:
+        # Time the body until the response closes
+        response.call_on_close(observe)
+    elif _is_file_wrapper(response.response):
+        # Sent by the server itself (possibly with sendfile); a wrapper would prevent that
+        observe()
+    else:
+        # Werkzeug doesn't call close callbacks for passthrough bodies (streamed
+        # downloads), so time them until the body itself is closed
+        response.response = ClosingIterator(response.response, observe)
+    return response
+
+
+def _is_file_wrapper(body):
+    server_wrapper = request.environ.get('wsgi.file_wrapper')
+    return isinstance(body, FileWrapper) or (isinstance(server_wrapper, type) and isinstance(body, server_wrapper))
+
+
+def init_app(app):
+    """Install the SQL event hooks, request timing and the optional X-Query-Count header"""
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    if app.config.get('METRICS_ENABLED'):
+        app.before_request(_start_timer)
+        app.after_request(_record_request)
+
+    if app.config.get('QUERY_COUNT_HEADER'):
+        @app.after_request
+        def add_query_count_header(response):
+            response.headers['X-Query-Count'] = str(get_query_count())
+            return response
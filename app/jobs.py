@@ -0,0 +1,281 @@
+"""
+Background jobs for slow side effects (storage uploads and deletes).
+
+Jobs are rows in the `jobs` table, written in the same transaction as the
+change that needs them, so a request can return as soon as it commits and
+nothing is lost if the process dies. An in-process pool of worker threads
+claims due jobs, runs the registered handler and retries failures with
+exponential backoff. No external broker is needed.
+
+    @job_handler('storage.delete')
+    def delete_file(file_path):
+        ...
+
+    enqueue('storage.delete', file_path=note.file_path)
+    db.session.commit()
+    notify()
+
+With JOB_WORKERS = 0 (e.g. serverless deployments, where background threads
+don't outlive the request) `notify()` runs due jobs inline instead.
+
+The queue backend is pluggable through JOB_QUEUE (an import path); the
+default DatabaseQueue uses the application database.
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from werkzeug.utils import import_string
+from app import db
+from app.models import Job
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+_pool_lock = threading.Lock()
+
+
+def job_handler(kind):
+    """Register a function as the handler for jobs of the given kind"""
+    def decorator(f):
+        _handlers[kind] = f
+        return f
+    return decorator
+
+
+def enqueue(kind, delay=0, **payload):
+    """
+    Add a job to the current transaction; it becomes visible to workers on commit.
+    Call notify() after committing to start it promptly.
+    """
+    job = Job(
+        kind=kind,
+        payload=json.dumps(payload),
+        run_at=datetime.utcnow() + timedelta(seconds=delay)
+    )
+    db.session.add(job)
+    return job
+
+
+class DatabaseQueue:
+    """Durable job queue stored in the application database"""
+
+    def claim(self):
+        """Atomically mark the oldest due pending job as running and return it (or None)"""
+        now = datetime.utcnow()
+        job_id = db.session.execute(
+            db.select(Job.id)
+            .where(Job.status == 'pending', Job.run_at <= now)
+            .order_by(Job.run_at, Job.id)
+            .limit(1)
+        ).scalar()
+        if job_id is None:
+            db.session.rollback()
+            return None
+
+        # Another worker may have claimed it in the meantime
+        claimed = db.session.execute(
+            db.update(Job)
+            .where(Job.id == job_id, Job.status == 'pending')
+            .values(status='running', started_at=now, attempts=Job.attempts + 1)
+        ).rowcount
+        db.session.commit()
+        return db.session.get(Job, job_id) if claimed else None
+
+    def complete(self, job):
+        db.session.delete(job)
+        db.session.commit()
+
+    def retry(self, job, error, delay):
+        job.status = 'pending'
+        job.last_error = error
+        job.run_at = datetime.utcnow() + timedelta(seconds=delay)
+        db.session.commit()
+
+    def fail(self, job, error):
+        job.status = 'failed'
+        job.last_error = error
+        db.session.commit()
+
+    def recover(self, stale_after):
+        """Return jobs left 'running' by a crashed worker to the queue"""
+        cutoff = datetime.utcnow() - timedelta(seconds=stale_after)
+        db.session.execute(
+            db.update(Job)
+            .where(Job.status == 'running', Job.started_at < cutoff)
+            .values(status='pending')
+        )
+        db.session.commit()
+
+    def depth(self):
+        """Number of jobs per status, plus the age in seconds of the oldest due job"""
+        counts = dict(db.session.execute(
+            db.select(Job.status, db.func.count()).group_by(Job.status)
+        ).all())
+        oldest = db.session.execute(
+            db.select(db.func.min(Job.run_at)).where(Job.status == 'pending')
+        ).scalar()
+        age = max((datetime.utcnow() - oldest).total_seconds(), 0) if oldest else 0
+        return {
+            'pending': counts.get('pending', 0),
+            'running': counts.get('running', 0),
+            'failed': counts.get('failed', 0),
+            'oldest_pending_seconds': age,
+        }
+
+
+class JobWorkerPool:
+    """Threads that claim and run jobs for one application"""
+
+    def __init__(self, app, queue):
+        self.app = app
+        self.queue = queue
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.threads = []
+        self.pid = os.getpid()
+        self.stats = {
+            'processed': 0, 'failed': 0, 'retried': 0,
+            'wait_seconds_total': 0.0, 'run_seconds_total': 0.0,
+        }
+        self._stats_lock = threading.Lock()
+        self.recovered = False
+
+    def start(self, workers):
+        if workers:
+            self.recover()
+        # Without workers (serverless) the first inline run recovers instead,
+        # so a cold start doesn't spend a database round trip on it
+        for i in range(workers):
+            thread = threading.Thread(target=self._work, name=f'job-worker-{i}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        if workers:
+            # Let in-flight jobs finish on a clean shutdown
+            atexit.register(self.stop)
+
+    def recover(self):
+        """Requeue jobs left 'running' by a crashed process (once per pool)"""
+        if self.recovered:
+            return
+        self.recovered = True
+        with self.app.app_context():
+            try:
+                self.queue.recover(self.app.config['JOB_STALE_AFTER'])
+            except Exception:
+                # e.g. the jobs table doesn't exist yet; don't fail the request
+                logger.exception('Failed to recover stale jobs')
+                db.session.rollback()
+
+    def stop(self, timeout=5):
+        self.stopping.set()
+        self.wakeup.set()
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def _work(self):
+        while not self.stopping.is_set():
+            if not self.run_one():
+                self.wakeup.wait(self.app.config['JOB_POLL_INTERVAL'])
+                self.wakeup.clear()
+
+    def run_one(self):
+        """Claim and run a single job; returns False if none was due"""
+        with self.app.app_context():
+            try:
+                job = self.queue.claim()
+            except Exception:
+                logger.exception('Failed to claim job')
+                db.session.rollback()
+                return False
+            if job is None:
+                return False
+
+            started = time.monotonic()
+            wait = (job.started_at - job.created_at).total_seconds()
+            try:
+                handler = _handlers[job.kind]
+                handler(**json.loads(job.payload))
+            except Exception as e:
+                db.session.rollback()
+                self._record_failure(job, e)
+            else:
+                self.queue.complete(job)
+                self._record(processed=1, wait_seconds_total=wait,
+                             run_seconds_total=time.monotonic() - started)
+            return True
+
+    def _record_failure(self, job, error):
+        config = self.app.config
+        message = f'{type(error).__name__}: {error}'
+        if job.attempts >= config['JOB_MAX_ATTEMPTS']:
+            logger.error('Job %s (%s) failed permanently: %s', job.id, job.kind, message)
+            self.queue.fail(job, message)
+            self._record(failed=1)
+        else:
+            delay = config['JOB_RETRY_BASE_DELAY'] * 2 ** (job.attempts - 1)
+            logger.warning('Job %s (%s) failed, retrying in %ss: %s', job.id, job.kind, delay, message)
+            self.queue.retry(job, message, delay)
+            self._record(retried=1)
+
+    def _record(self, **increments):
+        with self._stats_lock:
+            for key, value in increments.items():
+                self.stats[key] += value
+
+
+def _get_pool(app):
+    """The worker pool for this app and process, started on first use"""
+    pool = app.extensions.get('job_pool')
+    if pool is not None and pool.pid == os.getpid():
+        return pool
+
+    # First use, or we are a forked child whose parent's threads didn't survive
+    with _pool_lock:
+        pool = app.extensions.get('job_pool')
+        if pool is None or pool.pid != os.getpid():
+            pool = JobWorkerPool(app, import_string(app.config['JOB_QUEUE'])())
+            app.extensions['job_pool'] = pool
+            pool.start(app.config['JOB_WORKERS'])
+    return pool
+
+
+def notify():
+    """Wake the workers after committing new jobs (or run them inline when JOB_WORKERS = 0)"""
+    app = current_app._get_current_object()
+    pool = _get_pool(app)
+    if app.config['JOB_WORKERS'] > 0:
+        pool.wakeup.set()
+    else:
+        pool.recover()
+        while pool.run_one():
+            pass
+
+
+def get_queue_stats():
+    """Queue depth from the database plus this process's throughput and latency counters"""
+    app = current_app._get_current_object()
+    pool = _get_pool(app)
+    stats = pool.queue.depth()
+    with pool._stats_lock:
+        stats.update(pool.stats)
+    completed = stats['processed'] or 1
+    stats['avg_wait_seconds'] = stats['wait_seconds_total'] / completed
+    stats['avg_run_seconds'] = stats['run_seconds_total'] / completed
+    return stats
+
+
+def init_app(app):
+    """Register job handlers and start workers with the first request"""
+    from app import storage  # noqa: F401 - registers the storage handlers
+
+    @app.before_request
+    def start_job_workers():
+        # Picks up jobs left over from a previous run; cheap after the first call.
+        # With JOB_WORKERS = 0 this only creates the pool (see JobWorkerPool.start)
+        _get_pool(app)
@@ -0,0 +1,234 @@
+"""
+Performance metrics in the Prometheus text format.
+
+Request latency per endpoint, SQL statements and time per request (recorded
+by app/instrumentation.py) and Supabase storage calls (recorded by
+app/supabase_client.py) are kept in process-local counters and histograms.
+`GET /metrics` renders them together with gauges read at scrape time: job
+queue depth, signed-URL reuse, download object cache hits, dashboard fragment
+cache hits, buffered download counts and database pool usage.
+
+    STORAGE_CALL_SECONDS.observe(0.12, operation='upload')
+    STORAGE_BYTES.inc(4096, operation='upload')
+
+Values are per process: with several worker processes (e.g. gunicorn), each
+one reports its own, so scrape every process or aggregate by instance.
+/metrics answers only requests carrying `Authorization: Bearer <METRICS_TOKEN>`;
+without a METRICS_TOKEN it is not served at all (404).
+"""
+
+import bisect
+import hmac
+import threading
+from flask import Response, abort, current_app, request
+
+# Prometheus client defaults, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SQL_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+_metrics = []
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Base class: a named metric whose series are keyed by label values"""
+    kind = None
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._series = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def _key(self, labels):
+        return tuple((name, labels.get(name, '')) for name in self.labels)
+
+    def header(self):
+        return [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} {self.kind}']
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Counter(Metric):
+    """A monotonically increasing total"""
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            series = dict(self._series)
+        return [f'{self.name}{_format_labels(key)} {_format_value(value)}' for key, value in sorted(series.items())]
+
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets, plus their sum and count"""
+    kind = 'histogram'
+
+    def __init__(self, name, description, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            series = {key: ([*counts], total, count) for key, (counts, total, count) in self._series.items()}
+        lines = []
+        for key, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{_format_labels(key, [("le", _format_value(bound))])} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(key)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(key)} {count}')
+        return lines
+
+
+class Gauge(Metric):
+    """A value read at scrape time from a callback returning {labels tuple: value}"""
+    kind = 'gauge'
+
+    def __init__(self, name, description, labels=(), collect=None):
+        super().__init__(name, description, labels)
+        self.collect = collect
+
+    def samples(self):
+        values = self.collect() if self.collect else {}
+        return [
+            f'{self.name}{_format_labels(zip(self.labels, key))} {_format_value(value)}'
+            for key, value in sorted(values.items())
+        ]
+
+
+REQUESTS = Counter('lnsp_requests_total', 'HTTP requests by endpoint, method and status', ('endpoint', 'method', 'status'))
+REQUEST_SECONDS = Histogram('lnsp_request_duration_seconds', 'Time to serve a request, including streamed bodies',
+                            ('endpoint', 'method'))
+REQUEST_SQL_QUERIES = Histogram('lnsp_request_sql_queries', 'SQL statements executed per request', ('endpoint',),
+                                buckets=COUNT_BUCKETS)
+REQUEST_SQL_SECONDS = Histogram('lnsp_request_sql_seconds', 'Total SQL time per request', ('endpoint',))
+SQL_STATEMENT_SECONDS = Histogram('lnsp_sql_statement_duration_seconds', 'Duration of single SQL statements',
+                                  buckets=SQL_BUCKETS)
+STORAGE_CALL_SECONDS = Histogram('lnsp_storage_call_duration_seconds', 'Supabase storage call duration',
+                                 ('operation',))
+STORAGE_CALL_ERRORS = Counter('lnsp_storage_call_errors_total', 'Failed Supabase storage calls', ('operation',))
+STORAGE_BYTES = Counter('lnsp_storage_bytes_total', 'Bytes sent to or received from Supabase storage',
+                        ('operation',))
+
+
+def _job_queue_values():
+    from app.jobs import get_queue_stats
+    try:
+        stats = get_queue_stats()
+    except Exception:
+        # e.g. the jobs table doesn't exist yet; report the other metrics anyway
+        return {}
+    return {(key,): stats[key] for key in ('pending', 'running', 'failed', 'oldest_pending_seconds', 'processed',
+                                           'retried', 'avg_wait_seconds', 'avg_run_seconds')}
+
+
+def _signed_url_values():
+    from app.supabase_client import get_signed_url_stats
+    return {(key,): value for key, value in get_signed_url_stats().items()}
+
+
+def _object_cache_values():
+    from app.object_cache import peek_object_cache
+    cache = peek_object_cache()
+    return {(key,): value for key, value in cache.stats().items()} if cache else {}
+
+
+def _fragment_cache_values():
+    from app.fragment_cache import get_fragment_stats
+    return {(key,): value for key, value in get_fragment_stats().items()}
+
+
+def _download_stats_values():
+    from app.download_stats import get_download_stats
+    return {(key,): value for key, value in get_download_stats().items()}
+
+
+def _db_pool_values():
+    from app import db
+    from app.database import pool_status
+    values = {}
+    for bind, engine in db.engines.items():
+        for key, value in pool_status(engine).items():
+            if key != 'class':
+                values[(bind or 'primary', key)] = value
+    return values
+
+
+Gauge('lnsp_job_queue', 'Background job queue depth and this process\'s job counters', ('stat',),
+      collect=_job_queue_values)
+Gauge('lnsp_signed_urls', 'Signed download URLs generated versus reused from the cache', ('stat',),
+      collect=_signed_url_values)
+Gauge('lnsp_object_cache', 'Download object cache hits, misses, hit ratio and bytes served and stored',
+      ('stat',), collect=_object_cache_values)
+Gauge('lnsp_fragment_cache', 'Dashboard listing fragments served from the render cache versus rendered',
+      ('stat',), collect=_fragment_cache_values)
+Gauge('lnsp_download_stats', 'Downloads counted by this process: recorded, buffered, written and flushes',
+      ('stat',), collect=_download_stats_values)
+Gauge('lnsp_db_pool_connections', 'Database connection pool usage per bind', ('bind', 'stat'),
+      collect=_db_pool_values)
+
+
+def render():
+    """Every metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.header())
+        lines.extend(metric.samples())
+    return '\n'.join(lines) + '\n'
+
+
+def is_operator():
+    """Whether the request carries the METRICS_TOKEN bearer token"""
+    token = current_app.config.get('METRICS_TOKEN')
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    return bool(token) and hmac.compare_digest(supplied, token)
+
+
+def metrics_view():
+    # Internals are for operators only; don't reveal the endpoint to anyone else
+    if not is_operator():
+        abort(404)
+    return Response(render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+def init_app(app):
+    """Expose /metrics (when METRICS_ENABLED)"""
+    if app.config.get('METRICS_ENABLED'):
+        app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -0,0 +1,192 @@
+"""
+Versioned schema migrations.
+
+`db.create_all()` only creates missing tables: it never adds a column or an
+index to a table that already exists, so a database created by an older
+release silently misses them. Each schema change is therefore a numbered
+migration, and the `schema_version` table records which ones a database has
+applied. A new one takes the next free number (head_version() + 1):
+
+    @migration(N, 'Index notes by filename')
+    def add_filename_index():
+        create_index(Note.__table__, 'ix_notes_filename')
+
+`upgrade()` (run by migrate.py and init_db.py) applies the pending ones in
+order. Every migration checks what already exists before changing anything,
+so a database that is partly up to date (e.g. one created by `create_all()`
+before this module existed) can be upgraded, and a migration that failed
+half-way can simply be run again.
+"""
+
+from sqlalchemy import inspect
+from app import db
+from app.models import Note, Course, Blob, Counter, UploadSession, Job, NoteDownloadStat, PopularNote, SchemaVersion
+
+_migrations = {}
+
+
+def migration(version, description):
+    """Register a function as the migration to the given schema version"""
+    def decorator(f):
+        if version in _migrations:
+            raise ValueError(f'Duplicate migration version {version}')
+        _migrations[version] = (description, f)
+        return f
+    return decorator
+
+
+def get_migrations():
+    """All registered migrations as sorted (version, description, function) tuples"""
+    return [(version, *_migrations[version]) for version in sorted(_migrations)]
+
+
+def head_version():
+    """The version a fully migrated database is at"""
+    return max(_migrations)
+
+
+def _inspector():
+    return inspect(db.session.connection())
+
+
+def has_table(name):
+    return _inspector().has_table(name)
+
+
+def has_column(table_name, column_name):
+    return any(column['name'] == column_name for column in _inspector().get_columns(table_name))
+
+
+def has_index(table_name, index_name):
+    return any(index['name'] == index_name for index in _inspector().get_indexes(table_name))
+
+
+def create_table(table):
+    """Create a model's table (and its indexes) if it does not exist"""
+    table.create(db.session.connection(), checkfirst=True)
+
+
+def create_index(table, name):
+    """Create one of a table's declared indexes if it does not exist"""
+    index = next(index for index in table.indexes if index.name == name)
+    if not has_index(table.name, name):
+        index.create(db.session.connection())
+
+
+def add_column(table, name):
+    """Add one of a model's declared columns to an existing table if it is missing"""
+    if has_column(table.name, name):
+        return
+    column = table.c[name]
+    connection = db.session.connection()
+    dialect = connection.dialect
+    preparer = dialect.identifier_preparer
+    ddl = (
+        f'ALTER TABLE {preparer.format_table(table)} '
+        f'ADD COLUMN {preparer.format_column(column)} {column.type.compile(dialect=dialect)}'
+    )
+    for foreign_key in column.foreign_keys:
+        target = foreign_key.column
+        ddl += f' REFERENCES {preparer.format_table(target.table)} ({preparer.format_column(target)})'
+    connection.execute(db.text(ddl))
+
+
+def get_version():
+    """The highest migration applied to the database (0 for none)"""
+    if not has_table(SchemaVersion.__tablename__):
+        return 0
+    return db.session.execute(db.select(db.func.max(SchemaVersion.version))).scalar() or 0
+
+
+def get_applied():
+    """Applied migrations, oldest first"""
+    if not has_table(SchemaVersion.__tablename__):
+        return []
+    return SchemaVersion.query.order_by(SchemaVersion.version).all()
+
+
+def pending_migrations():
+    current = get_version()
+    return [entry for entry in get_migrations() if entry[0] > current]
+
+
+def upgrade(target=None, echo=print):
+    """
+    Apply pending migrations up to `target` (default: all), committing after
+    each one. A database without any tables is first created from the models.
+
+    Returns:
+        The list of versions applied
+    """
+    if not has_table('users'):
+        echo('Empty database: creating tables from the models...')
+        db.create_all()
+        db.session.commit()
+    create_table(SchemaVersion.__table__)
+    db.session.commit()
+
+    applied = []
+    for version, description, apply in pending_migrations():
+        if target is not None and version > target:
+            break
+        echo(f'Applying {version:04d} {description}...')
+        apply()
+        db.session.add(SchemaVersion(version=version, description=description))
+        db.session.commit()
+        applied.append(version)
+    return applied
+
+
+@migration(1, 'Full-text search index')
+def add_search_index():
+    from app.search import ensure_search_index
+    ensure_search_index()
+
+
+@migration(2, 'Keyset pagination indexes on notes')
+def add_pagination_indexes():
+    create_index(Note.__table__, 'ix_notes_upload_date_id')
+    create_index(Note.__table__, 'ix_notes_uploaded_by_upload_date_id')
+
+
+@migration(3, 'Resumable upload sessions')
+def add_upload_sessions():
+    create_table(UploadSession.__table__)
+
+
+@migration(4, 'Background job queue')
+def add_jobs():
+    create_table(Job.__table__)
+
+
+@migration(5, 'Content-addressed blobs')
+def add_blobs():
+    create_table(Blob.__table__)
+    add_column(Note.__table__, 'blob_digest')
+    add_column(Note.__table__, 'file_size')
+    create_index(Note.__table__, 'ix_notes_blob_digest')
+
+
+@migration(6, 'Version counters')
+def add_counters():
+    create_table(Counter.__table__)
+
+
+@migration(7, 'Course catalog')
+def add_course_catalog():
+    from app.catalog import rebuild_catalog
+    create_index(Note.__table__, 'ix_notes_course_code_upload_date_id')
+    create_table(Course.__table__)
+    db.session.commit()
+    rebuild_catalog()
+
+
+@migration(8, 'Index upload sessions by age')
+def add_upload_session_age_index():
+    create_index(UploadSession.__table__, 'ix_upload_sessions_created_at')
+
+
+@migration(9, 'Download statistics and popular notes')
+def add_download_stats():
+    create_table(NoteDownloadStat.__table__)
+    create_table(PopularNote.__table__)
@@ -1,6 +1,5 @@
 from app import db
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 
 class User(UserMixin, db.Model):
@@ -15,15 +14,22 @@ class User(UserMixin, db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationship
-    notes = db.relationship('Note', backref='uploader', lazy='dynamic', cascade='all, delete-orphan')
+    notes = db.relationship('Note', back_populates='uploader', lazy='dynamic', cascade='all, delete-orphan')
     
     def set_password(self, password):
         """Hash and set password"""
-        self.password_hash = generate_password_hash(password)
+        from app.passwords import hash_password
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
         """Check if provided password matches hash"""
-        return check_password_hash(self.password_hash, password)
+        from app.passwords import verify_password
+        return verify_password(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        """Check if the stored hash predates the current hashing policy"""
+        from app.passwords import needs_rehash
+        return needs_rehash(self.password_hash)
     
     def __repr__(self):
         return f'<User {self.email}>'
@@ -32,6 +38,13 @@ class User(UserMixin, db.Model):
 class Note(db.Model):
     """Note model for lecture notes"""
     __tablename__ = 'notes'
+    __table_args__ = (
+        # Keyset pagination: newest first overall and per lecturer
+        db.Index('ix_notes_upload_date_id', 'upload_date', 'id'),
+        db.Index('ix_notes_uploaded_by_upload_date_id', 'uploaded_by', 'upload_date', 'id'),
+        # Course pages: one course's notes, newest first
+        db.Index('ix_notes_course_code_upload_date_id', 'course_code', 'upload_date', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     course_title = db.Column(db.String(255), nullable=False)
@@ -40,6 +53,136 @@ class Note(db.Model):
     file_path = db.Column(db.String(500), nullable=False)
     uploaded_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     upload_date = db.Column(db.DateTime, default=datetime.utcnow)
+    # Content-addressed storage: notes with identical files share one blob
+    blob_digest = db.Column(db.String(64), db.ForeignKey('blobs.digest'), index=True)
+    file_size = db.Column(db.BigInteger)
+    
+    # Listing queries should eager-load this (e.g. joinedload) to avoid one query per row
+    uploader = db.relationship('User', back_populates='notes')
     
     def __repr__(self):
         return f'<Note {self.course_code}>'
+
+
+class Course(db.Model):
+    """
+    Per-course aggregate of the notes table, kept up to date incrementally
+    on upload and delete (see app/catalog.py)
+    """
+    __tablename__ = 'courses'
+    
+    course_code = db.Column(db.String(50), primary_key=True)
+    course_title = db.Column(db.String(255), nullable=False)  # Title of the latest note
+    note_count = db.Column(db.Integer, nullable=False, default=0)
+    total_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    latest_upload = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<Course {self.course_code}>'
+
+
+class Blob(db.Model):
+    """A stored file, identified by the SHA-256 of its content and shared by every note that uses it"""
+    __tablename__ = 'blobs'
+    
+    digest = db.Column(db.String(64), primary_key=True)
+    file_path = db.Column(db.String(500), nullable=False)  # Local path or Supabase URL
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Blob {self.digest[:12]}>'
+
+
+class Counter(db.Model):
+    """A named, monotonically increasing number (e.g. the version of the notes table)"""
+    __tablename__ = 'counters'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<Counter {self.name}={self.value}>'
+
+
+class NoteDownloadStat(db.Model):
+    """Downloads of a note on one day, written in batches (see app/download_stats.py)"""
+    __tablename__ = 'note_download_stats'
+    __table_args__ = (
+        # Rankings over the last few days
+        db.Index('ix_note_download_stats_day_note_id', 'day', 'note_id'),
+    )
+    
+    note_id = db.Column(db.Integer, db.ForeignKey('notes.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    downloads = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<NoteDownloadStat {self.note_id} {self.day}={self.downloads}>'
+
+
+class PopularNote(db.Model):
+    """A precomputed place in the ranking of the most downloaded notes of the last days"""
+    __tablename__ = 'popular_notes'
+    
+    rank = db.Column(db.Integer, primary_key=True)
+    note_id = db.Column(db.Integer, db.ForeignKey('notes.id'), nullable=False)
+    downloads = db.Column(db.Integer, nullable=False)
+    computed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    note = db.relationship('Note')
+    
+    def __repr__(self):
+        return f'<PopularNote {self.rank}: {self.note_id}>'
+
+
+class SchemaVersion(db.Model):
+    """An applied schema migration (see app/migrations.py)"""
+    __tablename__ = 'schema_version'
+    
+    version = db.Column(db.Integer, primary_key=True)
+    description = db.Column(db.String(255), nullable=False)
+    applied_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<SchemaVersion {self.version}>'
+
+
+class UploadSession(db.Model):
+    """An in-progress chunked upload that can be resumed after an interruption"""
+    __tablename__ = 'upload_sessions'
+    
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    course_title = db.Column(db.String(255), nullable=False)
+    course_code = db.Column(db.String(50), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    total_size = db.Column(db.BigInteger, nullable=False)
+    received_size = db.Column(db.BigInteger, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)  # Stale sessions are purged by age
+    
+    def __repr__(self):
+        return f'<UploadSession {self.id}>'
+
+
+class Job(db.Model):
+    """A queued background task (see app/jobs.py)"""
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        # Workers claim the oldest due pending job
+        db.Index('ix_jobs_status_run_at', 'status', 'run_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')  # JSON
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    
+    def __repr__(self):
+        return f'<Job {self.id} {self.kind}>'
@@ -0,0 +1,302 @@
+"""
+Local disk cache of Supabase objects for downloads.
+
+Popular notes are downloaded by many students in a short time. With
+OBJECT_CACHE_SIZE set (the default), proxied downloads read through a
+byte-bounded LRU cache in OBJECT_CACHE_DIR (local disk or tmpfs) instead of
+fetching the object from Supabase every time:
+
+    path = get_object_cache().fetch(bucket_name, remote_path, fetch_remote)
+    if path:
+        return send_file(path, ...)
+
+- A miss downloads the object once into a temporary file and renames it
+  into place, so a reader never sees a partial file.
+- Concurrent misses for the same object wait for that one download
+  (single-flight) instead of each fetching it.
+- The least recently used objects are removed once the cache holds more
+  than OBJECT_CACHE_SIZE bytes; objects over OBJECT_CACHE_MAX_OBJECT bytes
+  are never cached.
+- Deleting an object from storage removes it from the cache.
+
+Processes on the same host can share the directory: files are named by
+object and written atomically, and a process picks up files that another one
+cached. Each process keeps its own LRU order and hit statistics (exported as
+`lnsp_object_cache` on /metrics).
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+
+# Temporary files left behind by a crash mid-download are removed after this long
+STALE_TEMP_SECONDS = 60 * 60
+TEMP_PREFIX = '.tmp-'
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+class ObjectCache:
+    """
+    Thread-safe, byte-bounded LRU cache of objects stored as files.
+
+    Args:
+        root: Directory holding the cached files
+        max_bytes: Total size kept on disk before the least recently used
+            files are removed
+        max_object_bytes: Larger objects are passed through, not cached
+        fill_timeout: Seconds a request waits for another request that is
+            already downloading the same object
+    """
+
+    def __init__(self, root, max_bytes, max_object_bytes=None, fill_timeout=60):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_object_bytes = min(max_object_bytes or max_bytes, max_bytes)
+        self.fill_timeout = fill_timeout
+        self._entries = OrderedDict()  # file name -> size, least recently used first
+        self._size = 0
+        self._filling = {}  # file name -> Event set when its download finishes
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'bypassed': 0, 'fill_errors': 0,
+                       'evictions': 0, 'bytes_served': 0, 'bytes_fetched': 0}
+        os.makedirs(root, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        """Index files already in the directory (oldest first), dropping stale temporary files"""
+        files = []
+        for entry in os.scandir(self.root):
+            if not entry.is_file():
+                continue
+            stat = entry.stat()
+            if entry.name.startswith(TEMP_PREFIX):
+                if stat.st_mtime < time.time() - STALE_TEMP_SECONDS:
+                    _remove(entry.path)
+                continue
+            files.append((stat.st_mtime, entry.name, stat.st_size))
+        with self._lock:
+            for _, name, size in sorted(files):
+                self._entries[name] = size
+                self._size += size
+            self._evict()
+
+    @staticmethod
+    def _name(bucket_name, object_path):
+        return hashlib.sha256(f'{bucket_name}/{object_path}'.encode()).hexdigest()
+
+    def _path(self, name):
+        return os.path.join(self.root, name)
+
+    def _lookup(self, name):
+        """Path of a cached file (marking it recently used), or None"""
+        path = self._path(name)
+        with self._lock:
+            if name in self._entries:
+                if os.path.exists(path):
+                    self._entries.move_to_end(name)
+                    return path
+                # Removed by another process
+                self._size -= self._entries.pop(name)
+                return None
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return None
+        # Cached by another process sharing the directory
+        with self._lock:
+            if name not in self._entries:
+                self._entries[name] = size
+                self._size += size
+                self._evict(keep=name)
+        return path
+
+    def fetch(self, bucket_name, object_path, fetch, size=None):
+        """
+        Path of the cached copy of an object, downloading it on a miss.
+
+        Args:
+            bucket_name: The bucket the object lives in
+            object_path: The path of the object in the bucket
+            fetch: Called on a miss; returns (expected size or None, iterator of chunks)
+            size: The object's size if known, so oversized objects skip the cache early
+
+        Returns:
+            The file path, or None if the object isn't cached (too large, or
+            the download failed); the caller then serves it from storage
+        """
+        if size is not None and size > self.max_object_bytes:
+            self._count('bypassed')
+            return None
+
+        name = self._name(bucket_name, object_path)
+        path = self._lookup(name)
+        if path:
+            self._count('hits')
+            return path
+
+        with self._lock:
+            filling = self._filling.get(name)
+            if filling is None:
+                filling = self._filling[name] = threading.Event()
+                leader = True
+            else:
+                leader = False
+
+        if not leader:
+            # Another request is downloading this object; use its copy
+            filling.wait(self.fill_timeout)
+            path = self._lookup(name)
+            self._count('coalesced' if path else 'bypassed')
+            return path
+
+        self._count('misses')
+        try:
+            return self._fill(name, fetch)
+        except Exception:
+            self._count('fill_errors')
+            raise
+        finally:
+            with self._lock:
+                del self._filling[name]
+            filling.set()
+
+    def _fill(self, name, fetch):
+        expected, chunks = fetch()
+        if expected is not None and expected > self.max_object_bytes:
+            _close(chunks)
+            self._count('bypassed')
+            return None
+
+        fd, temp_path = tempfile.mkstemp(prefix=TEMP_PREFIX, dir=self.root)
+        written = 0
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    written += len(chunk)
+                    if written > self.max_object_bytes:
+                        _close(chunks)
+                        _remove(temp_path)
+                        self._count('bypassed')
+                        return None
+                    f.write(chunk)
+            if expected is not None and written != expected:
+                raise IOError(f'Incomplete download: {written} of {expected} bytes')
+            os.replace(temp_path, self._path(name))
+        except BaseException:
+            _remove(temp_path)
+            raise
+
+        with self._lock:
+            self._size += written - self._entries.pop(name, 0)
+            self._entries[name] = written
+            self._stats['bytes_fetched'] += written
+            self._evict(keep=name)
+        return self._path(name)
+
+    def _evict(self, keep=None):
+        """Remove least recently used files until under max_bytes (caller holds the lock)"""
+        while self._size > self.max_bytes and self._entries:
+            name, size = next(iter(self._entries.items()))
+            if name == keep:
+                if len(self._entries) == 1:
+                    break
+                self._entries.move_to_end(name)
+                continue
+            del self._entries[name]
+            self._size -= size
+            self._stats['evictions'] += 1
+            # Open readers keep their copy until they finish
+            _remove(self._path(name))
+
+    def invalidate(self, bucket_name, object_path):
+        """Remove an object's cached copy (e.g. after it was deleted from storage)"""
+        name = self._name(bucket_name, object_path)
+        with self._lock:
+            self._size -= self._entries.pop(name, 0)
+        _remove(self._path(name))
+
+    def record_served(self, size):
+        """Count bytes sent to clients from cached files"""
+        with self._lock:
+            self._stats['bytes_served'] += size
+
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def stats(self):
+        """Hit/miss counters, hit ratio and bytes served and stored"""
+        with self._lock:
+            stats = dict(self._stats, entries=len(self._entries), bytes_stored=self._size,
+                         max_bytes=self.max_bytes)
+        lookups = stats['hits'] + stats['coalesced'] + stats['misses']
+        stats['hit_ratio'] = (stats['hits'] + stats['coalesced']) / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        with self._lock:
+            names = list(self._entries)
+            self._entries.clear()
+            self._size = 0
+        for name in names:
+            _remove(self._path(name))
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _close(chunks):
+    close = getattr(chunks, 'close', None)
+    if close:
+        close()
+
+
+def get_object_cache():
+    """The process-wide object cache, or None when OBJECT_CACHE_SIZE is 0"""
+    global _cache
+    max_bytes = current_app.config.get('OBJECT_CACHE_SIZE', 0)
+    if not max_bytes:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ObjectCache(
+                    current_app.config['OBJECT_CACHE_DIR'],
+                    max_bytes,
+                    current_app.config.get('OBJECT_CACHE_MAX_OBJECT'),
+                    fill_timeout=current_app.config.get('OBJECT_CACHE_FILL_TIMEOUT', 60)
+                )
+    return _cache
+
+
+def invalidate_cached_object(bucket_name, object_path):
+    """Drop an object's cached copy, if the cache is enabled"""
+    cache = get_object_cache()
+    if cache is not None:
+        cache.invalidate(bucket_name, object_path)
+
+
+def peek_object_cache():
+    """The object cache if this process has created it, without creating it"""
+    return _cache
+
+
+def _reset_cache():
+    """Forked children rebuild the index from the directory instead of sharing locks"""
+    global _cache, _cache_lock
+    _cache = None
+    _cache_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_cache)
@@ -0,0 +1,194 @@
+"""
+Keyset (cursor) pagination for note listings.
+
+OFFSET pagination reads and discards every row before the requested page and
+needs a COUNT(*) to render page links, so deep pages get linearly slower.
+Keyset pagination instead remembers the sort key of the last row shown,
+`(upload_date, id)`, and asks for rows strictly after it. Backed by a
+composite index, every page costs the same no matter how deep it is.
+
+The course catalog is paged the same way on `course_code`.
+
+Cursors are opaque, URL-safe tokens so templates can render them as-is.
+"""
+
+import base64
+import json
+from datetime import datetime
+from flask import current_app, request
+from app import db
+from app.cache import TTLCache
+from app.models import Note, Course
+
+# Approximate totals shown next to keyset listings
+_count_cache = TTLCache(maxsize=256)
+
+
+class KeysetPage:
+    """A page of notes plus the cursors needed to move forwards and backwards"""
+
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None, total=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def _encode(payload):
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _decode(cursor):
+    return json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+
+
+def encode_cursor(direction, note):
+    """Build an opaque cursor pointing before/after the given note"""
+    return _encode([direction, note.upload_date.isoformat(), note.id])
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Returns:
+        A (direction, upload_date, note_id) tuple, or None if the cursor is
+        missing or malformed (treated as the first page)
+    """
+    if not cursor:
+        return None
+    try:
+        direction, upload_date, note_id = _decode(cursor)
+        if direction not in ('after', 'before'):
+            return None
+        return direction, datetime.fromisoformat(upload_date), int(note_id)
+    except (ValueError, TypeError):
+        return None
+
+
+def keyset_paginate(query, cursor=None, per_page=10, count_key=None):
+    """
+    Return one page of a Note query ordered newest first.
+
+    Args:
+        query: An unordered Note query (filters already applied)
+        cursor: A cursor from a previous page, or None for the first page
+        per_page: Number of notes per page
+        count_key: If given, an approximate total is computed and cached
+            under this key for PAGINATION_COUNT_TTL seconds
+
+    Returns:
+        A KeysetPage
+    """
+    decoded = decode_cursor(cursor)
+    base_query = query
+    sort_key = db.tuple_(Note.upload_date, Note.id)
+
+    if decoded and decoded[0] == 'before':
+        # Walk backwards from the cursor, then restore newest-first order
+        _, upload_date, note_id = decoded
+        rows = (query.filter(sort_key > (upload_date, note_id))
+                .order_by(Note.upload_date.asc(), Note.id.asc())
+                .limit(per_page + 1).all())
+        has_more_before = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        has_more_after = True
+    else:
+        if decoded:
+            _, upload_date, note_id = decoded
+            query = query.filter(sort_key < (upload_date, note_id))
+        rows = (query.order_by(Note.upload_date.desc(), Note.id.desc())
+                .limit(per_page + 1).all())
+        items = rows[:per_page]
+        has_more_after = len(rows) > per_page
+        has_more_before = decoded is not None
+
+    next_cursor = encode_cursor('after', items[-1]) if items and has_more_after else None
+    prev_cursor = encode_cursor('before', items[0]) if items and has_more_before else None
+
+    total = None
+    if count_key is not None:
+        ttl = current_app.config.get('PAGINATION_COUNT_TTL', 60)
+        total = _count_cache.get_or_set(count_key, base_query.order_by(None).count, ttl=ttl)
+
+    return KeysetPage(items, per_page, next_cursor, prev_cursor, total)
+
+
+def paginate_notes(query, count_key=None):
+    """
+    Paginate an unordered Note query newest first using PAGINATION_MODE.
+
+    Keyset mode reads the `cursor` query argument; offset mode reads `page`.
+    """
+    config = current_app.config
+    per_page = config['NOTES_PER_PAGE']
+
+    if config['PAGINATION_MODE'] == 'keyset':
+        if not config['PAGINATION_SHOW_TOTAL']:
+            count_key = None
+        return keyset_paginate(query, request.args.get('cursor'), per_page, count_key)
+
+    page = request.args.get('page', 1, type=int)
+    return query.order_by(Note.upload_date.desc(), Note.id.desc()).paginate(page=page, per_page=per_page)
+
+
+def encode_course_cursor(direction, course_code):
+    """Build an opaque cursor pointing before/after the given course"""
+    return _encode([direction, course_code])
+
+
+def keyset_paginate_courses(query, cursor=None, per_page=25):
+    """
+    Return one page of a Course query in course code order.
+    Cursors work as in keyset_paginate, keyed on the course code alone.
+
+    Returns:
+        A KeysetPage
+    """
+    try:
+        direction, course_code = _decode(cursor) if cursor else (None, None)
+        if direction not in ('after', 'before') or not isinstance(course_code, str):
+            direction = None
+    except (ValueError, TypeError):
+        direction = None
+
+    if direction == 'before':
+        rows = (query.filter(Course.course_code < course_code)
+                .order_by(Course.course_code.desc())
+                .limit(per_page + 1).all())
+        has_more_before = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        has_more_after = True
+    else:
+        if direction:
+            query = query.filter(Course.course_code > course_code)
+        rows = query.order_by(Course.course_code).limit(per_page + 1).all()
+        items = rows[:per_page]
+        has_more_after = len(rows) > per_page
+        has_more_before = direction is not None
+
+    next_cursor = encode_course_cursor('after', items[-1].course_code) if items and has_more_after else None
+    prev_cursor = encode_course_cursor('before', items[0].course_code) if items and has_more_before else None
+    return KeysetPage(items, per_page, next_cursor, prev_cursor)
+
+
+def paginate_courses(query):
+    """Paginate a Course query by course code using PAGINATION_MODE, COURSES_PER_PAGE per page"""
+    config = current_app.config
+    per_page = config['COURSES_PER_PAGE']
+
+    if config['PAGINATION_MODE'] == 'keyset':
+        return keyset_paginate_courses(query, request.args.get('cursor'), per_page)
+
+    page = request.args.get('page', 1, type=int)
+    return query.order_by(Course.course_code).paginate(page=page, per_page=per_page)
@@ -0,0 +1,86 @@
+"""
+Password hashing policy.
+
+The algorithm and work factor come from PASSWORD_HASH_METHOD, in Werkzeug's
+`generate_password_hash` format, e.g. 'scrypt:32768:8:1' or
+'pbkdf2:sha256:600000'. Hashes made under an older policy still verify, and
+are replaced on the user's next successful login (see `needs_rehash`).
+
+Hashing is deliberately CPU-heavy, so it runs in a small per-process thread
+pool (PASSWORD_HASH_WORKERS). During a login storm at most that many hashes
+are computed at once, leaving CPU for other requests. Callers wait at most
+PASSWORD_HASH_QUEUE_TIMEOUT seconds for a free slot before PasswordHashBusy
+is raised.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+_pool_lock = threading.Lock()
+_pool = None
+_pool_pid = None
+_slots = None
+_method_prefixes = {}
+
+
+class PasswordHashBusy(Exception):
+    """Raised when no hashing slot became free within PASSWORD_HASH_QUEUE_TIMEOUT"""
+
+
+def _get_pool():
+    """The hashing pool and its admission semaphore for this process, created on first use"""
+    global _pool, _pool_pid, _slots
+    if _pool is not None and _pool_pid == os.getpid():
+        return _pool, _slots
+
+    # First use, or we are a forked child whose parent's threads didn't survive
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            workers = current_app.config['PASSWORD_HASH_WORKERS']
+            _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+            _slots = threading.BoundedSemaphore(workers)
+            _pool_pid = os.getpid()
+    return _pool, _slots
+
+
+def _run(fn, *args):
+    pool, slots = _get_pool()
+    if not slots.acquire(timeout=current_app.config['PASSWORD_HASH_QUEUE_TIMEOUT']):
+        raise PasswordHashBusy('Too many password checks in progress')
+    try:
+        return pool.submit(fn, *args).result()
+    finally:
+        slots.release()
+
+
+def hash_password(password):
+    """Hash a password with the configured method"""
+    return _run(
+        generate_password_hash,
+        password,
+        current_app.config['PASSWORD_HASH_METHOD'],
+        current_app.config['PASSWORD_SALT_LENGTH']
+    )
+
+
+def verify_password(pwhash, password):
+    """Check a password against a stored hash of any supported method"""
+    return _run(check_password_hash, pwhash, password)
+
+
+def _method_prefix(method):
+    """The full parameter string Werkzeug stores for a method (e.g. 'scrypt' -> 'scrypt:32768:8:1')"""
+    prefix = _method_prefixes.get(method)
+    if prefix is None:
+        # Werkzeug fills in default parameters; hashing once is the reliable way to see them
+        prefix = generate_password_hash('', method, 1).split('$', 1)[0]
+        _method_prefixes[method] = prefix
+    return prefix
+
+
+def needs_rehash(pwhash):
+    """True if a stored hash was made with a different method or work factor than configured"""
+    return pwhash.split('$', 1)[0] != _method_prefix(current_app.config['PASSWORD_HASH_METHOD'])
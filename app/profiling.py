@@ -0,0 +1,72 @@
+"""
+Opt-in cProfile of a single request.
+
+With PROFILING_ENABLED, an operator (a request carrying the METRICS_TOKEN
+bearer token, or anyone while the app runs in debug mode) can add
+`__profile` to any URL to get that request profiled instead of its normal
+response:
+
+    curl -H "Authorization: Bearer $METRICS_TOKEN" "https://host/student/dashboard?__profile=1"
+    curl -H "Authorization: Bearer $METRICS_TOKEN" -o dashboard.prof "https://host/student/dashboard?__profile=prof"
+
+`__profile=1` returns the PROFILE_TOP functions with the highest cumulative
+time as text. `__profile=prof` returns the raw profile, which
+`python -m pstats`, snakeviz or flameprof turn into a call tree or a
+flamegraph.
+"""
+
+import cProfile
+import io
+import marshal
+import pstats
+import time
+from flask import Response, current_app, g, request
+from app.instrumentation import get_query_count, get_query_seconds
+from app.metrics import is_operator
+
+PROFILE_ARG = '__profile'
+
+
+def _wants_profile():
+    if PROFILE_ARG not in request.args or not current_app.config.get('PROFILING_ENABLED'):
+        return False
+    return current_app.debug or is_operator()
+
+
+def _start_profile():
+    if _wants_profile():
+        g.profile_started = time.perf_counter()
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+
+def _finish_profile(response):
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return response
+    profiler.disable()
+    elapsed = time.perf_counter() - g.pop('profile_started')
+
+    if request.args.get(PROFILE_ARG) == 'prof':
+        profiler.create_stats()
+        return Response(
+            marshal.dumps(profiler.stats),
+            mimetype='application/octet-stream',
+            headers={'Content-Disposition': f'attachment; filename="{request.endpoint or "request"}.prof"'}
+        )
+
+    report = io.StringIO()
+    report.write(
+        f'{request.method} {request.full_path} -> {response.status}\n'
+        f'{elapsed * 1000:.1f} ms total, {get_query_count()} SQL statements in {get_query_seconds() * 1000:.1f} ms\n\n'
+    )
+    stats = pstats.Stats(profiler, stream=report)
+    stats.sort_stats('cumulative').print_stats(current_app.config.get('PROFILE_TOP', 40))
+    return Response(report.getvalue(), mimetype='text/plain')
+
+
+def init_app(app):
+    """Profile requests that ask for it (when PROFILING_ENABLED)"""
+    if app.config.get('PROFILING_ENABLED'):
+        app.before_request(_start_profile)
+        app.after_request(_finish_profile)
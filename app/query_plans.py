@@ -0,0 +1,165 @@
+"""
+Query plan checks for the hot note queries.
+
+Each hot query is produced by running the same code the views run (inside a
+transaction that is rolled back) and capturing the SQL it executes. The
+captured statements are then EXPLAINed on the configured database and a
+plan is rejected if it reads a whole table or sorts rows instead of walking
+an index:
+
+- SQLite: `EXPLAIN QUERY PLAN` shows `SCAN <table>` without an index, or
+  `USE TEMP B-TREE` for the ORDER BY.
+- PostgreSQL: `EXPLAIN (FORMAT JSON)` shows a `Seq Scan` or a `Sort` node
+  even with sequential scans and sorts discouraged (the tables of a small
+  database are otherwise always scanned).
+- MySQL: `EXPLAIN` shows access type `ALL` (or `index`) or `Using filesort`.
+
+Run `python check_query_plans.py` after adding a query shape or an index.
+"""
+
+import json
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from sqlalchemy import event
+from app import db
+from app.models import Note, Course, UploadSession
+
+
+class HotQuery:
+    """
+    A query the application runs on every request of some page.
+
+    `run` executes the query through the application's own code. A query
+    with `allow_index_scan` may walk a whole index in order (an unfiltered
+    listing stops after one page); every other query must seek.
+    """
+
+    def __init__(self, name, run, allow_index_scan=False):
+        self.name = name
+        self.run = run
+        self.allow_index_scan = allow_index_scan
+
+
+def get_hot_queries():
+    from app.pagination import keyset_paginate, keyset_paginate_courses, encode_cursor, encode_course_cursor
+    from app.catalog import latest_note
+    from app.bulk import filter_notes
+
+    per_page = 10
+    now = datetime.utcnow()
+    position = SimpleNamespace(upload_date=now, id=1)
+    after, before = encode_cursor('after', position), encode_cursor('before', position)
+    course_after = encode_course_cursor('after', 'CSC101')
+    listing = lambda: Note.query.options(db.joinedload(Note.uploader))
+    by_lecturer = lambda: Note.query.filter_by(uploaded_by=1)
+    by_course = lambda: Note.query.options(db.joinedload(Note.uploader)).filter_by(course_code='CSC101')
+
+    return [
+        HotQuery('student dashboard', lambda: keyset_paginate(listing(), None, per_page), allow_index_scan=True),
+        HotQuery('student dashboard, next page', lambda: keyset_paginate(listing(), after, per_page)),
+        HotQuery('student dashboard, previous page', lambda: keyset_paginate(listing(), before, per_page)),
+        HotQuery('lecturer dashboard', lambda: keyset_paginate(by_lecturer(), None, per_page)),
+        HotQuery('lecturer dashboard, next page', lambda: keyset_paginate(by_lecturer(), after, per_page)),
+        HotQuery('course page', lambda: keyset_paginate(by_course(), None, per_page)),
+        HotQuery('course page, next page', lambda: keyset_paginate(by_course(), after, per_page)),
+        HotQuery('course list', lambda: keyset_paginate_courses(Course.query, None, 25), allow_index_scan=True),
+        HotQuery('course list, next page', lambda: keyset_paginate_courses(Course.query, course_after, 25)),
+        HotQuery('note download', lambda: db.session.get(Note, 1)),
+        HotQuery('notes sharing a file', lambda: Note.query.filter_by(blob_digest='0' * 64).all()),
+        HotQuery('latest note of a course', lambda: latest_note('CSC101')),
+        HotQuery('stale upload sessions',
+                 lambda: UploadSession.query.filter(UploadSession.created_at < now - timedelta(days=1)).all()),
+        HotQuery('bulk delete by course and date',
+                 lambda: filter_notes('CSC101', now - timedelta(days=30), now).with_entities(Note.id).all()),
+    ]
+
+
+@contextmanager
+def capture_statements():
+    """Collect the (statement, parameters) of every SELECT run inside the block"""
+    captured = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            captured.append((statement, parameters))
+
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield captured
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def explain(connection, statement, parameters):
+    """The plan of one statement as a list of human-readable lines"""
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+        return [row[-1] for row in rows]
+    if dialect == 'postgresql':
+        connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+        connection.exec_driver_sql('SET LOCAL enable_sort = off')
+        plan = connection.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {statement}', parameters).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return list(_pg_nodes(plan[0]['Plan']))
+    if dialect == 'mysql':
+        result = connection.exec_driver_sql(f'EXPLAIN {statement}', parameters)
+        return [
+            f"{row['table']}: type={row['type']} key={row['key']} extra={row['Extra']}"
+            for row in result.mappings()
+        ]
+    raise ValueError(f'Query plan checks are not supported on {dialect}')
+
+
+def _pg_nodes(node, depth=0):
+    relation = f" on {node['Relation Name']}" if 'Relation Name' in node else ''
+    index = f" using {node['Index Name']}" if 'Index Name' in node else ''
+    yield f"{'  ' * depth}{node['Node Type']}{relation}{index}"
+    for child in node.get('Plans', []):
+        yield from _pg_nodes(child, depth + 1)
+
+
+def plan_problems(plan, allow_index_scan=False):
+    """Lines of a plan that show a full table scan or an explicit sort"""
+    problems = []
+    for line in plan:
+        detail = line.strip()
+        if detail.startswith('SCAN '):
+            # SQLite: "SCAN notes" reads the table; "SCAN notes USING INDEX ..." walks an index
+            if ' USING ' not in detail or not allow_index_scan:
+                problems.append(detail)
+        elif detail.startswith('USE TEMP B-TREE'):
+            problems.append(detail)
+        elif detail.startswith(('Seq Scan', 'Sort', 'Incremental Sort')):
+            problems.append(detail)
+        elif ': type=ALL ' in detail or 'Using filesort' in detail:
+            problems.append(detail)
+        elif ': type=index ' in detail and not allow_index_scan:
+            # MySQL: a full index scan
+            problems.append(detail)
+    return problems
+
+
+def check_query_plans(queries=None):
+    """
+    EXPLAIN every hot query.
+
+    Returns:
+        A list of (name, plan, problems) tuples, one per captured statement
+    """
+    results = []
+    for query in queries or get_hot_queries():
+        with capture_statements() as captured:
+            query.run()
+        db.session.rollback()
+
+        with db.engine.connect() as connection:
+            for statement, parameters in captured:
+                with connection.begin() as transaction:
+                    plan = explain(connection, statement, parameters)
+                    transaction.rollback()
+                results.append((query.name, plan, plan_problems(plan, query.allow_index_scan)))
+    return results
@@ -0,0 +1,127 @@
+"""
+Read-replica routing.
+
+With DATABASE_REPLICA_URLS set, views marked `@use_replica` (dashboards,
+course pages, the note lookup of downloads) run their SELECTs on a replica.
+Everything else goes to the primary: other views, flushes, INSERT/UPDATE/
+DELETE statements, SELECT ... FOR UPDATE, reads made after the request has
+written, and work outside a request (job workers, CLI scripts).
+
+    @student_bp.route('/dashboard')
+    @login_required
+    @use_replica
+    def dashboard():
+        ...
+
+    with replica_reads():
+        user = load_from_database()
+
+Replicas lag behind the primary, so a client that has just written (e.g.
+uploaded or deleted a note) reads from the primary for the next
+REPLICA_STICKY_SECONDS and sees its own change. The deadline lives in the
+signed session cookie, so it holds across processes.
+
+The routing is done by `RoutingSession`, the session class of `db.session`.
+"""
+
+import random
+import time
+from contextlib import contextmanager
+from functools import wraps
+import sqlalchemy as sa
+from flask import current_app, g, has_request_context, session
+from flask_sqlalchemy.session import Session
+
+STICKY_KEY = '_primary_until'
+
+
+class RoutingSession(Session):
+    """A session that sends reads to a replica when the current request allows it"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if _is_write(clause):
+                self.info['wrote'] = True
+            elif not self._flushing and not self.info.get('wrote') and reads_from_replica():
+                engine = _replica_engine(self._db)
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _is_write(clause):
+    if isinstance(clause, sa.UpdateBase):
+        return True
+    if isinstance(clause, sa.Select):
+        return clause._for_update_arg is not None
+    if isinstance(clause, sa.TextClause):
+        return not clause.text.lstrip().upper().startswith('SELECT')
+    return False
+
+
+def _replica_engine(db):
+    keys = current_app.config.get('DB_REPLICA_BINDS')
+    if not keys:
+        return None
+    # One replica per request, so its reads see one consistent snapshot
+    if 'replica_bind' not in g:
+        g.replica_bind = random.choice(keys)
+    return db.engines[g.replica_bind]
+
+
+def reads_from_replica():
+    """Whether reads in the current context may go to a replica"""
+    if not has_request_context() or not g.get('replica_reads') or g.get('db_wrote'):
+        return False
+    return session.get(STICKY_KEY, 0) <= time.time()
+
+
+def use_replica(f):
+    """Let a read-only view read from a replica"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        with replica_reads():
+            return f(*args, **kwargs)
+    return decorated_function
+
+
+@contextmanager
+def replica_reads():
+    """Let reads inside the block go to a replica (within a request)"""
+    previous = g.get('replica_reads', False)
+    g.replica_reads = True
+    try:
+        yield
+    finally:
+        g.replica_reads = previous
+
+
+def _after_flush(db_session, flush_context):
+    db_session.info['wrote'] = True
+
+
+def _after_commit(db_session):
+    if db_session.info.pop('wrote', False) and has_request_context():
+        g.db_wrote = True
+
+
+def _after_rollback(db_session):
+    db_session.info.pop('wrote', None)
+
+
+def init_app(app):
+    """Track writes and keep clients that wrote on the primary for a while"""
+    if not sa.event.contains(RoutingSession, 'after_flush', _after_flush):
+        sa.event.listen(RoutingSession, 'after_flush', _after_flush)
+        sa.event.listen(RoutingSession, 'after_commit', _after_commit)
+        sa.event.listen(RoutingSession, 'after_rollback', _after_rollback)
+
+    if not app.config.get('DB_REPLICA_BINDS'):
+        return
+
+    @app.after_request
+    def stick_to_primary(response):
+        sticky_seconds = app.config.get('REPLICA_STICKY_SECONDS', 0)
+        if g.get('db_wrote') and sticky_seconds:
+            session[STICKY_KEY] = time.time() + sticky_seconds
+        return response
@@ -2,6 +2,8 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_user, logout_user, login_required, current_user
 from app import db
 from app.models import User
+from app.identity import Identity, remember_identity, forget_user
+from app.passwords import PasswordHashBusy
 from functools import wraps
 
 auth_bp = Blueprint('auth', __name__)
@@ -63,7 +65,11 @@ def register():
         
         # Create new user
         user = User(name=name, email=email, role=role)
-        user.set_password(password)
+        try:
+            user.set_password(password)
+        except PasswordHashBusy:
+            flash('The server is busy. Please try again in a moment.', 'error')
+            return redirect(url_for('auth.register'))
         db.session.add(user)
         db.session.commit()
         
@@ -91,8 +97,19 @@ def login():
         
         user = User.query.filter_by(email=email).first()
         
-        if user and user.check_password(password):
+        try:
+            valid = user is not None and user.check_password(password)
+            if valid and user.password_needs_rehash():
+                # Upgrade hashes made under an older policy while we have the password
+                user.set_password(password)
+                db.session.commit()
+        except PasswordHashBusy:
+            flash('The server is busy. Please try again in a moment.', 'error')
+            return redirect(url_for('auth.login'))
+        
+        if valid:
             login_user(user)
+            remember_identity(Identity.from_user(user))
             flash(f'Welcome back, {user.name}!', 'success')
             
             # Redirect based on role
@@ -110,6 +127,7 @@ def login():
 @login_required
 def logout():
     """User logout"""
+    forget_user(current_user.id)
     logout_user()
     flash('You have been logged out.', 'success')
     return redirect(url_for('index'))
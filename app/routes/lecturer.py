@@ -1,104 +1,290 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, jsonify
 from flask_login import login_required, current_user
 from app import db
-from app.models import Note
+from app.models import Note, UploadSession
 from app.routes.auth import lecturer_required
+from app.search import index_note, unindex_note
+from app.pagination import paginate_notes
+from app.storage import validate_upload, staging_path, stage_stream, hash_file, acquire_blob, release_note_file
+from app.jobs import notify
+from app.bulk import import_notes, items_from_zip, make_item, read_manifest, check_batch_limits, filter_notes, delete_notes
+from app.replicas import use_replica
+from app.http_cache import conditional_page, bump_notes_version, NOTES_VERSION
+from app.catalog import record_notes_added, record_notes_removed
+from app.download_stats import get_download_counts, forget_notes, downloads_version
+from app.fragment_cache import cached_fragment
 from werkzeug.utils import secure_filename
 import os
-from datetime import datetime
-import io
+import uuid
+import zipfile
+from datetime import datetime, timedelta
 
 lecturer_bp = Blueprint('lecturer', __name__, url_prefix='/lecturer')
 
-def allowed_file(filename):
-    """Check if file extension is allowed"""
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
-
-def is_using_supabase():
-    """Check if Supabase is configured"""
-    return os.environ.get('SUPABASE_URL') and os.environ.get('SUPABASE_KEY')
+def create_note(course_title, course_code, original_filename, staged, digest, size):
+    """
+    Create note record in database for a staged upload.
+    The file is stored once per content digest; any transfer to remote
+    storage is queued in the same transaction and runs in the background.
+    """
+    blob = acquire_blob(staged, digest, size)
+    note = Note(
+        course_title=course_title,
+        course_code=course_code,
+        filename=original_filename,
+        file_path=blob.file_path,  # A local path, later a Supabase URL
+        blob_digest=digest,
+        file_size=size,
+        uploaded_by=current_user.id
+    )
+    db.session.add(note)
+    db.session.flush()
+    index_note(note)
+    record_notes_added([note])
+    bump_notes_version()
+    db.session.commit()
+    notify()
+    return note
 
 @lecturer_bp.route('/dashboard')
 @login_required
 @lecturer_required
+@use_replica
+@conditional_page(NOTES_VERSION, lambda: downloads_version(current_user.id))
 def dashboard():
     """Lecturer dashboard - list and manage notes"""
-    page = request.args.get('page', 1, type=int)
-    notes = Note.query.filter_by(uploaded_by=current_user.id).order_by(Note.upload_date.desc()).paginate(page=page, per_page=10)
-    return render_template('lecturer_dashboard.html', notes=notes)
+    def render_listing():
+        query = Note.query.filter_by(uploaded_by=current_user.id)
+        notes = paginate_notes(query, count_key=('lecturer', current_user.id))
+        downloads = get_download_counts([note.id for note in notes.items])
+        return render_template('_lecturer_notes.html', notes=notes, downloads=downloads)
+    
+    # Rendered once per page until notes or download counts change
+    listing = cached_fragment(
+        'lecturer_notes',
+        (current_user.id, request.args.get('cursor', ''), request.args.get('page', 1, type=int)),
+        (NOTES_VERSION, downloads_version(current_user.id)),
+        render_listing
+    )
+    return render_template('lecturer_dashboard.html', listing=listing)
 
 @lecturer_bp.route('/upload', methods=['GET', 'POST'])
 @login_required
 @lecturer_required
 def upload():
-    """Upload a new lecture note"""
+    """Upload a new lecture note (single request; see upload sessions for large files)"""
     if request.method == 'POST':
         course_title = request.form.get('course_title', '').strip()
         course_code = request.form.get('course_code', '').strip()
         file = request.files.get('file')
         
         # Validation
-        if not all([course_title, course_code, file]):
-            flash('All fields are required.', 'error')
-            return redirect(url_for('lecturer.upload'))
-        
-        if file.filename == '':
+        if file is None or file.filename == '':
             flash('No file selected.', 'error')
             return redirect(url_for('lecturer.upload'))
         
-        if not allowed_file(file.filename):
-            flash('Only PDF and DOCX files are allowed.', 'error')
+        error = validate_upload(course_title, course_code, file.filename)
+        if error:
+            flash(error, 'error')
             return redirect(url_for('lecturer.upload'))
         
         # Secure the filename
         original_filename = secure_filename(file.filename)
-        # Add timestamp to make filename unique
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_')
-        filename = timestamp + original_filename
         
-        # Determine storage location
-        file_path = None
-        
-        if is_using_supabase():
-            # Upload to Supabase Storage
-            try:
-                from app.supabase_client import upload_to_supabase
-                
-                # Read file content
-                file.seek(0)  # Ensure we're at the start of the file
-                file_content = file.read()
-                
-                # Construct the path in Supabase storage
-                supabase_path = f"uploads/{filename}"
-                
-                # Upload and get the public URL
-                file_path = upload_to_supabase(file_content, supabase_path)
-                
-            except Exception as e:
-                flash(f'Failed to upload file to Supabase: {str(e)}', 'error')
-                return redirect(url_for('lecturer.upload'))
-        else:
-            # Save file to local filesystem
-            filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
-            file_path = filepath
-        
-        # Create note record in database
-        note = Note(
-            course_title=course_title,
-            course_code=course_code,
-            filename=original_filename,
-            file_path=file_path,  # This can be a local path or a Supabase URL
-            uploaded_by=current_user.id
-        )
-        db.session.add(note)
-        db.session.commit()
+        # Stage on disk in chunks, hashing as we go, then hand over to storage
+        staged, digest, size = stage_stream(file.stream)
+        create_note(course_title, course_code, original_filename, staged, digest, size)
         
         flash('Lecture note uploaded successfully!', 'success')
         return redirect(url_for('lecturer.dashboard'))
     
     return render_template('upload.html')
 
+@lecturer_bp.route('/upload/batch', methods=['POST'])
+@login_required
+@lecturer_required
+def batch_upload():
+    """
+    Upload many lecture notes at once.
+    Accepts several `files` (zip archives are expanded), default course
+    fields and an optional CSV `manifest` giving each file its own course.
+    Returns a JSON report with one result per file.
+    """
+    course_title = request.form.get('course_title', '').strip()
+    course_code = request.form.get('course_code', '').strip()
+    files = [f for f in request.files.getlist('files') if f.filename]
+    
+    manifest = None
+    manifest_file = request.files.get('manifest')
+    if manifest_file and manifest_file.filename:
+        manifest = read_manifest(manifest_file.read().decode('utf-8-sig'))
+    
+    items = []
+    for file in files:
+        if file.filename.lower().endswith('.zip'):
+            try:
+                archive = zipfile.ZipFile(file.stream)
+            except zipfile.BadZipFile:
+                return jsonify(error=f'{secure_filename(file.filename)} is not a valid zip archive.'), 400
+            items.extend(items_from_zip(archive, course_title, course_code, manifest))
+        else:
+            items.append(make_item(file.filename, lambda file=file: file.stream, course_title, course_code, manifest))
+    
+    if not items:
+        return jsonify(error='No files selected.'), 400
+    
+    error = check_batch_limits(items)
+    if error:
+        return jsonify(error=error), 413
+    
+    results = import_notes(items, current_user.id)
+    imported = sum(result.ok for result in results)
+    return jsonify(
+        imported=imported,
+        failed=len(results) - imported,
+        results=[result.to_dict() for result in results]
+    ), 201 if imported else 400
+
+def purge_stale_upload_sessions():
+    """Remove upload sessions (and their staged data) abandoned for longer than UPLOAD_SESSION_TTL"""
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['UPLOAD_SESSION_TTL'])
+    stale = UploadSession.query.filter(UploadSession.created_at < cutoff).all()
+    for upload_session in stale:
+        staged = staging_path(upload_session.id)
+        if os.path.exists(staged):
+            os.remove(staged)
+        db.session.delete(upload_session)
+    if stale:
+        db.session.commit()
+
+def get_upload_session(session_id):
+    """Fetch an upload session owned by the current user, or 404"""
+    return UploadSession.query.filter_by(id=session_id, user_id=current_user.id).first_or_404()
+
+@lecturer_bp.route('/upload/sessions', methods=['POST'])
+@login_required
+@lecturer_required
+def create_upload_session():
+    """Start a resumable chunked upload"""
+    course_title = request.form.get('course_title', '').strip()
+    course_code = request.form.get('course_code', '').strip()
+    filename = request.form.get('filename', '').strip()
+    total_size = request.form.get('size', type=int)
+    
+    error = validate_upload(course_title, course_code, filename)
+    if error:
+        return jsonify(error=error), 400
+    
+    if not total_size or total_size <= 0:
+        return jsonify(error='File size is required.'), 400
+    
+    if total_size > current_app.config['MAX_UPLOAD_SIZE']:
+        return jsonify(error='File is too large.'), 413
+    
+    purge_stale_upload_sessions()
+    
+    upload_session = UploadSession(
+        id=uuid.uuid4().hex,
+        user_id=current_user.id,
+        course_title=course_title,
+        course_code=course_code,
+        filename=secure_filename(filename),
+        total_size=total_size
+    )
+    db.session.add(upload_session)
+    db.session.commit()
+    
+    # Create the empty staging file so chunks can be written at any offset
+    open(staging_path(upload_session.id), 'wb').close()
+    
+    return jsonify(
+        session_id=upload_session.id,
+        offset=0,
+        chunk_size=current_app.config['UPLOAD_CHUNK_SIZE']
+    ), 201
+
+@lecturer_bp.route('/upload/sessions/<session_id>', methods=['GET'])
+@login_required
+@lecturer_required
+def upload_session_status(session_id):
+    """Report how many bytes have been acknowledged, so a client can resume"""
+    upload_session = get_upload_session(session_id)
+    return jsonify(
+        session_id=upload_session.id,
+        offset=upload_session.received_size,
+        size=upload_session.total_size,
+        chunk_size=current_app.config['UPLOAD_CHUNK_SIZE']
+    )
+
+@lecturer_bp.route('/upload/sessions/<session_id>', methods=['PUT'])
+@login_required
+@lecturer_required
+def upload_chunk(session_id):
+    """
+    Append one chunk at ?offset=N.
+    The offset must equal the acknowledged size; otherwise 409 returns the
+    offset the client should resume from.
+    """
+    upload_session = get_upload_session(session_id)
+    offset = request.args.get('offset', type=int)
+    
+    if offset != upload_session.received_size:
+        return jsonify(error='Unexpected offset.', offset=upload_session.received_size), 409
+    
+    remaining = upload_session.total_size - offset
+    too_large = jsonify(error='Chunk exceeds declared file size.', offset=upload_session.received_size), 413
+    if (request.content_length or 0) > remaining:
+        return too_large
+    
+    # Copy the body in small blocks, never past the declared size (a chunked
+    # body has no Content-Length to check up front). A partially received
+    # chunk is simply overwritten when the client retries from the
+    # acknowledged offset
+    written = 0
+    with open(staging_path(upload_session.id), 'r+b') as f:
+        f.seek(offset)
+        while True:
+            block = request.stream.read(min(64 * 1024, remaining - written + 1))
+            if not block:
+                break
+            if written + len(block) > remaining:
+                f.truncate(offset)
+                return too_large
+            f.write(block)
+            written += len(block)
+        f.truncate()
+    
+    upload_session.received_size = offset + written
+    db.session.commit()
+    
+    return jsonify(session_id=upload_session.id, offset=upload_session.received_size)
+
+@lecturer_bp.route('/upload/sessions/<session_id>/complete', methods=['POST'])
+@login_required
+@lecturer_required
+def complete_upload_session(session_id):
+    """Move a fully received upload into storage and create its note"""
+    upload_session = get_upload_session(session_id)
+    
+    if upload_session.received_size != upload_session.total_size:
+        return jsonify(error='Upload is incomplete.', offset=upload_session.received_size), 409
+    
+    # Chunks may be rewritten on retry, so the file is hashed once here
+    staged = staging_path(upload_session.id)
+    digest, size = hash_file(staged)
+    db.session.delete(upload_session)
+    create_note(
+        upload_session.course_title,
+        upload_session.course_code,
+        upload_session.filename,
+        staged,
+        digest,
+        size
+    )
+    
+    flash('Lecture note uploaded successfully!', 'success')
+    return jsonify(redirect=url_for('lecturer.dashboard'))
+
 @lecturer_bp.route('/delete/<int:note_id>', methods=['POST'])
 @login_required
 @lecturer_required
@@ -111,26 +297,48 @@ def delete_note(note_id):
         flash('You do not have permission to delete this note.', 'error')
         return redirect(url_for('lecturer.dashboard'))
     
-    # Delete file from storage
-    if is_using_supabase():
-        # Delete from Supabase Storage
-        try:
-            from app.supabase_client import delete_from_supabase
-            
-            # Extract the path from the stored file_path (which may be a full URL)
-            # For Supabase URLs like: https://xxx.supabase.co/storage/v1/object/public/lecture-notes/uploads/file.pdf
-            # We need to extract: uploads/file.pdf
-            if 'supabase.co' in note.file_path:
-                # Extract path from Supabase URL
-                bucket_name = os.environ.get('SUPABASE_BUCKET_NAME', 'lecture-notes')
-                # Find the position after the bucket name
-                marker = f'/{bucket_name}/'
-                if marker in note.file_path:
-                    supabase_path = note.file_path.split(marker)[-1]
-                    delete_from_supabase(supabase_path, bucket_name)
-        except Exception as e:
-            flash(f'Warning: Failed to delete file from Supabase: {str(e)}', 'warning')
+    # Delete database record and its search index entry; the stored file
+    # is removed by a background job (retried if storage is unavailable)
+    # once no other note shares it
+    unindex_note(note.id)
+    forget_notes([note.id])
+    db.session.delete(note)
+    release_note_file(note)
+    record_notes_removed([note])
+    bump_notes_version()
+    db.session.commit()
+    notify()
+    
+    flash('Lecture note deleted successfully!', 'success')
+    return redirect(url_for('lecturer.dashboard'))
+
+@lecturer_bp.route('/delete/bulk', methods=['POST'])
+@login_required
+@lecturer_required
+def bulk_delete_notes():
+    """Delete all of the current lecturer's notes for a course and/or upload date range"""
+    course_code = request.form.get('course_code', '').strip()
+    try:
+        since = parse_form_date(request.form.get('since'))
+        until = parse_form_date(request.form.get('until'))
+    except ValueError:
+        flash('Dates must be in YYYY-MM-DD format.', 'error')
+        return redirect(url_for('lecturer.dashboard'))
+    
+    if not (course_code or since or until):
+        flash('Choose a course code or date range to delete.', 'error')
+        return redirect(url_for('lecturer.dashboard'))
+    
+    query = filter_notes(course_code=course_code, since=since, until=until, uploader_id=current_user.id)
+    deleted, _, _ = delete_notes(query)
+    
+    if deleted:
+        flash(f'{deleted} lecture note(s) deleted successfully!', 'success')
     else:
-        # Delete from local filesystem
-        if os.path.exists(note.file_path):
-            os.remove(note.file_path)
+        flash('No lecture notes matched.', 'error')
+    return redirect(url_for('lecturer.dashboard'))
+
+def parse_form_date(value):
+    """Parse an optional YYYY-MM-DD form field"""
+    value = (value or '').strip()
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
@@ -1,80 +1,213 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file, current_app, Response, stream_with_context
 from flask_login import login_required, current_user
-from app.models import Note
+from app import db
+from app.models import Note, Course
 from app.routes.auth import student_required
+from app.search import search_notes
+from app.pagination import paginate_notes, paginate_courses
+from app.storage import get_remote_path, get_bucket_name
+from app.replicas import use_replica
+from app.http_cache import conditional_page, note_not_modified, note_etag, range_applies, set_note_validators, NOTES_VERSION
+from app.download_stats import record_download, get_popular_notes, POPULAR_VERSION
+from app.file_offload import offload_file
+from app.fragment_cache import cached_fragment
+import mimetypes
 import os
-import io
+from urllib.parse import urlencode
 
 student_bp = Blueprint('student', __name__, url_prefix='/student')
 
-def is_using_supabase():
-    """Check if Supabase is configured"""
-    return os.environ.get('SUPABASE_URL') and os.environ.get('SUPABASE_KEY')
-
 @student_bp.route('/dashboard')
 @login_required
 @student_required
+@use_replica
+@conditional_page(NOTES_VERSION, POPULAR_VERSION)
 def dashboard():
     """Student dashboard - list and download notes"""
     page = request.args.get('page', 1, type=int)
     search_course = request.args.get('search', '', type=str).strip()
     
-    query = Note.query
+    def render_listing():
+        # Load each note's uploader in the same query; the table shows their name
+        query = Note.query.options(db.joinedload(Note.uploader))
+        
+        if search_course:
+            # Ranked full-text search over course code, title and filename.
+            # Relevance order can't be keyed on (upload_date, id), so search
+            # results always use numbered pages.
+            per_page = current_app.config['NOTES_PER_PAGE']
+            notes = search_notes(query, search_course).paginate(page=page, per_page=per_page)
+        else:
+            notes = paginate_notes(query, count_key=('student',))
+        return render_template('_student_notes.html', notes=notes, search_course=search_course)
     
-    # Filter by course code if search term provided
-    if search_course:
-        query = query.filter(
-            (Note.course_code.ilike(f'%{search_course}%')) |
-            (Note.course_title.ilike(f'%{search_course}%'))
-        )
+    # The same for every student: rendered once per page and search until notes change
+    listing = cached_fragment(
+        'student_notes',
+        (search_course, request.args.get('cursor', ''), page),
+        (NOTES_VERSION,),
+        render_listing
+    )
     
-    notes = query.order_by(Note.upload_date.desc()).paginate(page=page, per_page=10)
+    # Precomputed ranking (see app/download_stats.py)
+    popular_notes = [] if search_course else get_popular_notes()
     
-    return render_template('student_dashboard.html', notes=notes, search_course=search_course)
+    return render_template('student_dashboard.html', listing=listing, search_course=search_course,
+                           popular_notes=popular_notes)
+
+@student_bp.route('/courses')
+@login_required
+@student_required
+@use_replica
+@conditional_page(NOTES_VERSION)
+def courses():
+    """Browse courses, read from the precomputed course catalog"""
+    courses = paginate_courses(Course.query)
+    return render_template('courses.html', courses=courses)
+
+@student_bp.route('/courses/<course_code>')
+@login_required
+@student_required
+@use_replica
+@conditional_page(NOTES_VERSION)
+def course_notes(course_code):
+    """A course's notes, newest first"""
+    course = Course.query.get_or_404(course_code)
+    query = Note.query.options(db.joinedload(Note.uploader)).filter_by(course_code=course.course_code)
+    notes = paginate_notes(query, count_key=('course', course.course_code))
+    return render_template('course_notes.html', course=course, notes=notes)
 
 @student_bp.route('/download/<int:note_id>')
 @login_required
 @student_required
+@use_replica
 def download_note(note_id):
     """Download a lecture note"""
     note = Note.query.get_or_404(note_id)
     
+    # Files never change once uploaded, so a client that already has this
+    # one is answered without touching storage
+    not_modified = note_not_modified(note)
+    if not_modified is not None:
+        return not_modified
+    
+    # Counted in memory and written in batches; resumed downloads aren't counted again
+    if 'Range' not in request.headers:
+        record_download(note.id)
+    
     try:
-        if is_using_supabase():
-            # Download from Supabase Storage
-            from app.supabase_client import download_from_supabase
+        remote_path = get_remote_path(note.file_path)
+        if remote_path:
+            from app.supabase_client import stream_from_supabase, get_cached_signed_url
             
-            # Extract the path from the stored file_path (which may be a full URL)
-            if 'supabase.co' in note.file_path:
-                # Extract path from Supabase URL
-                bucket_name = os.environ.get('SUPABASE_BUCKET_NAME', 'lecture-notes')
-                marker = f'/{bucket_name}/'
-                if marker in note.file_path:
-                    supabase_path = note.file_path.split(marker)[-1]
-                    file_content = download_from_supabase(supabase_path, bucket_name)
-                    
-                    # Return the file as an attachment
-                    return send_file(
-                        io.BytesIO(file_content),
-                        as_attachment=True,
-                        download_name=note.filename
-                    )
+            bucket_name = get_bucket_name()
+            if current_app.config['DOWNLOAD_MODE'] == 'redirect':
+                # Hand the transfer to Supabase; the worker only authorizes
+                signed_url = get_cached_signed_url(
+                    remote_path,
+                    bucket_name,
+                    expires_in=current_app.config['SIGNED_URL_EXPIRES_IN'],
+                    refresh_margin=current_app.config['SIGNED_URL_REFRESH_MARGIN']
+                )
+                separator = '&' if '?' in signed_url else '?'
+                return redirect(f"{signed_url}{separator}{urlencode({'download': note.filename})}", code=302)
             
-            # If we couldn't extract the path, try to use the URL directly
-            # This shouldn't normally happen, but fall back to the URL
-            flash('File path format unexpected. Please contact support.', 'error')
-            return redirect(url_for('student.dashboard'))
-        else:
-            # Download from local filesystem
-            if not os.path.exists(note.file_path):
-                flash('File not found.', 'error')
-                return redirect(url_for('student.dashboard'))
+            # Serve popular files from the local object cache, fetching each
+            # from Supabase once
+            response = send_cached_object(note, remote_path, bucket_name)
+            if response is not None:
+                return response
             
-            return send_file(
-                note.file_path,
-                as_attachment=True,
-                download_name=note.filename
+            # Stream from Supabase Storage chunk by chunk.
+            # Range/If-Range are forwarded so interrupted downloads can resume
+            range_header = request.headers.get('Range')
+            if_range = request.headers.get('If-Range')
+            if note.blob_digest or (if_range and not if_range.startswith(('"', 'W/'))):
+                # The validators are ours (content digest, upload date), so
+                # If-Range is settled here rather than by Supabase
+                if not range_applies(note):
+                    range_header = None
+                if_range = None
+            status, headers, chunks = stream_from_supabase(
+                remote_path,
+                bucket_name,
+                range_header=range_header,
+                if_range=if_range,
+                chunk_size=current_app.config['DOWNLOAD_CHUNK_SIZE']
             )
+            response = Response(
+                stream_with_context(chunks),
+                status=status,
+                # Blobs are stored without an extension, so storage's type is meaningless
+                mimetype=mimetypes.guess_type(note.filename)[0] or 'application/octet-stream',
+                direct_passthrough=True
+            )
+            for name in ('Content-Length', 'Content-Range', 'ETag'):
+                if name in headers:
+                    response.headers[name] = headers[name]
+            set_note_validators(response, note)
+            response.headers['Accept-Ranges'] = 'bytes'
+            response.headers.set('Content-Disposition', 'attachment', filename=note.filename)
+            return response
+        
+        # Download from local filesystem (also covers files still waiting
+        # for their background upload to Supabase)
+        if not os.path.exists(note.file_path):
+            flash('File not found.', 'error')
+            return redirect(url_for('student.dashboard'))
+        
+        # Authorized: let the front proxy send the bytes, if configured
+        response = offload_file(note.file_path, note.filename)
+        if response is not None:
+            return set_note_validators(response, note)
+        
+        response = send_file(
+            note.file_path,
+            as_attachment=True,
+            download_name=note.filename,
+            etag=note_etag(note) or True,
+            last_modified=note.upload_date
+        )
+        return set_note_validators(response, note)
     except Exception as e:
         flash(f'Error downloading file: {str(e)}', 'error')
         return redirect(url_for('student.dashboard'))
+
+def send_cached_object(note, remote_path, bucket_name):
+    """Send a note's file from the object cache, or None to stream it from storage instead"""
+    from app.object_cache import get_object_cache
+    from app.supabase_client import stream_from_supabase
+    
+    cache = get_object_cache()
+    if cache is None:
+        return None
+    
+    def fetch():
+        status, headers, chunks = stream_from_supabase(
+            remote_path, bucket_name, chunk_size=current_app.config['DOWNLOAD_CHUNK_SIZE']
+        )
+        size = headers.get('Content-Length')
+        return (int(size) if size else None), chunks
+    
+    try:
+        path = cache.fetch(bucket_name, remote_path, fetch, size=note.file_size)
+    except Exception as e:
+        current_app.logger.warning('Object cache fill failed for %s: %s', remote_path, e)
+        return None
+    if path is None:
+        return None
+    
+    try:
+        # Range requests are answered from the cached file
+        response = send_file(
+            path,
+            as_attachment=True,
+            download_name=note.filename,
+            etag=note_etag(note) or True,
+            last_modified=note.upload_date
+        )
+    except FileNotFoundError:
+        # Evicted in the meantime
+        return None
+    cache.record_served(response.content_length or 0)
+    return set_note_validators(response, note)
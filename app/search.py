@@ -0,0 +1,209 @@
+"""
+Full-text search over lecture notes.
+
+Course code, course title and filename are indexed with the native full-text
+engine of the configured database:
+- SQLite: an FTS5 virtual table (`notes_fts`) keyed by note id.
+- PostgreSQL: GIN indexes on a `tsvector` expression and on `pg_trgm` trigrams.
+- Anything else (e.g. MySQL) falls back to the original ILIKE scan.
+
+Results are ranked by relevance and every search token is prefix-matched, so
+typing "intro pyt" finds "Introduction to Python".
+"""
+
+import re
+from app import db
+from app.models import Note
+
+FTS_TABLE = 'notes_fts'
+
+# Text indexed on PostgreSQL. The query expressions below must match the
+# index expressions (the same SQL without the table qualifier) for the
+# planner to use the GIN indexes.
+PG_DOCUMENT_SQL = (
+    "coalesce(notes.course_code, '') || ' ' || "
+    "coalesce(notes.course_title, '') || ' ' || "
+    "coalesce(notes.filename, '')"
+)
+PG_TSVECTOR_SQL = f"to_tsvector('simple', {PG_DOCUMENT_SQL})"
+
+# Detected backend per engine: 'fts5', 'postgres', 'postgres_trgm' or None
+_backends = {}
+
+
+def _tokenize(term):
+    """Split a search term into lowercase word tokens"""
+    return re.findall(r'\w+', term.lower())
+
+
+def _unqualified(sql):
+    """Strip the table qualifier for use in CREATE INDEX expressions"""
+    return sql.replace('notes.', '')
+
+
+def get_search_backend():
+    """Return the search backend available on the current database engine"""
+    engine = db.engine
+    if engine not in _backends:
+        _backends[engine] = _detect_backend(engine)
+    return _backends[engine]
+
+
+def _detect_backend(engine):
+    dialect = engine.dialect.name
+    with engine.connect() as conn:
+        if dialect == 'sqlite':
+            found = conn.execute(
+                db.text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {'name': FTS_TABLE}
+            ).first()
+            return 'fts5' if found else None
+        if dialect == 'postgresql':
+            found = conn.execute(
+                db.text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            ).first()
+            return 'postgres_trgm' if found else 'postgres'
+    return None
+
+
+def ensure_search_index():
+    """
+    Create the search index for the current database and backfill it.
+    Safe to run repeatedly; called from init_db.py.
+    """
+    engine = db.engine
+    dialect = engine.dialect.name
+
+    if dialect == 'sqlite':
+        db.session.execute(db.text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            "course_code, course_title, filename, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        ))
+        db.session.commit()
+        _backends.pop(engine, None)
+        rebuild_search_index()
+    elif dialect == 'postgresql':
+        try:
+            db.session.execute(db.text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            db.session.commit()
+        except Exception:
+            # Managed databases may not allow extensions; tsvector search still works
+            db.session.rollback()
+        db.session.execute(db.text(
+            f"CREATE INDEX IF NOT EXISTS ix_notes_search_tsv ON notes USING GIN (({_unqualified(PG_TSVECTOR_SQL)}))"
+        ))
+        db.session.commit()
+        _backends.pop(engine, None)
+        if get_search_backend() == 'postgres_trgm':
+            db.session.execute(db.text(
+                f"CREATE INDEX IF NOT EXISTS ix_notes_search_trgm ON notes USING GIN (({_unqualified(PG_DOCUMENT_SQL)}) gin_trgm_ops)"
+            ))
+            db.session.commit()
+
+    _backends.pop(engine, None)
+
+
+def rebuild_search_index():
+    """Repopulate the SQLite FTS table from the notes table"""
+    if get_search_backend() != 'fts5':
+        return
+    db.session.execute(db.text(f"DELETE FROM {FTS_TABLE}"))
+    db.session.execute(db.text(
+        f"INSERT INTO {FTS_TABLE} (rowid, course_code, course_title, filename) "
+        "SELECT id, course_code, course_title, filename FROM notes"
+    ))
+    db.session.commit()
+
+
+def index_note(note):
+    """
+    Add or refresh a note in the search index.
+    Runs in the caller's transaction; the note must have been flushed.
+    PostgreSQL indexes are maintained by the database itself.
+    """
+    index_notes([note])
+
+
+def index_notes(notes):
+    """Add or refresh many notes in the search index with one batched statement each"""
+    if not notes or get_search_backend() != 'fts5':
+        return
+    db.session.execute(
+        db.text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"),
+        [{'id': note.id} for note in notes]
+    )
+    db.session.execute(
+        db.text(
+            f"INSERT INTO {FTS_TABLE} (rowid, course_code, course_title, filename) "
+            "VALUES (:id, :course_code, :course_title, :filename)"
+        ),
+        [
+            {
+                'id': note.id,
+                'course_code': note.course_code,
+                'course_title': note.course_title,
+                'filename': note.filename,
+            }
+            for note in notes
+        ]
+    )
+
+
+def unindex_note(note_id):
+    """Remove a note from the search index (runs in the caller's transaction)"""
+    unindex_notes([note_id])
+
+
+def unindex_notes(note_ids):
+    """Remove many notes from the search index with one batched statement"""
+    if not note_ids or get_search_backend() != 'fts5':
+        return
+    db.session.execute(
+        db.text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"),
+        [{'id': note_id} for note_id in note_ids]
+    )
+
+
+def search_notes(query, term):
+    """
+    Filter a Note query by a search term and order it by relevance.
+
+    Args:
+        query: A Note query to filter
+        term: The raw search string typed by the user
+
+    Returns:
+        The filtered query, best matches first and newest first within ties
+    """
+    tokens = _tokenize(term)
+    backend = get_search_backend() if tokens else None
+
+    if backend == 'fts5':
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        ranked = db.text(
+            f"SELECT rowid AS note_id, bm25({FTS_TABLE}) AS rank "
+            f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match"
+        ).columns(note_id=db.Integer, rank=db.Float).bindparams(match=match).subquery()
+        return query.join(ranked, Note.id == ranked.c.note_id).order_by(
+            ranked.c.rank, Note.upload_date.desc()
+        )
+
+    if backend in ('postgres', 'postgres_trgm'):
+        tsvector = db.literal_column(PG_TSVECTOR_SQL)
+        tsquery = db.func.to_tsquery('simple', ' & '.join(f'{token}:*' for token in tokens))
+        condition = tsvector.op('@@')(tsquery)
+        rank = db.func.ts_rank(tsvector, tsquery)
+        if backend == 'postgres_trgm':
+            # Trigram similarity also catches typos and partial course codes
+            document = db.literal_column(f'({PG_DOCUMENT_SQL})')
+            condition = condition | document.op('%')(term)
+            rank = rank + db.func.similarity(document, term)
+        return query.filter(condition).order_by(rank.desc(), Note.upload_date.desc())
+
+    # No full-text support available: unindexed substring scan
+    return query.filter(
+        (Note.course_code.ilike(f'%{term}%')) |
+        (Note.course_title.ilike(f'%{term}%')) |
+        (Note.filename.ilike(f'%{term}%'))
+    ).order_by(Note.upload_date.desc())
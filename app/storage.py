@@ -0,0 +1,348 @@
+"""
+Note file storage.
+
+Files are content-addressed: each upload is hashed (SHA-256) while it is
+written to a local staging file, and stored once per digest as a blob
+(`blobs/<digest>` in UPLOAD_FOLDER or in the Supabase bucket). Notes with the
+same content share the blob, which is reference-counted and removed when
+the last note using it is deleted. The digest doubles as a strong ETag.
+
+Transfers to Supabase and all deletes run as background jobs (app/jobs.py),
+so requests don't wait on remote storage. Until its upload job has run, a
+blob's file_path points at the staged local copy, which downloads serve.
+"""
+
+import collections
+import hashlib
+import os
+import tempfile
+import uuid
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.jobs import job_handler, enqueue
+from app.models import Note, Blob
+from app.object_cache import invalidate_cached_object
+
+COPY_BLOCK_SIZE = 64 * 1024
+# Values per IN (...) list in batched statements
+IN_CLAUSE_SIZE = 500
+
+
+def is_using_supabase():
+    """Check if Supabase is configured"""
+    return os.environ.get('SUPABASE_URL') and os.environ.get('SUPABASE_KEY')
+
+
+def get_bucket_name():
+    return os.environ.get('SUPABASE_BUCKET_NAME', 'lecture-notes')
+
+
+def get_remote_path(file_path):
+    """Object path in the Supabase bucket for a stored file_path, or None for local files"""
+    if not is_using_supabase():
+        return None
+    from app.supabase_client import get_storage_path
+    return get_storage_path(file_path, get_bucket_name())
+
+
+def get_staging_dir():
+    """
+    Directory for in-progress uploads: UPLOAD_STAGING_DIR, else UPLOAD_FOLDER/.partial
+    (local blobs are moved from there into UPLOAD_FOLDER), or with Supabase a
+    temp directory, since UPLOAD_FOLDER may be read-only (e.g. on Vercel)
+    """
+    folder = current_app.config['UPLOAD_STAGING_DIR']
+    if folder:
+        return folder
+    if is_using_supabase():
+        return os.path.join(tempfile.gettempdir(), 'lnsp-staging')
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], '.partial')
+
+
+def staging_path(name):
+    """Path of a staging file for an in-progress upload"""
+    folder = get_staging_dir()
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, name)
+
+
+def allowed_file(filename):
+    """Check if file extension is allowed"""
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
+
+
+def validate_upload(course_title, course_code, filename):
+    """Validate upload fields; returns an error message or None"""
+    if not all([course_title, course_code, filename]):
+        return 'All fields are required.'
+
+    if not allowed_file(filename):
+        return 'Only PDF and DOCX files are allowed.'
+
+    return None
+
+
+def stage_stream(stream, max_size=None):
+    """
+    Copy an upload stream to a new staging file, hashing it on the way.
+
+    Args:
+        stream: A binary file-like object
+        max_size: Optional size limit in bytes; ValueError is raised (and
+            the staging file removed) if the stream is longer
+
+    Returns:
+        A (staged_path, digest, size) tuple
+    """
+    path = staging_path(uuid.uuid4().hex)
+    sha256 = hashlib.sha256()
+    size = 0
+    with open(path, 'wb') as f:
+        while True:
+            block = stream.read(COPY_BLOCK_SIZE)
+            if not block:
+                break
+            size += len(block)
+            if max_size is not None and size > max_size:
+                f.close()
+                os.remove(path)
+                raise ValueError('File is too large.')
+            sha256.update(block)
+            f.write(block)
+    return path, sha256.hexdigest(), size
+
+
+def hash_file(path):
+    """SHA-256 digest and size of a file, read in blocks"""
+    sha256 = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(COPY_BLOCK_SIZE)
+            if not block:
+                break
+            sha256.update(block)
+            size += len(block)
+    return sha256.hexdigest(), size
+
+
+def acquire_blob(staged, digest, size, stored_path=None):
+    """
+    Take a reference to the blob for a staged upload, storing it if new.
+    Runs in the caller's transaction.
+
+    An existing blob just gains a reference and the staged copy is
+    discarded. A new blob is moved into UPLOAD_FOLDER/blobs, or queued for
+    upload to Supabase unless the caller already uploaded it (stored_path,
+    see upload_blob_now()).
+
+    Returns:
+        The Blob
+    """
+    # Bump the count in SQL so concurrent uploads of the same file don't race
+    referenced = Blob.query.filter_by(digest=digest).update({'ref_count': Blob.ref_count + 1})
+    if referenced:
+        os.remove(staged)
+        return db.session.get(Blob, digest)
+
+    if stored_path is not None:
+        file_path = stored_path
+    elif is_using_supabase():
+        file_path = staged
+    else:
+        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'blobs', digest[:2], digest)
+
+    blob = Blob(digest=digest, file_path=file_path, size=size, ref_count=1)
+    try:
+        with db.session.begin_nested():
+            db.session.add(blob)
+    except IntegrityError:
+        # Another request stored the same content first; share its blob
+        Blob.query.filter_by(digest=digest).update({'ref_count': Blob.ref_count + 1})
+        os.remove(staged)
+        return db.session.get(Blob, digest)
+
+    if stored_path is not None:
+        os.remove(staged)
+    elif is_using_supabase():
+        enqueue('blob.upload', digest=digest)
+    else:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        os.replace(staged, file_path)
+    return blob
+
+
+def upload_blob_now(staged, digest):
+    """
+    Upload a staged file to Supabase right away, for callers that upload
+    many files in parallel themselves (see app/bulk.py).
+
+    Returns:
+        The stored file_path to pass to acquire_blob(), or None with local storage
+    """
+    if not is_using_supabase():
+        return None
+    from app.supabase_client import upload_to_supabase
+
+    with open(staged, 'rb') as f:
+        return upload_to_supabase(f, f"blobs/{digest}", get_bucket_name(), upsert=True)
+
+
+def release_note_file(note):
+    """
+    Drop a deleted note's reference to its file; the file itself is removed
+    in the background once no note refers to it. Call after
+    db.session.delete(note), in the same transaction.
+    """
+    if note.blob_digest is None:
+        # Stored before content addressing: the note owns its file
+        enqueue('storage.delete', file_path=note.file_path)
+        return
+
+    # Flush the note's delete first so the blob row is no longer referenced
+    db.session.flush()
+    digest = note.blob_digest
+    Blob.query.filter_by(digest=digest).update({'ref_count': Blob.ref_count - 1})
+    file_path = db.session.execute(
+        db.select(Blob.file_path).where(Blob.digest == digest, Blob.ref_count <= 0)
+    ).scalar()
+    # Conditional, so a blob re-referenced in the meantime is kept
+    if file_path is not None and Blob.query.filter(Blob.digest == digest, Blob.ref_count <= 0).delete():
+        enqueue('storage.delete', file_path=file_path, digest=digest)
+
+
+def release_note_files(rows):
+    """
+    Batch form of release_note_file() for notes already deleted in the
+    caller's transaction; `rows` are their (file_path, blob_digest) pairs.
+    Files no longer referenced are queued for deletion in batches of
+    STORAGE_DELETE_BATCH_SIZE.
+
+    Returns:
+        A (files_queued, job_ids) tuple; job_ids are the storage.delete_batch
+        jobs removing them
+    """
+    batch_size = current_app.config['STORAGE_DELETE_BATCH_SIZE']
+    files = [{'file_path': file_path} for file_path, digest in rows if digest is None]
+
+    # One UPDATE per distinct number of released references (usually just 1)
+    released = collections.Counter(digest for _, digest in rows if digest is not None)
+    by_count = collections.defaultdict(list)
+    for digest, count in released.items():
+        by_count[count].append(digest)
+    for count, digests in by_count.items():
+        for i in range(0, len(digests), IN_CLAUSE_SIZE):
+            Blob.query.filter(Blob.digest.in_(digests[i:i + IN_CLAUSE_SIZE])).update(
+                {'ref_count': Blob.ref_count - count}, synchronize_session=False
+            )
+
+    digests = list(released)
+    for i in range(0, len(digests), IN_CLAUSE_SIZE):
+        orphaned = db.and_(Blob.digest.in_(digests[i:i + IN_CLAUSE_SIZE]), Blob.ref_count <= 0)
+        files += [
+            {'file_path': file_path, 'digest': digest}
+            for digest, file_path in db.session.execute(db.select(Blob.digest, Blob.file_path).where(orphaned))
+        ]
+        # Blobs re-referenced since the select are kept; the delete job skips them
+        Blob.query.filter(orphaned).delete(synchronize_session=False)
+
+    jobs = [
+        enqueue('storage.delete_batch', files=files[i:i + batch_size])
+        for i in range(0, len(files), batch_size)
+    ]
+    db.session.flush()
+    return len(files), [job.id for job in jobs]
+
+
+def delete_note_files(file_paths):
+    """
+    Delete many stored files. Supabase objects go in a single remove() call.
+    Raises after trying every file if any could not be deleted.
+    """
+    remote_paths = []
+    errors = []
+    for file_path in file_paths:
+        remote_path = get_remote_path(file_path)
+        if remote_path:
+            remote_paths.append(remote_path)
+            continue
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            errors.append(f'{file_path}: {e}')
+
+    if remote_paths:
+        from app.supabase_client import delete_from_supabase, invalidate_signed_url
+
+        bucket_name = get_bucket_name()
+        for remote_path in remote_paths:
+            invalidate_signed_url(remote_path, bucket_name)
+            invalidate_cached_object(bucket_name, remote_path)
+        delete_from_supabase(remote_paths, bucket_name)
+
+    if errors:
+        raise Exception(f"Failed to delete {len(errors)} file(s): {'; '.join(errors)}")
+
+
+def delete_note_file(file_path):
+    """
+    Delete a stored file from wherever it lives.
+    Raises on storage errors; a file that is already gone is not an error.
+    """
+    remote_path = get_remote_path(file_path)
+    if remote_path:
+        from app.supabase_client import delete_from_supabase, invalidate_signed_url
+
+        bucket_name = get_bucket_name()
+        invalidate_signed_url(remote_path, bucket_name)
+        invalidate_cached_object(bucket_name, remote_path)
+        delete_from_supabase(remote_path, bucket_name)
+    elif os.path.exists(file_path):
+        os.remove(file_path)
+
+
+@job_handler('blob.upload')
+def upload_blob(digest):
+    """Push a staged blob to Supabase and point the blob and its notes at it"""
+    from app.supabase_client import upload_to_supabase
+
+    blob = db.session.get(Blob, digest)
+    if blob is None or get_remote_path(blob.file_path):
+        # Released before we got to it (its delete job removes the staged
+        # file), or already uploaded by an earlier attempt
+        return
+
+    staged = blob.file_path
+    # The open file is streamed to Supabase rather than read into memory;
+    # upsert makes a retry after a half-finished attempt safe
+    with open(staged, 'rb') as f:
+        file_path = upload_to_supabase(f, f"blobs/{digest}", get_bucket_name(), upsert=True)
+
+    updated = Blob.query.filter_by(digest=digest, file_path=staged).update({'file_path': file_path})
+    Note.query.filter_by(blob_digest=digest).update({'file_path': file_path})
+    db.session.commit()
+    if updated:
+        os.remove(staged)
+    else:
+        # The blob was released while we were uploading
+        delete_note_file(file_path)
+
+
+@job_handler('storage.delete')
+def delete_note_file_job(file_path, digest=None):
+    if digest is not None and db.session.get(Blob, digest) is not None:
+        # The same content was uploaded again after this blob was released
+        # and now lives at the same path; keep it
+        return
+    delete_note_file(file_path)
+
+
+@job_handler('storage.delete_batch')
+def delete_note_files_job(files):
+    # Deleting twice is harmless, so a failed batch is simply retried whole
+    digests = [f['digest'] for f in files if f.get('digest')]
+    alive = set(db.session.scalars(db.select(Blob.digest).where(Blob.digest.in_(digests)))) if digests else set()
+    delete_note_files([f['file_path'] for f in files if f.get('digest') not in alive])
@@ -4,14 +4,30 @@ Provides storage bucket access for uploading and downloading lecture notes.
 """
 
 import os
-from supabase import create_client, Client
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Union
+import httpx
+from storage3 import SyncStorageClient
+from storage3.utils import SyncClient as StorageSession
+from supabase import Client, ClientOptions
+from app.cache import TTLCache
+from app.metrics import STORAGE_CALL_SECONDS, STORAGE_CALL_ERRORS, STORAGE_BYTES
 
-# Initialize Supabase client if credentials are available
-def get_supabase_client() -> Client:
-    """
-    Create and return a Supabase client.
-    Requires SUPABASE_URL and SUPABASE_KEY environment variables.
-    """
+# One SDK client and one pooled HTTP client per process, created on first use.
+# Reusing them keeps connections alive across uploads, downloads and deletes
+# instead of paying a new TLS handshake and client setup on every call.
+_client_lock = threading.Lock()
+_supabase_client = None
+_storage_http_client = None
+
+# Signed URLs issued per object, reused until shortly before they expire
+_signed_url_cache = TTLCache(maxsize=4096)
+_signed_url_stats = {'generated': 0, 'reused': 0}
+_signed_url_stats_lock = threading.Lock()
+
+def _get_credentials():
     supabase_url = os.environ.get('SUPABASE_URL')
     supabase_key = os.environ.get('SUPABASE_KEY')
     
@@ -20,26 +36,158 @@ def get_supabase_client() -> Client:
             "SUPABASE_URL and SUPABASE_KEY environment variables are required for Supabase integration."
         )
     
-    return create_client(supabase_url, supabase_key)
+    return supabase_url, supabase_key
+
+def _get_timeout() -> httpx.Timeout:
+    """Request timeout from SUPABASE_TIMEOUT / SUPABASE_CONNECT_TIMEOUT (seconds)"""
+    return httpx.Timeout(
+        float(os.environ.get('SUPABASE_TIMEOUT', 30)),
+        connect=float(os.environ.get('SUPABASE_CONNECT_TIMEOUT', 5))
+    )
+
+def _get_pool_limits() -> httpx.Limits:
+    """Keep-alive pool of SUPABASE_POOL_SIZE connections (default: 10)"""
+    pool_size = int(os.environ.get('SUPABASE_POOL_SIZE', 10))
+    return httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+
+class _PooledStorageClient(SyncStorageClient):
+    """storage3's client with its HTTP session sized by SUPABASE_POOL_SIZE"""
+
+    def _create_session(self, base_url, headers, timeout, verify=True):
+        # Same settings as storage3's own session, plus the pool limits
+        return StorageSession(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            verify=bool(verify),
+            follow_redirects=True,
+            http2=True,
+            limits=_get_pool_limits(),
+        )
+
+class _PooledClient(Client):
+    """Supabase client whose storage calls (upload, delete, sign) use _PooledStorageClient"""
+
+    @staticmethod
+    def _init_storage_client(storage_url, headers, storage_client_timeout):
+        return _PooledStorageClient(storage_url, headers, storage_client_timeout)
+
+def _reset_clients():
+    """
+    Forget the process-wide clients without closing them.
+    Runs in forked children (e.g. gunicorn prefork workers) so they never
+    share the parent's sockets; each child lazily creates its own clients.
+    """
+    global _client_lock, _supabase_client, _storage_http_client
+    _client_lock = threading.Lock()
+    _supabase_client = None
+    _storage_http_client = None
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_clients)
+
+@contextmanager
+def _timed_call(operation: str):
+    """Record the duration (and failure) of a storage call in the /metrics histograms"""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STORAGE_CALL_ERRORS.inc(operation=operation)
+        raise
+    finally:
+        STORAGE_CALL_SECONDS.observe(time.perf_counter() - started, operation=operation)
+
+def _content_length(file_content) -> int:
+    """Size of bytes or of the rest of an open file"""
+    if isinstance(file_content, (bytes, bytearray)):
+        return len(file_content)
+    try:
+        return os.fstat(file_content.fileno()).st_size - file_content.tell()
+    except (AttributeError, OSError, ValueError):
+        return 0
+
+def get_supabase_client() -> Client:
+    """
+    Return the process-wide Supabase client, creating it on first use.
+    Requires SUPABASE_URL and SUPABASE_KEY environment variables.
+    
+    Its storage session holds up to SUPABASE_POOL_SIZE connections, like
+    the direct client from _get_storage_http_client.
+    """
+    global _supabase_client
+    if _supabase_client is None:
+        supabase_url, supabase_key = _get_credentials()
+        with _client_lock:
+            if _supabase_client is None:
+                options = ClientOptions(
+                    auto_refresh_token=False,
+                    persist_session=False,
+                    storage_client_timeout=_get_timeout()
+                )
+                _supabase_client = _PooledClient.create(supabase_url, supabase_key, options)
+    return _supabase_client
+
+def get_storage_path(file_url: str, bucket_name: str = 'lecture-notes'):
+    """
+    Extract the object path inside the bucket from a stored public URL.
+    
+    For URLs like: https://xxx.supabase.co/storage/v1/object/public/lecture-notes/uploads/file.pdf
+    this returns: uploads/file.pdf
+    
+    Returns:
+        The path in the bucket, or None if the URL is not a storage URL for this bucket
+    """
+    marker = f'/object/public/{bucket_name}/'
+    if marker not in file_url:
+        return None
+    # get_public_url() may append a (possibly empty) query string
+    return file_url.split(marker, 1)[1].split('?', 1)[0]
+
+def _get_storage_http_client() -> httpx.Client:
+    """
+    Return the process-wide HTTP client for direct calls to the Storage REST API.
+    Used where the SDK only offers whole-object calls (e.g. streaming downloads).
+    
+    The keep-alive pool holds up to SUPABASE_POOL_SIZE connections (default: 10),
+    separate from the SDK client's pool of the same size.
+    """
+    global _storage_http_client
+    if _storage_http_client is None:
+        supabase_url, supabase_key = _get_credentials()
+        with _client_lock:
+            if _storage_http_client is None:
+                _storage_http_client = httpx.Client(
+                    base_url=f"{supabase_url.rstrip('/')}/storage/v1/",
+                    headers={'apikey': supabase_key, 'Authorization': f'Bearer {supabase_key}'},
+                    limits=_get_pool_limits(),
+                    timeout=_get_timeout(),
+                )
+    return _storage_http_client
 
-def upload_to_supabase(file_content: bytes, file_path: str, bucket_name: str = 'lecture-notes') -> str:
+def upload_to_supabase(file_content, file_path: str, bucket_name: str = 'lecture-notes', upsert: bool = False) -> str:
     """
     Upload a file to Supabase Storage.
     
     Args:
-        file_content: The file content as bytes
+        file_content: The file content as bytes, or a file opened with open(path, 'rb')
+            (streamed in chunks instead of being read into memory)
         file_path: The path to store the file in the bucket (e.g., 'uploads/file123.pdf')
         bucket_name: The bucket name (default: 'lecture-notes')
+        upsert: Overwrite an existing object at the same path instead of failing
     
     Returns:
         The full URL of the uploaded file
     """
     try:
-        supabase = get_supabase_client()
-        response = supabase.storage.from_(bucket_name).upload(file_path, file_content)
+        bucket = get_supabase_client().storage.from_(bucket_name)
+        size = _content_length(file_content)
+        with _timed_call('upload'):
+            bucket.upload(file_path, file_content, {'upsert': 'true'} if upsert else None)
+        STORAGE_BYTES.inc(size, operation='upload')
         
         # Return the public URL for the uploaded file
-        return supabase.storage.from_(bucket_name).get_public_url(file_path)
+        return bucket.get_public_url(file_path)
     except Exception as e:
         raise Exception(f"Failed to upload file to Supabase: {str(e)}")
 
@@ -56,22 +204,83 @@ def download_from_supabase(file_path: str, bucket_name: str = 'lecture-notes') -
     """
     try:
         supabase = get_supabase_client()
-        response = supabase.storage.from_(bucket_name).download(file_path)
+        with _timed_call('download'):
+            response = supabase.storage.from_(bucket_name).download(file_path)
+        STORAGE_BYTES.inc(len(response), operation='download')
         return response
     except Exception as e:
         raise Exception(f"Failed to download file from Supabase: {str(e)}")
 
-def delete_from_supabase(file_path: str, bucket_name: str = 'lecture-notes') -> None:
+def stream_from_supabase(file_path: str, bucket_name: str = 'lecture-notes',
+                         range_header: str = None, if_range: str = None, chunk_size: int = 64 * 1024):
     """
-    Delete a file from Supabase Storage.
+    Stream a file from Supabase Storage in fixed-size chunks.
+    
+    Unlike download_from_supabase, the object is never held in memory as a
+    whole: at most one chunk per request is buffered at a time.
     
     Args:
         file_path: The path of the file in the bucket
         bucket_name: The bucket name (default: 'lecture-notes')
+        range_header: An HTTP Range header to forward (e.g. 'bytes=1000-')
+        if_range: An HTTP If-Range header to forward alongside the range
+        chunk_size: Size in bytes of each yielded chunk
+    
+    Returns:
+        A (status_code, headers, chunks) tuple. `chunks` is an iterator of
+        bytes that closes the upstream connection when exhausted or closed.
+    """
+    headers = {}
+    if range_header:
+        headers['Range'] = range_header
+        if if_range:
+            headers['If-Range'] = if_range
+    
+    try:
+        client = _get_storage_http_client()
+        request = client.build_request('GET', f'object/{bucket_name}/{file_path}', headers=headers)
+        # Timed until the response headers arrive; the body is counted as it streams
+        with _timed_call('stream'):
+            response = client.send(request, stream=True)
+    except Exception as e:
+        raise Exception(f"Failed to download file from Supabase: {str(e)}")
+    
+    # 416 (range not satisfiable) is passed through to the caller
+    if response.status_code >= 400 and response.status_code != 416:
+        response.close()
+        STORAGE_CALL_ERRORS.inc(operation='stream')
+        raise Exception(f"Failed to download file from Supabase: HTTP {response.status_code}")
+    
+    def chunks():
+        received = 0
+        try:
+            for chunk in response.iter_bytes(chunk_size):
+                received += len(chunk)
+                yield chunk
+        finally:
+            STORAGE_BYTES.inc(received, operation='stream')
+            # Returns the connection to the pool
+            response.close()
+    
+    return response.status_code, response.headers, chunks()
+
+def delete_from_supabase(file_path: Union[str, List[str]], bucket_name: str = 'lecture-notes') -> None:
+    """
+    Delete one or more files from Supabase Storage.
+    A list is removed with a single API call; paths that don't exist are ignored.
+    
+    Args:
+        file_path: The path of the file in the bucket, or a list of paths
+        bucket_name: The bucket name (default: 'lecture-notes')
     """
+    paths = [file_path] if isinstance(file_path, str) else list(file_path)
+    if not paths:
+        return
+    
     try:
         supabase = get_supabase_client()
-        supabase.storage.from_(bucket_name).remove([file_path])
+        with _timed_call('delete'):
+            supabase.storage.from_(bucket_name).remove(paths)
     except Exception as e:
         raise Exception(f"Failed to delete file from Supabase: {str(e)}")
 
@@ -90,7 +299,45 @@ def get_supabase_signed_url(file_path: str, bucket_name: str = 'lecture-notes',
     """
     try:
         supabase = get_supabase_client()
-        response = supabase.storage.from_(bucket_name).create_signed_url(file_path, expires_in)
+        with _timed_call('sign'):
+            response = supabase.storage.from_(bucket_name).create_signed_url(file_path, expires_in)
         return response['signedURL']
     except Exception as e:
         raise Exception(f"Failed to generate signed URL: {str(e)}")
+
+def get_cached_signed_url(file_path: str, bucket_name: str = 'lecture-notes',
+                          expires_in: int = 3600, refresh_margin: int = 60) -> str:
+    """
+    Return a signed URL for a file, reusing a previously issued one while it is still valid.
+    
+    Args:
+        file_path: The path of the file in the bucket
+        bucket_name: The bucket name (default: 'lecture-notes')
+        expires_in: Lifetime in seconds of newly issued URLs
+        refresh_margin: Stop handing out a cached URL this many seconds before it expires,
+            so clients always get enough time to start the download
+    
+    Returns:
+        The signed URL for the file
+    """
+    key = (bucket_name, file_path)
+    signed_url = _signed_url_cache.get(key)
+    if signed_url is not None:
+        with _signed_url_stats_lock:
+            _signed_url_stats['reused'] += 1
+        return signed_url
+    
+    signed_url = get_supabase_signed_url(file_path, bucket_name, expires_in)
+    _signed_url_cache.set(key, signed_url, ttl=max(expires_in - refresh_margin, 0))
+    with _signed_url_stats_lock:
+        _signed_url_stats['generated'] += 1
+    return signed_url
+
+def invalidate_signed_url(file_path: str, bucket_name: str = 'lecture-notes') -> None:
+    """Drop any cached signed URL for a file (e.g. after it was deleted)"""
+    _signed_url_cache.pop((bucket_name, file_path))
+
+def get_signed_url_stats() -> dict:
+    """Counts of signed URLs generated versus served from the cache"""
+    with _signed_url_stats_lock:
+        return dict(_signed_url_stats)
@@ -0,0 +1,87 @@
+"""
+Precompiled Jinja templates for faster cold starts.
+
+Every new process (each serverless cold start) otherwise parses and compiles
+a template the first time it is rendered. A build step can do that once:
+
+    python compile_templates.py
+
+writes the templates as Python modules (plus their bytecode) to
+PRECOMPILED_TEMPLATES_DIR with a manifest of the source hashes. When the
+manifest matches the templates in app/templates, the app loads templates
+from the compiled modules and falls back to the sources for anything
+missing. A stale or absent build is ignored, and so is any build while
+templates auto-reload (debug mode), since they are being edited.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import py_compile
+import shutil
+from jinja2 import ChoiceLoader, ModuleLoader, TemplateNotFound
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.json'
+
+
+class PrecompiledLoader(ModuleLoader):
+    """Compiled template modules, skipped while templates auto-reload"""
+
+    def load(self, environment, name, globals=None):
+        if environment.auto_reload:
+            # Compiled modules never notice edits to the sources
+            raise TemplateNotFound(name)
+        return super().load(environment, name, globals)
+
+
+def template_hashes(app):
+    """{template name: sha256 of its source} for the app's templates"""
+    loader = app.create_global_jinja_loader()
+    hashes = {}
+    for name in loader.list_templates():
+        source, _, _ = loader.get_source(app.jinja_env, name)
+        hashes[name] = hashlib.sha256(source.encode()).hexdigest()
+    return hashes
+
+
+def compile_templates(app, target):
+    """
+    Compile all templates of the app into `target` (replacing its contents).
+
+    Returns:
+        The number of templates compiled
+    """
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    os.makedirs(target)
+    hashes = template_hashes(app)
+    # Compile from the sources, even if an earlier build is loaded
+    app.jinja_env.loader = app.create_global_jinja_loader()
+    app.jinja_env.compile_templates(target, zip=None, ignore_errors=False)
+    # Bytecode too, so loading a template doesn't even compile Python
+    for name in os.listdir(target):
+        if name.endswith('.py'):
+            py_compile.compile(os.path.join(target, name), doraise=True)
+    with open(os.path.join(target, MANIFEST), 'w') as f:
+        json.dump({'templates': hashes}, f, indent=2, sort_keys=True)
+    return len(hashes)
+
+
+def init_app(app):
+    """Load templates from PRECOMPILED_TEMPLATES_DIR when it matches the sources"""
+    target = app.config.get('PRECOMPILED_TEMPLATES_DIR')
+    if not target:
+        return
+    try:
+        with open(os.path.join(target, MANIFEST)) as f:
+            compiled = json.load(f)['templates']
+    except (OSError, ValueError, KeyError):
+        return
+
+    if compiled != template_hashes(app):
+        logger.warning('Precompiled templates in %s are out of date; run compile_templates.py', target)
+        return
+    app.jinja_env.loader = ChoiceLoader([PrecompiledLoader(target), app.jinja_env.loader])
@@ -0,0 +1,72 @@
+"""
+Importing N files as N single uploads versus one batch upload, with local
+storage and with (mock) Supabase storage 20 ms away.
+
+    python -m benchmarks.bulk_import_benchmark           # 100 files of 64 KB
+    python -m benchmarks.bulk_import_benchmark 300
+"""
+
+import io
+import os
+import sys
+import tempfile
+import time
+from benchmarks.common import make_app, seed_users
+from benchmarks.mock_storage import MockStorageServer, MOCK_KEY
+
+FILE_SIZE = 64 * 1024
+LATENCY = 0.02
+
+
+def make_files(count, seed):
+    """Distinct PDF-ish payloads, so nothing is deduplicated"""
+    return [(f'%PDF-1.4 {seed}-{i}\n'.encode() * (FILE_SIZE // 16))[:FILE_SIZE] for i in range(count)]
+
+
+def run(client, label, count):
+    def single():
+        for i, content in enumerate(make_files(count, f'{label}-single')):
+            response = client.post('/lecturer/upload', data={
+                'course_title': 'Benchmark', 'course_code': 'BEN101',
+                'file': (io.BytesIO(content), f'single_{i}.pdf'),
+            }, content_type='multipart/form-data')
+            assert response.status_code == 302
+
+    def batch():
+        files = [(io.BytesIO(content), f'batch_{i}.pdf')
+                 for i, content in enumerate(make_files(count, f'{label}-batch'))]
+        response = client.post('/lecturer/upload/batch', data={
+            'course_title': 'Benchmark', 'course_code': 'BEN101', 'files': files,
+        }, content_type='multipart/form-data')
+        assert response.status_code == 201 and response.json['failed'] == 0, response.json
+
+    for name, fn in (('single uploads', single), ('batch upload', batch)):
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        print(f'{label:18} {name:16} {elapsed:7.2f} s  {count / elapsed:8.1f} files/s')
+
+
+def main(count):
+    # Jobs run inline so every upload has reached storage when its request returns
+    app = make_app(UPLOAD_FOLDER=tempfile.mkdtemp(prefix='lnsp-bench-uploads-'), JOB_WORKERS=0,
+                   MAX_CONTENT_LENGTH=None)
+    with app.app_context():
+        lecturer_id = seed_users(1)[0]
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(lecturer_id)
+        session['_fresh'] = True
+
+    print(f'{count} files of {FILE_SIZE // 1024} KB')
+    run(client, 'local storage', count)
+
+    server = MockStorageServer(latency=LATENCY).start()
+    os.environ['SUPABASE_URL'] = server.url
+    os.environ['SUPABASE_KEY'] = MOCK_KEY
+    run(client, f'supabase +{int(LATENCY * 1000)} ms', count)
+    server.stop()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100)
@@ -0,0 +1,59 @@
+"""
+Course listing cost as the notes table grows: a GROUP BY over notes versus
+the precomputed courses table, plus one course's first page of notes.
+
+    python -m benchmarks.catalog_benchmark               # 10k, 100k, 300k notes
+    python -m benchmarks.catalog_benchmark 50000 500000
+"""
+
+import sys
+from benchmarks.common import make_app, seed_users, seed_notes, measure, format_stats
+
+PER_PAGE = 25
+
+
+def main(sizes):
+    app = make_app()
+    with app.test_request_context():
+        from app import db
+        from app.models import Note, Course
+        from app.catalog import rebuild_catalog
+        from app.pagination import keyset_paginate
+
+        uploader_ids = seed_users(20)
+        seeded = 0
+        for total in sizes:
+            seed_notes(total - seeded, uploader_ids, offset=seeded)
+            seeded = total
+            rebuild_catalog()
+            course_code = db.session.execute(db.select(Course.course_code).limit(1)).scalar()
+
+            def group_by_notes():
+                # What a course list costs without the catalog
+                return db.session.execute(
+                    db.select(Note.course_code, db.func.count(Note.id), db.func.max(Note.upload_date))
+                    .group_by(Note.course_code)
+                    .order_by(Note.course_code)
+                    .limit(PER_PAGE)
+                ).all()
+
+            def catalog():
+                return Course.query.order_by(Course.course_code).limit(PER_PAGE).all()
+
+            def course_page():
+                return keyset_paginate(Note.query.filter_by(course_code=course_code), None, PER_PAGE)
+
+            results = {
+                'GROUP BY notes': measure(group_by_notes),
+                'courses table': measure(catalog),
+                'one course, page 1': measure(course_page),
+            }
+            db.session.remove()
+
+            print(f'\n== {total:,} notes, {Course.query.count():,} courses ==')
+            for label, stats in results.items():
+                print(f'{label:20} {format_stats(stats)}')
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10000, 100000, 300000])
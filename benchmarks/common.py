@@ -0,0 +1,128 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Benchmarks run against a throwaway SQLite database so they never touch the
+development database. Run them from the project root, e.g.:
+
+    python -m benchmarks.search_benchmark
+"""
+
+import math
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+COURSE_WORDS = [
+    'Introduction', 'Advanced', 'Applied', 'Python', 'Databases', 'Networks',
+    'Algorithms', 'Calculus', 'Statistics', 'Physics', 'Chemistry', 'Biology',
+    'Economics', 'Accounting', 'Law', 'Literature', 'History', 'Security',
+]
+COURSE_PREFIXES = ['CS', 'MTH', 'PHY', 'CHM', 'BIO', 'ECO', 'ACC', 'LAW', 'ENG', 'HIS']
+
+
+def make_app(db_path=None, **overrides):
+    """
+    Create an application bound to a temporary SQLite database.
+
+    Must be called before `config` is imported anywhere, because the
+    database URI is read from the environment at import time.
+    """
+    if db_path is None:
+        fd, db_path = tempfile.mkstemp(prefix='lnsp-bench-', suffix='.db')
+        os.close(fd)
+    os.environ['DB_CONNECTION'] = 'sqlite'
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+
+    from app import create_app, db
+    app = create_app('config.Config')
+    app.config.update(overrides)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def seed_users(count, role='lecturer', password_hash='x'):
+    """Insert `count` users with the given role and return their ids"""
+    from app import db
+    from app.models import User
+
+    ids = []
+    for i in range(count):
+        user = User(name=f'{role.title()} {i}', email=f'{role}{i}@bench.local', role=role)
+        user.password_hash = password_hash
+        db.session.add(user)
+        db.session.flush()
+        ids.append(user.id)
+    db.session.commit()
+    return ids
+
+
+def course_codes(count):
+    """`count` distinct course codes (CS100, MTH100, ..., CS101, ...)"""
+    return [f'{COURSE_PREFIXES[i % len(COURSE_PREFIXES)]}{100 + i // len(COURSE_PREFIXES)}' for i in range(count)]
+
+
+def seed_notes(count, uploader_ids, offset=0, batch_size=10000, courses=None, file_paths=None):
+    """
+    Insert `count` synthetic notes spread over the given uploaders.
+    `offset` continues numbering (and upload dates) from an earlier call,
+    so a database can be grown step by step. `courses` limits the notes to
+    that many distinct course codes; `file_paths` are assigned round-robin
+    (e.g. real files, so the notes can be downloaded).
+    """
+    from app import db
+    from app.models import Note
+
+    rng = random.Random(42 + offset)
+    codes = course_codes(courses) if courses else None
+    start = datetime(2020, 1, 1)
+    rows = []
+    for i in range(offset, offset + count):
+        prefix = rng.choice(COURSE_PREFIXES)
+        title = ' '.join(rng.sample(COURSE_WORDS, 3))
+        rows.append({
+            'course_code': rng.choice(codes) if codes else f'{prefix}{rng.randint(100, 499)}',
+            'course_title': title,
+            'filename': f'week_{rng.randint(1, 14)}_{title.split()[0].lower()}.pdf',
+            'file_path': file_paths[i % len(file_paths)] if file_paths else f'uploads/bench_{i}.pdf',
+            'uploaded_by': rng.choice(uploader_ids),
+            'upload_date': start + timedelta(minutes=i),
+        })
+        if len(rows) >= batch_size:
+            db.session.execute(Note.__table__.insert(), rows)
+            rows = []
+    if rows:
+        db.session.execute(Note.__table__.insert(), rows)
+    db.session.commit()
+
+
+def percentile(sorted_samples, q):
+    """Nearest-rank percentile (0 < q <= 1) of already sorted samples"""
+    if not sorted_samples:
+        return 0.0
+    return sorted_samples[max(math.ceil(q * len(sorted_samples)) - 1, 0)]
+
+
+def measure(fn, repeat=50, warmup=3):
+    """Run `fn` repeatedly and return latency statistics in milliseconds"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        'mean': statistics.mean(samples),
+        'p50': percentile(samples, 0.50),
+        'p95': percentile(samples, 0.95),
+        'p99': percentile(samples, 0.99),
+    }
+
+
+def format_stats(stats):
+    return f"mean {stats['mean']:8.2f} ms  p50 {stats['p50']:8.2f} ms  p95 {stats['p95']:8.2f} ms"
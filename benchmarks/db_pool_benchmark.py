@@ -0,0 +1,178 @@
+"""
+Concurrency limits of the database engine profiles (config.ENGINE_PROFILES).
+
+N threads each run a mix of dashboard reads (one keyset page) and note
+uploads (20%: note row, catalog and version counter in one transaction)
+against one database, at increasing concurrency. Reported per
+level: throughput, p95 latency, "database is locked" errors and pool
+checkout timeouts.
+
+By default three SQLite setups are compared on a throwaway file:
+
+- the engine defaults from before the profiles (rollback journal),
+- the sqlite profile (WAL, busy_timeout, pool of 10 + 10),
+- the sqlite profile squeezed to a pool of 2 + 0 with a 1 s checkout
+  timeout, which shows pool exhaustion.
+
+    python -m benchmarks.db_pool_benchmark
+    python -m benchmarks.db_pool_benchmark 1 8 32 128
+
+To load-test the mysql/postgres/supabase profiles, point DATABASE_URL (and
+DB_CONNECTION) at a scratch database that init_db.py has set up:
+
+    DB_CONNECTION=postgres DATABASE_URL=postgresql://... python -m benchmarks.db_pool_benchmark --configured
+"""
+
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+
+OPERATIONS_PER_THREAD = 50
+WRITE_RATIO = 0.2
+
+
+def profile_options(database_url, **overrides):
+    """The configured profile's engine options for `database_url`, with overrides"""
+    import config
+    profile_name = config.get_engine_profile(config.Config.DB_CONNECTION, database_url)
+    return {**config.build_engine_options(profile_name, database_url), **overrides}
+
+
+def make_profile_app(database_url, engine_options=None, **settings):
+    """An app on `database_url` with the given engine options (default: its profile's)"""
+    os.environ['DATABASE_URL'] = database_url
+    import config
+    from app import create_app, db
+
+    profile = type('ProfileConfig', (config.Config,), {
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'SQLALCHEMY_ENGINE_OPTIONS': profile_options(database_url) if engine_options is None else engine_options,
+        'JOB_WORKERS': 0,
+        **settings,
+    })
+    app = create_app(profile)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def seed(app):
+    from app import db
+    from app.models import User
+    from benchmarks.common import seed_users, seed_notes
+
+    with app.app_context():
+        if User.query.count():
+            return User.query.with_entities(User.id).first()[0]
+        uploader_ids = seed_users(5)
+        seed_notes(2000, uploader_ids)
+        db.session.remove()
+        return uploader_ids[0]
+
+
+def worker(app, uploader_id, results, lock):
+    from app import db
+    from app.models import Note
+    from app.pagination import keyset_paginate
+    from app.catalog import record_notes_added
+    from app.http_cache import bump_notes_version
+
+    rng = random.Random(threading.get_ident())
+    latencies, locked, pool_timeouts, other = [], 0, 0, 0
+    with app.app_context():
+        for i in range(OPERATIONS_PER_THREAD):
+            started = time.perf_counter()
+            try:
+                if rng.random() < WRITE_RATIO:
+                    note = Note(
+                        course_title='Load Test', course_code='LOAD101', filename='load.pdf',
+                        file_path='uploads/load.pdf', uploaded_by=uploader_id, upload_date=datetime.utcnow()
+                    )
+                    db.session.add(note)
+                    db.session.flush()
+                    record_notes_added([note])
+                    bump_notes_version()
+                    db.session.commit()
+                else:
+                    keyset_paginate(Note.query, None, 10)
+                    db.session.rollback()
+                latencies.append(time.perf_counter() - started)
+            except PoolTimeoutError:
+                pool_timeouts += 1
+                db.session.rollback()
+            except OperationalError as e:
+                if 'locked' in str(e):
+                    locked += 1
+                else:
+                    other += 1
+                db.session.rollback()
+        db.session.remove()
+    with lock:
+        results['latencies'].extend(latencies)
+        results['locked'] += locked
+        results['pool_timeouts'] += pool_timeouts
+        results['other'] += other
+
+
+def run_level(app, uploader_id, threads):
+    results = {'latencies': [], 'locked': 0, 'pool_timeouts': 0, 'other': 0}
+    lock = threading.Lock()
+    pool = [threading.Thread(target=worker, args=(app, uploader_id, results, lock)) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(results['latencies'])
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000 if latencies else 0
+    print(f'{threads:5} threads  {len(latencies) / elapsed:8.0f} ops/s  p95 {p95:8.1f} ms  '
+          f"locked {results['locked']:4}  pool timeouts {results['pool_timeouts']:4}  other {results['other']:3}")
+
+
+def run_profile(label, app, levels):
+    from app import db
+    uploader_id = seed(app)
+    with app.app_context():
+        options = app.config['SQLALCHEMY_ENGINE_OPTIONS']
+        journal = db.session.execute(db.text('PRAGMA journal_mode')).scalar() if db.engine.dialect.name == 'sqlite' else None
+        db.session.remove()
+    pool = ', '.join(f'{key}={options[key]}' for key in ('pool_size', 'max_overflow', 'pool_timeout') if key in options)
+    print(f"\n== {label} ({pool or 'driver defaults'}{f', journal={journal}' if journal else ''}) ==")
+    for threads in levels:
+        run_level(app, uploader_id, threads)
+
+
+def sqlite_url():
+    fd, path = tempfile.mkstemp(prefix='lnsp-bench-', suffix='.db')
+    os.close(fd)
+    return f'sqlite:///{path}'
+
+
+def main(args):
+    levels = [int(arg) for arg in args if arg.isdigit()] or [1, 4, 16, 64]
+
+    if '--configured' in args:
+        from config import Config
+        app = make_profile_app(Config.SQLALCHEMY_DATABASE_URI)
+        run_profile(f'{Config.DB_ENGINE_PROFILE} profile', app, levels)
+        return
+
+    os.environ['DB_CONNECTION'] = 'sqlite'
+    before = make_profile_app(sqlite_url(), engine_options={}, SQLITE_JOURNAL_MODE='DELETE',
+                              SQLITE_SYNCHRONOUS='FULL', SQLITE_BUSY_TIMEOUT=None)
+    run_profile('SQLite engine defaults', before, levels)
+    run_profile('sqlite profile', make_profile_app(sqlite_url()), levels)
+    url = sqlite_url()
+    tiny_pool = profile_options(url, pool_size=2, max_overflow=0, pool_timeout=1)
+    run_profile('sqlite profile, tiny pool', make_profile_app(url, tiny_pool), levels)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
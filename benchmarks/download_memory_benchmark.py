@@ -0,0 +1,130 @@
+"""
+Peak memory per download as the file size grows: buffered versus streamed.
+
+Serves objects of increasing size from the local mock Storage API and
+records how much each download raises the peak RSS of the process
+(`resource.getrusage`). The buffered path (download_from_supabase) grows
+with the file; the streamed path of `student.download_note` must stay flat
+at a few chunks. ru_maxrss is a high-water mark that never goes down, so
+every download runs in a fresh child process, after a small warm-up
+download that loads the HTTP client and templates.
+
+Exits with status 1 if the streamed peak grows by more than
+STREAMED_TOLERANCE_MB between the smallest and the largest file, or if
+the buffered peak doesn't grow (the measurement itself would be broken).
+
+    python -m benchmarks.download_memory_benchmark
+"""
+
+import json
+import os
+import resource
+import subprocess
+import sys
+from benchmarks.common import make_app
+from benchmarks.mock_storage import MockStorageServer, MOCK_KEY
+
+SIZES_MB = [1, 10, 50]
+STREAMED_TOLERANCE_MB = 8
+WARMUP_KEY = 'uploads/warmup.pdf'
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def measure_child(mode, size_mb):
+    """Run one download in this process; prints the peak RSS growth it caused in MB"""
+    server = MockStorageServer().start()
+    os.environ['SUPABASE_URL'] = server.url
+    os.environ['SUPABASE_KEY'] = MOCK_KEY
+    # Stream straight from storage instead of through the disk object cache
+    app = make_app(OBJECT_CACHE_SIZE=0, JOB_WORKERS=0)
+
+    from app import db
+    from app.models import User, Note
+    from app.supabase_client import download_from_supabase
+
+    key = f'uploads/{size_mb}mb.pdf'
+    with app.app_context():
+        student = User(name='Student', email='student@bench.local', role='student')
+        student.set_password('password')
+        lecturer = User(name='Lecturer', email='lecturer@bench.local', role='lecturer')
+        lecturer.password_hash = 'x'
+        db.session.add_all([student, lecturer])
+        db.session.commit()
+
+        notes = []
+        for object_key, size in ((WARMUP_KEY, 64 * 1024), (key, size_mb * 1024 * 1024)):
+            server.storage.put_file(f'lecture-notes/{object_key}', size)
+            note = Note(
+                course_title='Memory', course_code='MEM1', filename=os.path.basename(object_key),
+                file_path=f'{server.url}/storage/v1/object/public/lecture-notes/{object_key}',
+                uploaded_by=lecturer.id
+            )
+            db.session.add(note)
+            notes.append(note)
+        db.session.commit()
+        warmup_id, note_id = notes[0].id, notes[1].id
+
+    client = app.test_client()
+    client.post('/login', data={'email': 'student@bench.local', 'password': 'password'})
+
+    def download(key, note_id, size):
+        if mode == 'buffered':
+            data = download_from_supabase(key)
+            assert len(data) == size
+            return
+        response = client.get(f'/student/download/{note_id}', buffered=False)
+        received = sum(len(chunk) for chunk in response.response)
+        response.close()
+        assert received == size, received
+
+    download(WARMUP_KEY, warmup_id, 64 * 1024)
+    baseline = peak_rss_mb()
+    download(key, note_id, size_mb * 1024 * 1024)
+    print(json.dumps({'growth_mb': peak_rss_mb() - baseline}))
+    server.stop()
+
+
+def run_child(mode, size_mb):
+    result = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.download_memory_benchmark', '--child', mode, str(size_mb)],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        sys.exit(f'✗ {mode} download of {size_mb} MB failed:\n{result.stderr}')
+    return json.loads(result.stdout.strip().splitlines()[-1])['growth_mb']
+
+
+def main():
+    growth = {mode: [run_child(mode, size_mb) for size_mb in SIZES_MB] for mode in ('buffered', 'streamed')}
+
+    print('Peak RSS growth per download')
+    print(f'{"size":>8}  {"buffered":>10}  {"streamed":>10}')
+    for i, size_mb in enumerate(SIZES_MB):
+        print(f'{size_mb:>6}MB  {growth["buffered"][i]:>8.1f}MB  {growth["streamed"][i]:>8.1f}MB')
+
+    failures = []
+    streamed = growth['streamed'][-1] - growth['streamed'][0]
+    if streamed > STREAMED_TOLERANCE_MB:
+        failures.append(f'streamed peak grew {streamed:.1f} MB from {SIZES_MB[0]} to {SIZES_MB[-1]} MB files '
+                        f'(allowed {STREAMED_TOLERANCE_MB} MB)')
+    buffered = growth['buffered'][-1] - growth['buffered'][0]
+    if buffered < (SIZES_MB[-1] - SIZES_MB[0]) / 2:
+        failures.append(f'buffered peak only grew {buffered:.1f} MB; the measurement is not seeing downloads')
+
+    for failure in failures:
+        print(f'✗ {failure}')
+    if failures:
+        sys.exit(1)
+    print('✓ Streamed downloads use flat memory.')
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--child']:
+        measure_child(sys.argv[2], int(sys.argv[3]))
+    else:
+        main()
@@ -0,0 +1,106 @@
+"""
+Counting downloads of a few hot notes from many threads: an upsert and
+commit per download versus the in-memory buffer of app/download_stats.py
+with one batched upsert per flush. Also times the "popular this week"
+ranking read from popular_notes versus aggregating note_download_stats.
+
+    python -m benchmarks.download_stats_benchmark            # 1, 8, 32 threads
+    python -m benchmarks.download_stats_benchmark 4 64
+"""
+
+import sys
+import threading
+import time
+from benchmarks.common import make_app, seed_users, seed_notes, measure, format_stats, percentile
+
+DOWNLOADS_PER_THREAD = 200
+HOT_NOTES = 5
+
+
+def run_threads(app, threads, count_download):
+    from app import db
+    from sqlalchemy.exc import OperationalError
+
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+
+    def work(index):
+        samples = []
+        with app.app_context():
+            for i in range(DOWNLOADS_PER_THREAD):
+                started = time.perf_counter()
+                try:
+                    count_download(1 + (index + i) % HOT_NOTES)
+                    samples.append(time.perf_counter() - started)
+                except OperationalError:
+                    db.session.rollback()
+                    with lock:
+                        errors[0] += 1
+            db.session.remove()
+        with lock:
+            latencies.extend(samples)
+
+    pool = [threading.Thread(target=work, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return len(latencies) / elapsed, percentile(latencies, 0.95) * 1000, errors[0]
+
+
+def main(levels):
+    app = make_app(DOWNLOAD_STATS_FLUSH_INTERVAL=3600, DOWNLOAD_STATS_MAX_PENDING=10 ** 9)
+    with app.app_context():
+        from app import db
+        from app.models import NoteDownloadStat, PopularNote
+        from app.download_stats import write_counts, refresh_popular_notes, flush_download_stats, _get_counter
+        from datetime import datetime
+
+        seed_notes(10000, seed_users(10))
+        db.session.remove()
+
+        def per_request(note_id):
+            # What counting inside the download request would cost
+            write_counts({(note_id, datetime.utcnow().date()): 1})
+            db.session.commit()
+
+        counter = _get_counter(app)
+
+        def buffered(note_id):
+            counter.record(note_id)
+
+        print(f'{DOWNLOADS_PER_THREAD} downloads per thread over {HOT_NOTES} hot notes')
+        for threads in levels:
+            for label, count_download in (('upsert per download', per_request), ('buffered', buffered)):
+                rate, p95, errors = run_threads(app, threads, count_download)
+                print(f'{threads:4} threads  {label:20} {rate:9.0f} downloads/s  p95 {p95:7.2f} ms  errors {errors}')
+            started = time.perf_counter()
+            written = flush_download_stats()
+            print(f'{"":13} flush of the buffer: {written} downloads in {(time.perf_counter() - started) * 1000:.1f} ms')
+
+        # A realistic week of history for the ranking comparison
+        seed_counts = {(note_id, datetime.utcnow().date()): note_id % 97 + 1 for note_id in range(1, 10001)}
+        write_counts(seed_counts)
+        db.session.commit()
+        refresh_popular_notes()
+
+        def aggregate():
+            downloads = db.func.sum(NoteDownloadStat.downloads)
+            return db.session.execute(
+                db.select(NoteDownloadStat.note_id, downloads).group_by(NoteDownloadStat.note_id)
+                .order_by(downloads.desc()).limit(5)
+            ).all()
+
+        def precomputed():
+            return PopularNote.query.order_by(PopularNote.rank).all()
+
+        print(f'\nPopular notes over {NoteDownloadStat.query.count():,} stats rows:')
+        print(f'{"aggregate on request":22} {format_stats(measure(aggregate))}')
+        print(f'{"popular_notes table":22} {format_stats(measure(precomputed))}')
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [1, 8, 32])
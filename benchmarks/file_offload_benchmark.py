@@ -0,0 +1,141 @@
+"""
+Worker time per local download as the file size grows, for each way of
+sending the file (see app/file_offload.py):
+
+- send_file, with a server that reads and writes the file in chunks
+- send_file, with a server whose wsgi.file_wrapper uses os.sendfile
+  (zero-copy, as gunicorn does)
+- FILE_OFFLOAD=accel: the worker only answers with X-Accel-Redirect
+
+Each download is driven like a WSGI server would: the response body is
+written to a socket that another thread drains. Wall and CPU time of the
+worker thread are reported; with offloading they stay flat as files grow.
+
+    python -m benchmarks.file_offload_benchmark            # 1, 16 and 64 MB
+    python -m benchmarks.file_offload_benchmark 1 256
+"""
+
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from werkzeug.test import EnvironBuilder
+from benchmarks.common import make_app
+
+REPEAT = 10
+
+
+class SendfileWrapper:
+    """wsgi.file_wrapper that the driver below sends with os.sendfile"""
+
+    def __init__(self, filelike, block_size=8192):
+        self.filelike = filelike
+        self.block_size = block_size
+
+    def __iter__(self):
+        while True:
+            chunk = self.filelike.read(self.block_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def sendfile(self, sock):
+        in_fd, offset = self.filelike.fileno(), self.filelike.tell()
+        while True:
+            sent = os.sendfile(sock.fileno(), in_fd, offset, 1 << 30)
+            if not sent:
+                return
+            offset += sent
+
+    def close(self):
+        self.filelike.close()
+
+
+def drain(sock):
+    while sock.recv(1 << 20):
+        pass
+
+
+def serve(app, url, cookie, sock, zero_copy):
+    """One download through the WSGI interface; returns the body bytes the worker wrote"""
+    environ = EnvironBuilder(path=url, headers={'Cookie': f'session={cookie}'}).get_environ()
+    if zero_copy:
+        environ['wsgi.file_wrapper'] = SendfileWrapper
+    statuses = []
+    body = app(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    written = 0
+    try:
+        if isinstance(body, SendfileWrapper):
+            before = body.filelike.tell()
+            body.sendfile(sock)
+            written = body.filelike.seek(0, os.SEEK_END) - before
+        else:
+            for chunk in body:
+                sock.sendall(chunk)
+                written += len(chunk)
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+    assert statuses[0].startswith('200'), statuses
+    return written
+
+
+def main(sizes_mb):
+    upload_folder = tempfile.mkdtemp(prefix='lnsp-offload-')
+    app = make_app(UPLOAD_FOLDER=upload_folder, HTTP_CACHING=False, DOWNLOAD_STATS_ENABLED=False)
+
+    from app import db
+    from app.models import User, Note
+
+    with app.app_context():
+        student = User(name='Student', email='student@bench.local', role='student')
+        student.set_password('password')
+        lecturer = User(name='Lecturer', email='lecturer@bench.local', role='lecturer')
+        lecturer.password_hash = 'x'
+        db.session.add_all([student, lecturer])
+        db.session.commit()
+
+        for size_mb in sizes_mb:
+            path = os.path.join(upload_folder, f'{size_mb}mb.pdf')
+            with open(path, 'wb') as f:
+                f.write(os.urandom(1024 * 1024) * size_mb)
+            db.session.add(Note(course_title='Offload', course_code=f'OFF{size_mb}', filename=f'{size_mb}mb.pdf',
+                                file_path=path, file_size=size_mb * 1024 * 1024, uploaded_by=lecturer.id))
+        db.session.commit()
+        notes = {note.course_code: note.id for note in Note.query.all()}
+
+    client = app.test_client()
+    client.post('/login', data={'email': 'student@bench.local', 'password': 'password'})
+    cookie = client.get_cookie('session').value
+
+    worker, reader = socket.socketpair()
+    threading.Thread(target=drain, args=(reader,), daemon=True).start()
+
+    modes = [
+        ('send_file, read/write', 'none', False),
+        ('send_file, os.sendfile', 'none', True),
+        ('X-Accel-Redirect', 'accel', False),
+    ]
+    print(f'Worker time per download, mean of {REPEAT}')
+    print(f'{"size":>6}  {"mode":24} {"wall":>10} {"cpu":>10} {"bytes written":>14}')
+    for size_mb in sizes_mb:
+        url = f'/student/download/{notes[f"OFF{size_mb}"]}'
+        for label, offload, zero_copy in modes:
+            app.config['FILE_OFFLOAD'] = offload
+            serve(app, url, cookie, worker, zero_copy)
+            wall = cpu = 0
+            for _ in range(REPEAT):
+                started, started_cpu = time.perf_counter(), time.thread_time()
+                written = serve(app, url, cookie, worker, zero_copy)
+                wall += time.perf_counter() - started
+                cpu += time.thread_time() - started_cpu
+            print(f'{size_mb:>4}MB  {label:24} {wall / REPEAT * 1000:>7.2f} ms {cpu / REPEAT * 1000:>7.2f} ms '
+                  f'{written:>14,}')
+
+    worker.close()
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [1, 16, 64])
@@ -0,0 +1,70 @@
+"""
+Dashboard requests with the note listing rendered every time versus served
+from the fragment render cache (app/fragment_cache.py), in memory and in
+the shared file backend. Conditional requests are off, so every request
+builds the whole page; the SQL statements per request are shown too.
+
+    python -m benchmarks.fragment_cache_benchmark            # 10k notes
+    python -m benchmarks.fragment_cache_benchmark 100000
+"""
+
+import os
+import sys
+import tempfile
+from benchmarks.common import make_app, seed_users, seed_notes, measure, format_stats
+
+REPEAT = 200
+
+
+def main(total):
+    # Read when the app is created
+    os.environ['QUERY_COUNT_HEADER'] = 'true'
+    app = make_app(HTTP_CACHING=False, JOB_WORKERS=0,
+                   FRAGMENT_CACHE_DIR=tempfile.mkdtemp(prefix='lnsp-bench-fragments-'))
+    with app.app_context():
+        from app import db
+        from app.fragment_cache import _reset_backend
+
+        lecturer_ids = seed_users(20)
+        seed_notes(total, lecturer_ids)
+        student_id = seed_users(1, role='student')[0]
+        db.session.remove()
+
+    def client_for(user_id):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+        return client
+
+    pages = (
+        ('student dashboard', client_for(student_id), '/student/dashboard'),
+        ('student search', client_for(student_id), '/student/dashboard?search=python'),
+        ('lecturer dashboard', client_for(lecturer_ids[0]), '/lecturer/dashboard'),
+    )
+
+    print(f'\n== {total:,} notes, {REPEAT} requests each ==')
+    for label, client, url in pages:
+        baseline = None
+        for backend in ('none', 'memory', 'file'):
+            app.config['FRAGMENT_CACHE'] = backend
+            _reset_backend()
+            response = client.get(url)
+            assert response.status_code == 200, response.status_code
+            body = response.get_data()
+            if baseline is None:
+                baseline = body
+            assert body == baseline, f'{backend} served a different page'
+            # Statements of a repeat request (a cache hit)
+            queries = client.get(url).headers.get('X-Query-Count')
+
+            def request():
+                client.get(url).get_data()
+
+            stats = measure(request, REPEAT)
+            print(f'{label:20} {backend:7} {format_stats(stats)}  {1000 / stats["mean"]:7.0f} req/s  '
+                  f'{queries} queries')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
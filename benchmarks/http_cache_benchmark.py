@@ -0,0 +1,67 @@
+"""
+Repeat visits with and without conditional requests: a full dashboard render
+and a full 5 MB download versus revalidating with If-None-Match (304).
+
+    python -m benchmarks.http_cache_benchmark            # 10k notes
+    python -m benchmarks.http_cache_benchmark 100000
+"""
+
+import hashlib
+import os
+import sys
+import tempfile
+from benchmarks.common import make_app, seed_users, seed_notes, measure, format_stats
+
+FILE_SIZE = 5 * 1024 * 1024
+REPEAT = 200
+
+
+def main(total):
+    upload_folder = tempfile.mkdtemp(prefix='lnsp-bench-uploads-')
+    app = make_app(UPLOAD_FOLDER=upload_folder, JOB_WORKERS=0)
+    with app.app_context():
+        from app import db
+        from app.models import Note, Blob
+
+        seed_notes(total, seed_users(20))
+        student_id = seed_users(1, role='student')[0]
+
+        # One real file behind the newest note
+        content = b'%PDF-1.4 benchmark\n' * (FILE_SIZE // 19)
+        digest = hashlib.sha256(content).hexdigest()
+        file_path = os.path.join(upload_folder, digest)
+        with open(file_path, 'wb') as f:
+            f.write(content)
+        db.session.add(Blob(digest=digest, file_path=file_path, size=len(content), ref_count=1))
+        note = Note.query.order_by(Note.upload_date.desc()).first()
+        note.file_path, note.blob_digest, note_id = file_path, digest, note.id
+        db.session.commit()
+        db.session.remove()
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(student_id)
+        session['_fresh'] = True
+
+    results = {}
+    for label, url in (('dashboard', '/student/dashboard'), ('download', f'/student/download/{note_id}')):
+        first = client.get(url)
+        etag = first.headers['ETag']
+
+        def full():
+            client.get(url).get_data()
+
+        def revalidate():
+            response = client.get(url, headers={'If-None-Match': etag})
+            assert response.status_code == 304
+
+        results[f'{label} full'] = (measure(full, REPEAT), len(first.data))
+        results[f'{label} 304'] = (measure(revalidate, REPEAT), 0)
+
+    print(f'\n== {total:,} notes, {REPEAT} requests each ==')
+    for label, (stats, size) in results.items():
+        print(f'{label:16} {format_stats(stats)}  {1000 / stats["mean"]:8.0f} req/s  {size:>9,} bytes')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
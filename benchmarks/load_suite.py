@@ -0,0 +1,331 @@
+"""
+End-to-end load test of the main routes, with JSON results for comparing runs.
+
+Seeds a throwaway database (lecturers, students, notes spread over courses,
+downloadable files), starts the app on a threaded local server with a mock
+Supabase storage (or local storage), and runs CONCURRENCY virtual users for
+DURATION seconds. Each one repeatedly picks a scenario by weight:
+
+    login            POST /login (password check, new session)
+    dashboard        GET /student/dashboard
+    dashboard_search GET /student/dashboard?search=<word>
+    dashboard_deep   GET /student/dashboard?cursor=<90% deep>
+    download         GET /student/download/<id>
+    upload           POST /lecturer/upload (64 KB PDF)
+
+Per scenario it reports throughput, error count and p50/p95/p99 latency,
+and writes everything (plus the seed volumes and git commit) to JSON.
+Comparing against an earlier run exits 1 on a regression, so the suite can
+gate a deployment:
+
+    python -m benchmarks.load_suite
+    python -m benchmarks.load_suite --notes 100000 --courses 500 --concurrency 32 --duration 60
+    python -m benchmarks.load_suite --output before.json
+    python -m benchmarks.load_suite --output after.json --compare before.json --threshold 0.2
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from werkzeug.serving import make_server, WSGIRequestHandler
+from benchmarks.common import make_app, seed_notes, percentile, COURSE_WORDS
+
+PASSWORD = 'benchmark-password'
+SCENARIO_WEIGHTS = {
+    'login': 1,
+    'dashboard': 10,
+    'dashboard_search': 5,
+    'dashboard_deep': 3,
+    'download': 8,
+    'upload': 1,
+}
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Load-test the main routes and save the results as JSON.')
+    parser.add_argument('--lecturers', type=int, default=20)
+    parser.add_argument('--students', type=int, default=200)
+    parser.add_argument('--notes', type=int, default=20000)
+    parser.add_argument('--courses', type=int, default=200)
+    parser.add_argument('--files', type=int, default=50, help='Distinct stored files shared by the notes')
+    parser.add_argument('--file-size', type=int, default=256 * 1024, help='Bytes per stored file')
+    parser.add_argument('--upload-size', type=int, default=64 * 1024, help='Bytes per uploaded file')
+    parser.add_argument('--concurrency', type=int, default=16, help='Virtual users')
+    parser.add_argument('--duration', type=float, default=20, help='Seconds of measured load')
+    parser.add_argument('--warmup', type=float, default=3, help='Seconds of unmeasured load first')
+    parser.add_argument('--storage', choices=('mock', 'local'), default='mock',
+                        help='Mock Supabase storage (default) or the local upload folder')
+    parser.add_argument('--storage-latency', type=float, default=0.0, help='Mock storage delay per call (s)')
+    parser.add_argument('--output', help='Write results to this JSON file')
+    parser.add_argument('--compare', help='Compare with an earlier JSON result and exit 1 on a regression')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Allowed p95 increase / throughput drop when comparing (0.2 = 20%%)')
+    return parser.parse_args(argv)
+
+
+def prepare(args):
+    """Create the app, the storage and the seed data; returns (app, server for storage or None, seed info)"""
+    storage_server = None
+    upload_folder = tempfile.mkdtemp(prefix='lnsp-bench-uploads-')
+    if args.storage == 'mock':
+        from benchmarks.mock_storage import MockStorageServer, MOCK_KEY
+        storage_server = MockStorageServer(latency=args.storage_latency).start()
+        os.environ['SUPABASE_URL'] = storage_server.url
+        os.environ['SUPABASE_KEY'] = MOCK_KEY
+    else:
+        os.environ.pop('SUPABASE_URL', None)
+        os.environ.pop('SUPABASE_KEY', None)
+
+    app = make_app(UPLOAD_FOLDER=upload_folder)
+    with app.test_request_context():
+        from app import db
+        from app.models import User, Note
+        from app.migrations import upgrade
+        from app.passwords import hash_password
+        from app.search import rebuild_search_index
+        from app.catalog import rebuild_catalog
+        from app.storage import get_bucket_name
+        from app.pagination import encode_cursor
+
+        upgrade(echo=lambda message: None)
+
+        # One real hash shared by every user, so seeding doesn't take minutes
+        password_hash = hash_password(PASSWORD)
+        users = [User(name=f'Lecturer {i}', email=f'lecturer{i}@bench.local', role='lecturer',
+                      password_hash=password_hash) for i in range(args.lecturers)]
+        users += [User(name=f'Student {i}', email=f'student{i}@bench.local', role='student',
+                       password_hash=password_hash) for i in range(args.students)]
+        db.session.add_all(users)
+        db.session.commit()
+        lecturer_ids = [user.id for user in users if user.role == 'lecturer']
+
+        file_paths = []
+        for i in range(args.files):
+            key = f'uploads/bench_{i}.pdf'
+            if storage_server is not None:
+                storage_server.storage.put_file(f'{get_bucket_name()}/{key}', args.file_size)
+                file_paths.append(f'{storage_server.url}/storage/v1/object/public/{get_bucket_name()}/{key}')
+            else:
+                path = os.path.join(upload_folder, f'bench_{i}.pdf')
+                with open(path, 'wb') as f:
+                    f.write((b'%PDF-1.4 bench\n' * (args.file_size // 15 + 1))[:args.file_size])
+                file_paths.append(path)
+
+        seed_notes(args.notes, lecturer_ids, courses=args.courses, file_paths=file_paths)
+        rebuild_search_index()
+        rebuild_catalog()
+
+        note_ids = db.session.execute(db.select(Note.id)).scalars().all()
+        deep = Note.query.order_by(Note.upload_date.desc(), Note.id.desc()).offset(int(len(note_ids) * 0.9)).first()
+        seed = {
+            'note_ids': note_ids,
+            'deep_cursor': encode_cursor('after', deep) if deep else None,
+        }
+        db.session.remove()
+    return app, storage_server, seed
+
+
+class VirtualUser:
+    """One simulated client: a logged-in student session and a logged-in lecturer session"""
+
+    def __init__(self, base_url, index, args, seed):
+        import httpx
+        self.httpx = httpx
+        self.base_url = base_url
+        self.args = args
+        self.seed = seed
+        self.rng = random.Random(index)
+        self.student_email = f'student{index % args.students}@bench.local'
+        self.student = self._login(self.student_email)
+        self.lecturer = self._login(f'lecturer{index % args.lecturers}@bench.local')
+
+    def _client(self):
+        return self.httpx.Client(base_url=self.base_url, timeout=60, follow_redirects=False)
+
+    def _login(self, email):
+        client = self._client()
+        response = client.post('/login', data={'email': email, 'password': PASSWORD})
+        if 'dashboard' not in response.headers.get('Location', ''):
+            raise RuntimeError(f'Could not log in as {email}: HTTP {response.status_code}')
+        return client
+
+    def login(self):
+        with self._client() as client:
+            response = client.post('/login', data={'email': self.student_email, 'password': PASSWORD})
+            return 'dashboard' in response.headers.get('Location', '')
+
+    def dashboard(self):
+        return self.student.get('/student/dashboard').status_code == 200
+
+    def dashboard_search(self):
+        term = self.rng.choice(COURSE_WORDS)[:self.rng.randint(3, 6)]
+        return self.student.get('/student/dashboard', params={'search': term}).status_code == 200
+
+    def dashboard_deep(self):
+        return self.student.get('/student/dashboard', params={'cursor': self.seed['deep_cursor']}).status_code == 200
+
+    def download(self):
+        note_id = self.rng.choice(self.seed['note_ids'])
+        response = self.student.get(f'/student/download/{note_id}')
+        # Signed-URL mode answers with a redirect to storage
+        return response.status_code in (200, 302)
+
+    def upload(self):
+        content = b'%PDF-1.4\n' + os.urandom(max(self.args.upload_size - 9, 0))
+        response = self.lecturer.post('/lecturer/upload', data={
+            'course_title': 'Load Test', 'course_code': 'LOAD101',
+        }, files={'file': ('load.pdf', content, 'application/pdf')})
+        return response.status_code == 302 and 'dashboard' in response.headers.get('Location', '')
+
+    def close(self):
+        self.student.close()
+        self.lecturer.close()
+
+
+def run_load(base_url, args, seed):
+    scenarios = list(SCENARIO_WEIGHTS)
+    weights = [SCENARIO_WEIGHTS[name] for name in scenarios]
+    samples = {name: [] for name in scenarios}
+    errors = {name: 0 for name in scenarios}
+    lock = threading.Lock()
+    users = [VirtualUser(base_url, i, args, seed) for i in range(args.concurrency)]
+    measuring = threading.Event()
+    stop = threading.Event()
+
+    def work(user):
+        while not stop.is_set():
+            name = user.rng.choices(scenarios, weights)[0]
+            started = time.perf_counter()
+            try:
+                ok = getattr(user, name)()
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - started
+            if measuring.is_set() and not stop.is_set():
+                with lock:
+                    if ok:
+                        samples[name].append(elapsed)
+                    else:
+                        errors[name] += 1
+
+    threads = [threading.Thread(target=work, args=(user,), daemon=True) for user in users]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.warmup)
+    measuring.set()
+    started = time.perf_counter()
+    time.sleep(args.duration)
+    stop.set()
+    elapsed = time.perf_counter() - started
+    for thread in threads:
+        thread.join()
+    for user in users:
+        user.close()
+
+    routes = {}
+    for name in scenarios:
+        latencies = sorted(samples[name])
+        routes[name] = {
+            'requests': len(latencies),
+            'errors': errors[name],
+            'throughput_rps': len(latencies) / elapsed,
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'mean_ms': sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+            'max_ms': latencies[-1] * 1000 if latencies else 0.0,
+        }
+    total = sum(route['requests'] for route in routes.values())
+    return {'routes': routes, 'total_throughput_rps': total / elapsed, 'elapsed_seconds': elapsed}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results):
+    print(f"\n{'route':18} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for name, route in results['routes'].items():
+        print(f"{name:18} {route['throughput_rps']:8.1f} {route['p50_ms']:9.1f} {route['p95_ms']:9.1f} "
+              f"{route['p99_ms']:9.1f} {route['errors']:7}")
+    print(f"{'total':18} {results['total_throughput_rps']:8.1f}")
+
+
+def compare(results, baseline, threshold):
+    """Print the change per route; returns the names of routes that regressed"""
+    regressed = []
+    print(f"\nCompared with {baseline['meta'].get('commit') or 'baseline'} ({baseline['meta'].get('timestamp')}):")
+    for name, route in results['routes'].items():
+        before = baseline['routes'].get(name)
+        if not before or not before['requests']:
+            continue
+        p95_change = route['p95_ms'] / before['p95_ms'] - 1 if before['p95_ms'] else 0.0
+        rps_change = route['throughput_rps'] / before['throughput_rps'] - 1
+        worse = p95_change > threshold or rps_change < -threshold or route['errors'] > before['errors']
+        print(f"{'REGRESSED' if worse else 'ok':9} {name:18} p95 {p95_change:+7.1%}  req/s {rps_change:+7.1%}  "
+              f"errors {before['errors']} -> {route['errors']}")
+        if worse:
+            regressed.append(name)
+    return regressed
+
+
+def main(argv):
+    args = parse_args(argv)
+    print(f'Seeding {args.lecturers} lecturers, {args.students} students, {args.notes} notes '
+          f'in {args.courses} courses ({args.storage} storage)...')
+    app, storage_server, seed = prepare(args)
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f'Running {args.concurrency} virtual users for {args.duration:g} s '
+          f'(after {args.warmup:g} s warm-up)...')
+    try:
+        results = run_load(f'http://127.0.0.1:{server.server_port}', args, seed)
+    finally:
+        server.shutdown()
+        if storage_server is not None:
+            storage_server.stop()
+
+    results['meta'] = {
+        'commit': git_commit(),
+        'timestamp': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'scenario_weights': SCENARIO_WEIGHTS,
+    }
+    print_results(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'\nResults written to {args.output}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressed = compare(results, baseline, args.threshold)
+        if regressed:
+            print(f"\nRegression in: {', '.join(regressed)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
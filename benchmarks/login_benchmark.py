@@ -0,0 +1,103 @@
+"""
+Login throughput under concurrent load at different password-hashing costs.
+
+Starts the app on a threaded local server and fires CONCURRENCY parallel
+logins at `auth.login`, while a probe keeps requesting the home page to show
+how much a login storm slows everything else down.
+
+    python -m benchmarks.login_benchmark                 # default cost settings
+    python -m benchmarks.login_benchmark pbkdf2:sha256:600000 scrypt:16384:8:1
+"""
+
+import http.client
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+from werkzeug.serving import make_server, WSGIRequestHandler
+from benchmarks.common import make_app
+
+METHODS = ['scrypt:32768:8:1', 'scrypt:16384:8:1', 'pbkdf2:sha256:600000', 'pbkdf2:sha256:100000']
+USERS = 50
+LOGINS = 100
+CONCURRENCY = 16
+PASSWORD = 'benchmark-password'
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def request(port, method, path, body=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    headers = {'Content-Type': 'application/x-www-form-urlencoded'} if body else {}
+    started = time.perf_counter()
+    conn.request(method, path, body=body, headers=headers)
+    response = conn.getresponse()
+    response.read()
+    conn.close()
+    return response, (time.perf_counter() - started) * 1000
+
+
+def run(method):
+    app = make_app(PASSWORD_HASH_METHOD=method, JOB_WORKERS=0)
+    with app.test_request_context():
+        from app import db
+        from app.models import User
+        from app.passwords import hash_password
+
+        # The database URI is fixed at first import, so runs share a database
+        User.query.delete()
+        password_hash = hash_password(PASSWORD)
+        for i in range(USERS):
+            db.session.add(User(name=f'Student {i}', email=f'student{i}@bench.local',
+                                role='student', password_hash=password_hash))
+        db.session.commit()
+        db.session.remove()
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+
+    def login(i):
+        body = urlencode({'email': f'student{i % USERS}@bench.local', 'password': PASSWORD})
+        response, elapsed = request(port, 'POST', '/login', body)
+        # Logins that waited longer than PASSWORD_HASH_QUEUE_TIMEOUT are sent back to /login
+        return elapsed, 'dashboard' in response.getheader('Location', '')
+
+    probes = []
+    stop = threading.Event()
+
+    def probe():
+        while not stop.is_set():
+            probes.append(request(port, 'GET', '/')[1])
+
+    probe_thread = threading.Thread(target=probe, daemon=True)
+    probe_thread.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(CONCURRENCY) as executor:
+        results = list(executor.map(login, range(LOGINS)))
+    duration = time.perf_counter() - started
+    stop.set()
+    probe_thread.join()
+    server.shutdown()
+
+    latencies = sorted(elapsed for elapsed, _ in results)
+    succeeded = sum(ok for _, ok in results)
+    probes.sort()
+    print(f'{method:24} {succeeded / duration:8.1f} logins/s  {LOGINS - succeeded:3} rejected  '
+          f'login p50 {latencies[len(latencies) // 2]:7.1f} ms  p95 {latencies[int(len(latencies) * 0.95)]:7.1f} ms  '
+          f'home page during storm p50 {statistics.median(probes):6.1f} ms  max {probes[-1]:6.1f} ms')
+
+
+def main(methods):
+    print(f'{LOGINS} logins from {CONCURRENCY} concurrent clients')
+    for method in methods:
+        run(method)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:] or METHODS)
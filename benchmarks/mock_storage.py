@@ -0,0 +1,206 @@
+"""
+A local stand-in for the Supabase Storage REST API.
+
+Implements just enough of `/storage/v1/object/...` for the app's storage
+calls: upload, download (with Range), remove and signed URLs. Objects are
+kept as files in a temporary directory, so large objects don't inflate the
+benchmark process itself. `latency` adds a fixed delay to every request to
+imitate the round trip to a real Supabase region.
+
+    server = MockStorageServer()
+    server.start()
+    os.environ['SUPABASE_URL'] = server.url
+    os.environ['SUPABASE_KEY'] = MOCK_KEY
+    ...
+    server.stop()
+"""
+
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+PREFIX = '/storage/v1/'
+# The SDK only checks that the key looks like a JWT
+MOCK_KEY = 'mock.mock.mock'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def storage(self):
+        return self.server.storage
+
+    def _object_path(self, route):
+        path = unquote(urlparse(self.path).path)[len(PREFIX):]
+        if not path.startswith(route):
+            return None
+        return path[len(route):]
+
+    def _send(self, status, body=b'', headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def _send_json(self, status, payload):
+        self._send(status, json.dumps(payload).encode(), {'Content-Type': 'application/json'})
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return self.rfile.read(length)
+
+    def handle_one_request(self):
+        if self.server.latency:
+            # Before reading the request, so it also delays connection reuse
+            time.sleep(self.server.latency)
+        super().handle_one_request()
+
+    def do_GET(self):
+        self.storage.count('download')
+        key = self._object_path('object/public/') or self._object_path('object/sign/') or self._object_path('object/')
+        file_path = self.storage.file_for(key) if key else None
+        if not file_path or not os.path.exists(file_path):
+            return self._send_json(404, {'error': 'not_found'})
+
+        size = os.path.getsize(file_path)
+        start, end, status = 0, size - 1, 200
+        match = re.match(r'bytes=(\d*)-(\d*)$', self.headers.get('Range', ''))
+        if match:
+            if match.group(1):
+                start = int(match.group(1))
+                end = int(match.group(2)) if match.group(2) else size - 1
+            else:
+                start = max(0, size - int(match.group(2)))
+            if start >= size:
+                return self._send(416, headers={'Content-Range': f'bytes */{size}'})
+            end = min(end, size - 1)
+            status = 206
+
+        self.send_response(status)
+        self.send_header('Content-Type', self.storage.content_types.get(key.split('?', 1)[0], 'application/pdf'))
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('ETag', f'"{size}-{int(os.path.getmtime(file_path))}"')
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        self.end_headers()
+        with open(file_path, 'rb') as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining:
+                chunk = f.read(min(remaining, 256 * 1024))
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+
+    def do_POST(self):
+        key = self._object_path('object/sign/')
+        if key is not None:
+            self.storage.count('sign')
+            self._read_body()
+            return self._send_json(200, {'signedURL': f'/object/sign/{key}?token=mock'})
+
+        key = self._object_path('object/')
+        if key is None:
+            return self._send_json(404, {'error': 'not_found'})
+        self.storage.count('upload')
+        body = self._read_body()
+        content_type = self.headers.get('Content-Type', '')
+        if content_type.startswith('multipart/form-data'):
+            # The SDK sends a single 'file' part; strip the multipart envelope
+            boundary = content_type.split('boundary=', 1)[1].encode()
+            part = body.split(b'--' + boundary)[1]
+            part_headers, body = part.split(b'\r\n\r\n', 1)
+            body = body.rsplit(b'\r\n', 1)[0]
+            match = re.search(rb'content-type: *([^\r\n]+)', part_headers, re.IGNORECASE)
+            content_type = match.group(1).decode() if match else 'text/plain'
+        self.storage.put(key, body, content_type)
+        self._send_json(200, {'Key': key})
+
+    def do_DELETE(self):
+        bucket = self._object_path('object/')
+        self.storage.count('remove')
+        payload = json.loads(self._read_body() or b'{}')
+        removed = []
+        for prefix in payload.get('prefixes', []):
+            if self.storage.delete(f'{bucket}/{prefix}'):
+                removed.append({'name': prefix})
+        self._send_json(200, removed)
+
+
+class MockStorage:
+    """On-disk object store shared by the request handlers"""
+
+    def __init__(self):
+        self.root = tempfile.mkdtemp(prefix='lnsp-mock-storage-')
+        self.calls = {}
+        # As sent on upload; objects created with put_file() are served as PDFs
+        self.content_types = {}
+        self._lock = threading.Lock()
+
+    def count(self, operation):
+        with self._lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+
+    def file_for(self, key):
+        return os.path.join(self.root, key.split('?', 1)[0].replace('/', '__'))
+
+    def put(self, key, data, content_type='application/octet-stream'):
+        with open(self.file_for(key), 'wb') as f:
+            f.write(data)
+        self.content_types[key.split('?', 1)[0]] = content_type
+
+    def put_file(self, key, size, chunk=b'%PDF-1.4 mock lecture note\n'):
+        """Create an object of `size` bytes without building it in memory"""
+        block = chunk * (1024 * 1024 // len(chunk))
+        with open(self.file_for(key), 'wb') as f:
+            written = 0
+            while written < size:
+                data = block[:size - written]
+                f.write(data)
+                written += len(data)
+
+    def delete(self, key):
+        try:
+            os.remove(self.file_for(key))
+            return True
+        except FileNotFoundError:
+            return False
+
+
+class MockStorageServer:
+    """Runs the mock Storage API on a background thread"""
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0):
+        self.storage = MockStorage()
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.storage = self.storage
+        self.httpd.latency = latency
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        shutil.rmtree(self.storage.root, ignore_errors=True)
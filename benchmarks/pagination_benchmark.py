@@ -0,0 +1,49 @@
+"""
+Listing latency on page 1 versus page 10,000: OFFSET + COUNT(*) versus keyset.
+
+    python -m benchmarks.pagination_benchmark            # 200k notes
+    python -m benchmarks.pagination_benchmark 500000
+"""
+
+import sys
+from benchmarks.common import make_app, seed_users, seed_notes, measure, format_stats
+
+PER_PAGE = 10
+DEEP_PAGE = 10000
+
+
+def main(total):
+    app = make_app()
+    with app.app_context():
+        from app import db
+        from app.models import Note
+        from app.pagination import keyset_paginate, encode_cursor
+
+        seed_notes(total, seed_users(20))
+
+        def offset_page(page):
+            # What `.paginate()` does: a COUNT(*) plus LIMIT/OFFSET
+            query = Note.query.order_by(Note.upload_date.desc(), Note.id.desc())
+            query.order_by(None).count()
+            return query.limit(PER_PAGE).offset((page - 1) * PER_PAGE).all()
+
+        # The cursor a user would hold after clicking "Next" 9,999 times
+        boundary = (Note.query.order_by(Note.upload_date.desc(), Note.id.desc())
+                    .offset((DEEP_PAGE - 1) * PER_PAGE - 1).first())
+        deep_cursor = encode_cursor('after', boundary)
+
+        results = {
+            'offset page 1': measure(lambda: offset_page(1)),
+            f'offset page {DEEP_PAGE:,}': measure(lambda: offset_page(DEEP_PAGE)),
+            'keyset page 1': measure(lambda: keyset_paginate(Note.query, None, PER_PAGE)),
+            f'keyset page {DEEP_PAGE:,}': measure(lambda: keyset_paginate(Note.query, deep_cursor, PER_PAGE)),
+        }
+        db.session.remove()
+
+    print(f'\n== {total:,} notes, {PER_PAGE} per page ==')
+    for label, stats in results.items():
+        print(f'{label:22} {format_stats(stats)}')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,57 @@
+"""
+Search latency: ranked full-text index versus the original ILIKE scan.
+
+Grows one database through the requested sizes and times the first page of
+results for a few typical search terms at each size.
+
+    python -m benchmarks.search_benchmark              # 10k, 100k, 1M notes
+    python -m benchmarks.search_benchmark 10000 50000  # custom sizes
+"""
+
+import sys
+from benchmarks.common import make_app, seed_users, seed_notes, measure, format_stats
+
+TERMS = ['CS1', 'python', 'intro data', 'week_3']
+
+
+def ilike_page(term):
+    """The pre-index student dashboard query"""
+    from app.models import Note
+    return Note.query.filter(
+        (Note.course_code.ilike(f'%{term}%')) |
+        (Note.course_title.ilike(f'%{term}%'))
+    ).order_by(Note.upload_date.desc()).limit(10).all()
+
+
+def indexed_page(term):
+    from app.models import Note
+    from app.search import search_notes
+    return search_notes(Note.query, term).limit(10).all()
+
+
+def main(sizes):
+    app = make_app()
+    with app.app_context():
+        from app import db
+        from app.search import ensure_search_index
+
+        uploader_ids = seed_users(20)
+        seeded = 0
+        for size in sizes:
+            seed_notes(size - seeded, uploader_ids, offset=seeded)
+            seeded = size
+            ensure_search_index()
+
+            print(f'\n== {size:,} notes ==')
+            for term in TERMS:
+                repeat = 20 if size < 500000 else 5
+                ilike = measure(lambda: ilike_page(term), repeat=repeat)
+                indexed = measure(lambda: indexed_page(term), repeat=repeat)
+                db.session.remove()
+                print(f'{term!r:14} ILIKE   {format_stats(ilike)}')
+                print(f'{"":14} indexed {format_stats(indexed)}  '
+                      f'({ilike["p50"] / max(indexed["p50"], 1e-6):.1f}x)')
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10000, 100000, 1000000])
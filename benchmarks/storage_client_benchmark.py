@@ -0,0 +1,45 @@
+"""
+Per-call storage latency: a new Supabase client per call versus the pooled
+process-wide client, against the local mock Storage API.
+
+    python -m benchmarks.storage_client_benchmark
+"""
+
+import os
+from benchmarks.common import measure, format_stats
+from benchmarks.mock_storage import MockStorageServer, MOCK_KEY
+
+REPEAT = 200
+
+
+def main():
+    server = MockStorageServer().start()
+    os.environ['SUPABASE_URL'] = server.url
+    os.environ['SUPABASE_KEY'] = MOCK_KEY
+    server.storage.put('lecture-notes/uploads/bench.pdf', b'%PDF-1.4 ' * 4096)
+
+    from supabase import create_client
+    from app import supabase_client
+
+    def fresh_client_download():
+        # The previous behaviour: create_client() on every storage call
+        client = create_client(server.url, MOCK_KEY)
+        client.storage.from_('lecture-notes').download('uploads/bench.pdf')
+
+    def pooled_client_download():
+        supabase_client.download_from_supabase('uploads/bench.pdf')
+
+    def pooled_stream_download():
+        _, _, chunks = supabase_client.stream_from_supabase('uploads/bench.pdf')
+        for _ in chunks:
+            pass
+
+    print(f'download of a 36 KB object, {REPEAT} calls each')
+    print(f'{"new client per call":24} {format_stats(measure(fresh_client_download, REPEAT))}')
+    print(f'{"pooled SDK client":24} {format_stats(measure(pooled_client_download, REPEAT))}')
+    print(f'{"pooled streaming client":24} {format_stats(measure(pooled_stream_download, REPEAT))}')
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""Course catalog consistency checker
+
+Recomputes every course aggregate (title, note count, total size, latest
+upload) from the notes table and compares it with the `courses` table that
+is maintained incrementally on upload and delete.
+
+Examples:
+    python check_catalog.py            # report differences; exits 1 if any
+    python check_catalog.py --repair   # also rewrite the catalog from the notes
+"""
+import argparse
+import sys
+from app import create_app
+from app.catalog import check_catalog
+
+
+def describe(difference):
+    course_code, field, stored, actual = difference
+    if field is None:
+        return f'{course_code}: missing from the catalog' if stored is None else f'{course_code}: has no notes'
+    return f'{course_code}: {field} is {stored!r}, expected {actual!r}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the course catalog against the notes table.')
+    parser.add_argument('--repair', action='store_true', help='Rewrite the catalog to match the notes')
+    args = parser.parse_args()
+
+    app = create_app('config.Config')
+    with app.app_context():
+        differences = check_catalog(repair=args.repair)
+
+    for difference in differences:
+        print(f'✗ {describe(difference)}')
+    if not differences:
+        print('✓ Course catalog matches the notes table.')
+    elif args.repair:
+        print(f'\n✓ Repaired {len(differences)} difference(s).')
+    else:
+        print(f'\n{len(differences)} difference(s). Run with --repair to fix them.')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""Cold-start import budget
+
+Imports the app the way a fresh serverless instance does (`import run`,
+which also runs create_app) in new interpreters under `python -X importtime`,
+and fails if the median cost exceeds the budget or if a module that should
+only be imported when first used (the Supabase SDK and its HTTP client,
+maintenance-only app modules) is imported at startup.
+
+Examples:
+    python check_import_time.py                          # budget: IMPORT_TIME_BUDGET_MS or 800 ms
+    python check_import_time.py --budget-ms 600 --runs 9 --top 20
+    python check_import_time.py --save import_baseline.json
+    python check_import_time.py --baseline import_baseline.json --threshold 0.2
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Imported on first use only; importing any of them at startup fails the check
+LAZY_MODULES = (
+    'supabase', 'storage3', 'postgrest', 'gotrue', 'realtime', 'supafunc', 'httpx',
+    'app.supabase_client', 'app.migrations', 'app.query_plans',
+)
+
+
+def measure_once(env):
+    """[(module, self µs, cumulative µs)] of one fresh `import run`, ending with `run` itself"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import run'],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        sys.exit(f'✗ import run failed:\n{result.stderr}')
+
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+        if not name.startswith('   '):
+            # A top-level import: interpreter startup, or `run` after its own imports
+            if name.strip() == 'run':
+                return modules
+            modules = []
+    sys.exit('✗ No import time reported for run')
+
+
+def by_package(modules):
+    """Own import time per top-level package in ms, biggest first; `run` includes create_app"""
+    packages = {}
+    for name, self_us, _ in modules:
+        package = name.split('.')[0]
+        packages[package] = packages.get(package, 0) + self_us / 1000
+    return sorted(packages.items(), key=lambda item: item[1], reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the cold-start import cost of the app.')
+    parser.add_argument('--budget-ms', type=float, default=float(os.environ.get('IMPORT_TIME_BUDGET_MS', 800)),
+                        help='Maximum median time of `import run` in ms')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters to measure (median is used)')
+    parser.add_argument('--top', type=int, default=10, help='Packages to list')
+    parser.add_argument('--baseline', help='JSON file from --save to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Allowed slowdown against the baseline (0.2 = 20%%)')
+    parser.add_argument('--save', help='Write the measurement to this JSON file')
+    args = parser.parse_args()
+
+    # A throwaway database and no background threads; nothing is written at import
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    env.setdefault('DB_CONNECTION', 'sqlite')
+    env.setdefault('DATABASE_URL', f'sqlite:///{os.path.join(tempfile.gettempdir(), "lnsp-import-time.db")}')
+    env['JOB_WORKERS'] = '0'
+
+    # The first run writes bytecode caches, as a deployment build would
+    measure_once(env)
+    runs = [measure_once(env) for _ in range(args.runs)]
+    totals = sorted(modules[-1][2] / 1000 for modules in runs)
+    total = statistics.median_low(totals)
+    modules = next(modules for modules in runs if modules[-1][2] / 1000 == total)
+    packages = by_package(modules)
+
+    print(f'import run: {total:.1f} ms median of {args.runs} (min {totals[0]:.1f}, max {totals[-1]:.1f})')
+    for package, ms in packages[:args.top]:
+        print(f'  {package:24} {ms:8.1f} ms')
+    app_modules = sorted(((name, self_us) for name, self_us, _ in modules if name.split('.')[0] == 'app'),
+                         key=lambda item: item[1], reverse=True)
+    print('App modules:')
+    for name, self_us in app_modules[:args.top]:
+        print(f'  {name:24} {self_us / 1000:8.1f} ms')
+
+    failures = []
+    eager = [name for name, _, _ in modules if name in LAZY_MODULES]
+    if eager:
+        failures.append(f'imported at startup, should be lazy: {", ".join(sorted(eager))}')
+    if total > args.budget_ms:
+        failures.append(f'{total:.1f} ms is over the budget of {args.budget_ms:.0f} ms')
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['total_ms']
+        limit = baseline * (1 + args.threshold)
+        print(f'Baseline: {baseline:.1f} ms, limit {limit:.1f} ms')
+        if total > limit:
+            failures.append(f'{total:.1f} ms is {total / baseline - 1:.0%} slower than the baseline')
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'total_ms': total, 'packages_ms': dict(packages)}, f, indent=2)
+
+    for failure in failures:
+        print(f'✗ {failure}')
+    if failures:
+        sys.exit(1)
+    print('✓ Cold-start imports within budget.')
+
+
+if __name__ == '__main__':
+    main()
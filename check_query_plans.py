@@ -0,0 +1,48 @@
+"""Query plan checker for the hot note queries
+
+EXPLAINs the queries behind the dashboards, course pages, downloads, uploads and
+bulk deletes on the configured database and fails if any of them reads a
+whole table or sorts rows instead of using an index. Run it in CI and after
+changing a query or an index (the database must be migrated first);
+`tests/test_query_plans.py` runs the same checks on the test database.
+
+Examples:
+    python check_query_plans.py              # exits 1 if a plan is rejected
+    python check_query_plans.py --verbose    # also print every plan
+"""
+import argparse
+import sys
+from app import create_app
+from app.migrations import pending_migrations
+from app.query_plans import check_query_plans
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that the hot note queries use indexes.')
+    parser.add_argument('--verbose', action='store_true', help='Print the plan of every query')
+    args = parser.parse_args()
+
+    app = create_app('config.Config')
+    with app.app_context():
+        pending = pending_migrations()
+        if pending:
+            print(f'The database is missing {len(pending)} migration(s); run `python migrate.py` first.')
+            sys.exit(1)
+        results = check_query_plans()
+
+    failed = 0
+    for name, plan, problems in results:
+        print(f"{'✗' if problems else '✓'} {name}")
+        if problems or args.verbose:
+            for line in plan:
+                print(f'      {line}')
+        failed += bool(problems)
+
+    if failed:
+        print(f'\n{failed} query plan(s) read a whole table or sort rows.')
+        sys.exit(1)
+    print('\n✓ Every hot query uses an index.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+"""Compile the Jinja templates ahead of time
+
+Writes every template in app/templates as a Python module (with bytecode)
+to PRECOMPILED_TEMPLATES_DIR (default: build/templates), so new processes
+such as serverless cold starts don't parse and compile templates on their
+first requests. Run it as a build step before deploying; after editing a
+template, run it again (an outdated build is ignored, see app/templating.py).
+
+Examples:
+    python compile_templates.py
+    python compile_templates.py --target /tmp/templates   # also set PRECOMPILED_TEMPLATES_DIR
+"""
+import argparse
+from app import create_app
+from app.templating import compile_templates
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompile the Jinja templates.')
+    parser.add_argument('--target', help='Output directory (default: PRECOMPILED_TEMPLATES_DIR)')
+    args = parser.parse_args()
+
+    app = create_app('config.Config')
+    target = args.target or app.config['PRECOMPILED_TEMPLATES_DIR']
+    count = compile_templates(app, target)
+    print(f'✓ Compiled {count} templates to {target}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from datetime import timedelta
 
 # Determine DB connection strategy:
@@ -8,6 +9,65 @@ from datetime import timedelta
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 
+# Connection pool defaults per database backend. Every value can be overridden with
+# an environment variable: DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT (seconds),
+# DB_POOL_RECYCLE (seconds, -1 = never), DB_POOL_PRE_PING and DB_STATEMENT_TIMEOUT
+# (milliseconds, 0 = none). pool_size + max_overflow is the most connections one
+# process opens, so keep it times the number of processes below the server's limit.
+ENGINE_PROFILES = {
+    # One file and one writer at a time; readers never wait for writers in WAL mode
+    'sqlite': {'pool_size': 10, 'max_overflow': 10, 'pool_timeout': 30, 'pool_recycle': -1,
+               'pool_pre_ping': False, 'statement_timeout': 0},
+    # MySQL drops idle connections after wait_timeout (often 300 s on managed hosts)
+    'mysql': {'pool_size': 10, 'max_overflow': 20, 'pool_timeout': 30, 'pool_recycle': 280,
+              'pool_pre_ping': True, 'statement_timeout': 30000},
+    'postgres': {'pool_size': 10, 'max_overflow': 20, 'pool_timeout': 30, 'pool_recycle': 1800,
+                 'pool_pre_ping': True, 'statement_timeout': 30000},
+    # Supabase caps connections per project, and its pooler closes idle ones
+    'supabase': {'pool_size': 5, 'max_overflow': 5, 'pool_timeout': 30, 'pool_recycle': 300,
+                 'pool_pre_ping': True, 'statement_timeout': 30000},
+}
+
+
+def get_engine_profile(db_connection, database_uri):
+    """Name of the ENGINE_PROFILES entry for a DB_CONNECTION setting and database URI"""
+    if database_uri.startswith('sqlite'):
+        return 'sqlite'
+    if database_uri.startswith('mysql'):
+        return 'mysql'
+    return 'supabase' if db_connection == 'supabase' else 'postgres'
+
+
+def build_engine_options(profile_name, database_uri):
+    """SQLALCHEMY_ENGINE_OPTIONS for a profile, with environment overrides applied"""
+    profile = ENGINE_PROFILES[profile_name]
+    options = {
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', profile['pool_recycle'])),
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', str(profile['pool_pre_ping'])).lower() in ('1', 'true', 'yes'),
+    }
+    # In-memory SQLite uses a single shared connection, not a sized pool
+    if not (profile_name == 'sqlite' and database_uri.rstrip('/') in ('sqlite:', 'sqlite:/:memory:', 'sqlite:///:memory:')):
+        options['pool_size'] = int(os.environ.get('DB_POOL_SIZE', profile['pool_size']))
+        options['max_overflow'] = int(os.environ.get('DB_MAX_OVERFLOW', profile['max_overflow']))
+        options['pool_timeout'] = float(os.environ.get('DB_POOL_TIMEOUT', profile['pool_timeout']))
+
+    statement_timeout = int(os.environ.get('DB_STATEMENT_TIMEOUT', profile['statement_timeout']))
+    if statement_timeout and profile_name in ('postgres', 'supabase'):
+        options['connect_args'] = {'options': f'-c statement_timeout={statement_timeout}'}
+    elif statement_timeout and profile_name == 'mysql':
+        # Applies to SELECT statements
+        options['connect_args'] = {'init_command': f'SET SESSION max_execution_time={statement_timeout}'}
+    return options
+
+
+def build_replica_binds(db_connection, replica_uris):
+    """SQLALCHEMY_BINDS entries (replica_0, replica_1, ...) for read replica URIs"""
+    return {
+        f'replica_{i}': {'url': uri, **build_engine_options(get_engine_profile(db_connection, uri), uri)}
+        for i, uri in enumerate(replica_uris)
+    }
+
+
 class Config:
     """Base configuration"""
     DB_CONNECTION = os.environ.get('DB_CONNECTION', 'sqlite').lower()
@@ -25,9 +85,135 @@ class Config:
         SQLALCHEMY_DATABASE_URI = DATABASE_URL or f'sqlite:///{os.path.join(basedir, "lnsp.db")}'
 
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    DB_ENGINE_PROFILE = get_engine_profile(DB_CONNECTION, SQLALCHEMY_DATABASE_URI)
+    SQLALCHEMY_ENGINE_OPTIONS = build_engine_options(DB_ENGINE_PROFILE, SQLALCHEMY_DATABASE_URI)
+    # Optional read replicas: comma-separated URIs, each with its backend's engine profile.
+    # Views marked @use_replica read from one of them; a client that has just written
+    # reads from the primary for REPLICA_STICKY_SECONDS (see app/replicas.py)
+    DATABASE_REPLICA_URLS = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+    SQLALCHEMY_BINDS = build_replica_binds(DB_CONNECTION, DATABASE_REPLICA_URLS)
+    DB_REPLICA_BINDS = list(SQLALCHEMY_BINDS)
+    REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+    # SQLite connection pragmas (see app/database.py). WAL lets pages be read while a note
+    # is being written; writers wait up to SQLITE_BUSY_TIMEOUT ms for the write lock
+    # instead of failing with "database is locked"
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL').upper()
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL').upper()
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))
     SECRET_KEY = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
     SESSION_COOKIE_HTTPONLY = True
     PERMANENT_SESSION_LIFETIME = timedelta(days=7)
     UPLOAD_FOLDER = os.path.join(basedir, 'uploads')
-    MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50 MB max file size
+    MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50 MB max request body (single-request uploads, one chunk)
+    # Uploads are written to UPLOAD_STAGING_DIR while they are hashed. Default: UPLOAD_FOLDER/.partial
+    # with local storage (must be on the same filesystem, blobs are moved into place), and a
+    # directory under the system temp dir with Supabase, whose UPLOAD_FOLDER may be read-only
+    UPLOAD_STAGING_DIR = os.environ.get('UPLOAD_STAGING_DIR', '')
+    # Chunked uploads: files up to MAX_UPLOAD_SIZE are sent in UPLOAD_CHUNK_SIZE pieces,
+    # staged in UPLOAD_STAGING_DIR and resumable for UPLOAD_SESSION_TTL seconds
+    MAX_UPLOAD_SIZE = int(os.environ.get('MAX_UPLOAD_SIZE', 500 * 1024 * 1024))
+    UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 5 * 1024 * 1024))
+    UPLOAD_SESSION_TTL = int(os.environ.get('UPLOAD_SESSION_TTL', 24 * 60 * 60))
     ALLOWED_EXTENSIONS = {'pdf', 'docx', 'doc'}
+    # Parallel staging/uploading threads for batch imports (batch upload endpoint, import_notes.py)
+    BULK_IMPORT_WORKERS = int(os.environ.get('BULK_IMPORT_WORKERS', 4))
+    # Largest batch upload: files (zip entries included) and their total uncompressed size
+    BULK_IMPORT_MAX_FILES = int(os.environ.get('BULK_IMPORT_MAX_FILES', 500))
+    BULK_IMPORT_MAX_SIZE = int(os.environ.get('BULK_IMPORT_MAX_SIZE', 2 * 1024 * 1024 * 1024))
+    # Files removed per storage call (and per retried job) by bulk deletes
+    STORAGE_DELETE_BATCH_SIZE = int(os.environ.get('STORAGE_DELETE_BATCH_SIZE', 1000))
+    # Chunk size for streaming downloads from remote storage (bounds memory per download)
+    DOWNLOAD_CHUNK_SIZE = int(os.environ.get('DOWNLOAD_CHUNK_SIZE', 64 * 1024))
+    # Supabase downloads: 'proxy' streams bytes through the worker, 'redirect' issues a 302
+    # to a short-lived signed URL (cached and reused until SIGNED_URL_REFRESH_MARGIN before expiry)
+    DOWNLOAD_MODE = os.environ.get('DOWNLOAD_MODE', 'proxy').lower()
+    SIGNED_URL_EXPIRES_IN = int(os.environ.get('SIGNED_URL_EXPIRES_IN', 600))
+    SIGNED_URL_REFRESH_MARGIN = int(os.environ.get('SIGNED_URL_REFRESH_MARGIN', 60))
+    # Local downloads: 'accel' (nginx X-Accel-Redirect to FILE_OFFLOAD_PREFIX) or 'sendfile'
+    # (Apache/lighttpd X-Sendfile) let the proxy send the file; 'none' sends it from the worker
+    FILE_OFFLOAD = os.environ.get('FILE_OFFLOAD', 'none').lower()
+    FILE_OFFLOAD_PREFIX = os.environ.get('FILE_OFFLOAD_PREFIX', '/protected-uploads/')
+    # Proxied Supabase downloads read through an LRU cache of objects on local disk (see
+    # app/object_cache.py): at most OBJECT_CACHE_SIZE bytes (0 disables), objects up to
+    # OBJECT_CACHE_MAX_OBJECT bytes. Point OBJECT_CACHE_DIR at tmpfs to keep it in memory
+    OBJECT_CACHE_DIR = os.environ.get('OBJECT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'lnsp-object-cache'))
+    OBJECT_CACHE_SIZE = int(os.environ.get('OBJECT_CACHE_SIZE', 1024 * 1024 * 1024))
+    OBJECT_CACHE_MAX_OBJECT = int(os.environ.get('OBJECT_CACHE_MAX_OBJECT', 100 * 1024 * 1024))
+    OBJECT_CACHE_FILL_TIMEOUT = float(os.environ.get('OBJECT_CACHE_FILL_TIMEOUT', 60))
+
+    # Conditional requests (ETag/Last-Modified, 304 Not Modified) for downloads and dashboards.
+    # Downloaded files are revalidated on every use unless DOWNLOAD_CACHE_MAX_AGE (seconds) is set
+    HTTP_CACHING = os.environ.get('HTTP_CACHING', 'true').lower() in ('1', 'true', 'yes')
+    DOWNLOAD_CACHE_MAX_AGE = int(os.environ.get('DOWNLOAD_CACHE_MAX_AGE', 0))
+    # Part of every page ETag, so a deploy invalidates cached pages (e.g. the git commit).
+    # Default: a digest of the templates' and static files' sizes and modification times
+    APP_VERSION = os.environ.get('APP_VERSION', '')
+
+    # Note listings and the course list: 'keyset' (cursor tokens, constant cost per page) or 'offset' (numbered pages)
+    PAGINATION_MODE = os.environ.get('PAGINATION_MODE', 'keyset').lower()
+    NOTES_PER_PAGE = int(os.environ.get('NOTES_PER_PAGE', 10))
+    COURSES_PER_PAGE = int(os.environ.get('COURSES_PER_PAGE', 25))
+    # Keyset listings show an approximate total, recounted at most every PAGINATION_COUNT_TTL seconds
+    PAGINATION_SHOW_TOTAL = os.environ.get('PAGINATION_SHOW_TOTAL', 'true').lower() in ('1', 'true', 'yes')
+    PAGINATION_COUNT_TTL = int(os.environ.get('PAGINATION_COUNT_TTL', 60))
+
+    # Password hashing: Werkzeug method string (e.g. 'scrypt:32768:8:1', 'pbkdf2:sha256:600000').
+    # Older hashes are upgraded at login. At most PASSWORD_HASH_WORKERS hashes run at once per
+    # process; logins wait up to PASSWORD_HASH_QUEUE_TIMEOUT seconds for a slot
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_SALT_LENGTH = int(os.environ.get('PASSWORD_SALT_LENGTH', 16))
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 2))
+    PASSWORD_HASH_QUEUE_TIMEOUT = float(os.environ.get('PASSWORD_HASH_QUEUE_TIMEOUT', 10))
+
+    # Identity cache for current_user (see app/identity.py). With USER_SESSION_CLAIMS the
+    # user's id/name/role also live in the signed session cookie for USER_CLAIMS_MAX_AGE seconds
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 10000))
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 300))
+    USER_SESSION_CLAIMS = os.environ.get('USER_SESSION_CLAIMS', 'true').lower() in ('1', 'true', 'yes')
+    USER_CLAIMS_MAX_AGE = int(os.environ.get('USER_CLAIMS_MAX_AGE', 300))
+
+    # Background jobs (storage uploads/deletes). JOB_WORKERS threads per process;
+    # 0 runs jobs inline at the end of the request (use on serverless hosts)
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    JOB_QUEUE = os.environ.get('JOB_QUEUE', 'app.jobs.DatabaseQueue')
+    JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 5))
+    JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 8))
+    JOB_RETRY_BASE_DELAY = float(os.environ.get('JOB_RETRY_BASE_DELAY', 5))  # doubles per attempt
+    JOB_STALE_AFTER = int(os.environ.get('JOB_STALE_AFTER', 15 * 60))  # requeue 'running' jobs older than this
+
+    # Download statistics (see app/download_stats.py): downloads are counted in memory and
+    # written with one batched upsert every DOWNLOAD_STATS_FLUSH_INTERVAL seconds, once
+    # DOWNLOAD_STATS_MAX_PENDING notes are waiting, and at exit. The dashboard's "popular this
+    # week" list (POPULAR_NOTES_COUNT notes over POPULAR_NOTES_DAYS days) is recomputed after a
+    # flush at most every POPULAR_NOTES_REFRESH seconds
+    DOWNLOAD_STATS_ENABLED = os.environ.get('DOWNLOAD_STATS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    DOWNLOAD_STATS_FLUSH_INTERVAL = float(os.environ.get('DOWNLOAD_STATS_FLUSH_INTERVAL', 30))
+    DOWNLOAD_STATS_MAX_PENDING = int(os.environ.get('DOWNLOAD_STATS_MAX_PENDING', 10000))
+    POPULAR_NOTES_COUNT = int(os.environ.get('POPULAR_NOTES_COUNT', 5))
+    POPULAR_NOTES_DAYS = int(os.environ.get('POPULAR_NOTES_DAYS', 7))
+    POPULAR_NOTES_REFRESH = int(os.environ.get('POPULAR_NOTES_REFRESH', 300))
+
+    # Rendered note listings on the dashboards, cached per page, search and uploader until notes
+    # change (see app/fragment_cache.py): 'memory' per process, 'file' shared by the processes
+    # on a host through FRAGMENT_CACHE_DIR, or 'none'
+    FRAGMENT_CACHE = os.environ.get('FRAGMENT_CACHE', 'memory').lower()
+    FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE', 1000))
+    FRAGMENT_CACHE_TTL = int(os.environ.get('FRAGMENT_CACHE_TTL', 600))
+    FRAGMENT_CACHE_DIR = os.environ.get('FRAGMENT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'lnsp-fragment-cache'))
+
+    # Add an X-Query-Count header (SQL statements per request) to every response
+    QUERY_COUNT_HEADER = os.environ.get('QUERY_COUNT_HEADER', 'false').lower() in ('1', 'true', 'yes')
+
+    # Prometheus metrics at /metrics: request latency per endpoint, SQL statements and time,
+    # Supabase call timings, job queue, signed URLs and pool usage (see app/metrics.py).
+    # /metrics requires "Authorization: Bearer <METRICS_TOKEN>" and is a 404 without a token
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+    # ?__profile=1 returns a cProfile report of the request to holders of METRICS_TOKEN
+    # (or to anyone in debug mode); see app/profiling.py
+    PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    PROFILE_TOP = int(os.environ.get('PROFILE_TOP', 40))
+
+    # Templates compiled ahead of time by `python compile_templates.py` (see app/templating.py);
+    # used when they match the sources and the app isn't in debug mode
+    PRECOMPILED_TEMPLATES_DIR = os.environ.get('PRECOMPILED_TEMPLATES_DIR', os.path.join(basedir, 'build', 'templates'))
@@ -0,0 +1,80 @@
+"""Bulk lecture note deletion script
+
+Deletes every note matching the given filters in one transaction and
+removes their stored files in large batches (a file shared with a note
+that is kept stays in place). At least one filter is required.
+
+Examples:
+    python delete_notes.py --course-code CSC101 --until 2024-12-31
+    python delete_notes.py --uploader lecturer@example.com --since 2024-01-01 --dry-run
+
+File removals that fail are left as queued jobs and retried by the
+application's job workers, so no file is left behind.
+"""
+import argparse
+import json
+import sys
+from datetime import datetime
+from app import create_app, db
+from app.models import User, Job
+from app.bulk import filter_notes, delete_notes
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'{value!r} is not a YYYY-MM-DD date')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Delete lecture notes matching filters.')
+    parser.add_argument('--course-code', help='Only notes for this course code')
+    parser.add_argument('--since', type=parse_date, help='Only notes uploaded on or after this date (YYYY-MM-DD)')
+    parser.add_argument('--until', type=parse_date, help='Only notes uploaded on or before this date (YYYY-MM-DD)')
+    parser.add_argument('--uploader', help='Only notes uploaded by the lecturer with this email')
+    parser.add_argument('--dry-run', action='store_true', help='Show how many notes match without deleting')
+    parser.add_argument('--yes', action='store_true', help='Do not ask for confirmation')
+    args = parser.parse_args()
+
+    if not (args.course_code or args.since or args.until or args.uploader):
+        parser.error('at least one of --course-code, --since, --until or --uploader is required')
+
+    app = create_app('config.Config')
+    # Remove files right here instead of waiting for the web app's workers
+    app.config['JOB_WORKERS'] = 0
+    with app.app_context():
+        uploader_id = None
+        if args.uploader:
+            uploader = User.query.filter_by(email=args.uploader).first()
+            if uploader is None:
+                print(f'No user with email {args.uploader}.')
+                sys.exit(1)
+            uploader_id = uploader.id
+
+        query = filter_notes(args.course_code, args.since, args.until, uploader_id)
+        count = query.count()
+        print(f'{count} note(s) match.')
+        if args.dry_run or not count:
+            return
+        if not args.yes and input('Delete them? [y/N] ').strip().lower() != 'y':
+            print('Aborted.')
+            return
+
+        deleted, files_queued, job_ids = delete_notes(query)
+        print(f'✓ {deleted} note(s) deleted.')
+
+        # This run's batches that failed stay queued for retry; jobs of other
+        # runs and deletes are not ours to report
+        pending = db.session.execute(
+            db.select(Job.payload).where(Job.id.in_(job_ids))
+        ).scalars().all() if job_ids else []
+        remaining = sum(len(json.loads(payload)['files']) for payload in pending)
+        print(f'✓ {files_queued - remaining} of {files_queued} unused file(s) removed from storage.')
+        if remaining:
+            print(f'✗ {remaining} file(s) could not be removed yet; they will be retried by the job workers.')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Bulk lecture note import script
+
+Imports many files as notes of one lecturer in a single batch: files are
+staged and uploaded to storage in parallel, and all notes are inserted in
+one transaction. Each argument can be a file, a directory (imported
+recursively) or a zip archive.
+
+Every file needs a course title and code, given either for the whole batch
+(--course-title/--course-code) or per file in a CSV manifest with the
+columns filename, course_code, course_title.
+
+Examples:
+    python import_notes.py --lecturer lecturer@example.com --course-code CSC101 --course-title "Introduction to Programming" notes/
+    python import_notes.py --lecturer lecturer@example.com --manifest semester.csv semester.zip
+
+It reads the database and storage settings from `config.Config` and the
+environment, like the application.
+"""
+import argparse
+import os
+import sys
+import zipfile
+from app import create_app
+from app.models import User
+from app.bulk import import_notes, items_from_zip, make_item, read_manifest
+
+
+def collect_items(paths, course_title, course_code, manifest):
+    items = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+                for name in sorted(files):
+                    if not name.startswith('.'):
+                        items.extend(collect_items([os.path.join(root, name)], course_title, course_code, manifest))
+        elif zipfile.is_zipfile(path):
+            archive = zipfile.ZipFile(path)
+            items.extend(items_from_zip(archive, course_title, course_code, manifest))
+        elif os.path.isfile(path):
+            items.append(make_item(path, lambda path=path: open(path, 'rb'), course_title, course_code, manifest))
+        else:
+            print(f'✗ {path}: not found')
+    return items
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk import lecture notes for a lecturer.')
+    parser.add_argument('paths', nargs='+', help='Files, directories or zip archives to import')
+    parser.add_argument('--lecturer', required=True, help='Email of the lecturer the notes belong to')
+    parser.add_argument('--course-title', default='', help='Course title for every file not in the manifest')
+    parser.add_argument('--course-code', default='', help='Course code for every file not in the manifest')
+    parser.add_argument('--manifest', help='CSV file with filename, course_code, course_title columns')
+    parser.add_argument('--workers', type=int, help='Parallel staging/upload workers (default: BULK_IMPORT_WORKERS)')
+    args = parser.parse_args()
+
+    manifest = None
+    if args.manifest:
+        with open(args.manifest, encoding='utf-8-sig') as f:
+            manifest = read_manifest(f.read())
+
+    app = create_app('config.Config')
+    with app.app_context():
+        lecturer = User.query.filter_by(email=args.lecturer, role='lecturer').first()
+        if lecturer is None:
+            print(f'No lecturer with email {args.lecturer}.')
+            sys.exit(1)
+
+        items = collect_items(args.paths, args.course_title.strip(), args.course_code.strip(), manifest)
+        if not items:
+            print('No files to import.')
+            sys.exit(1)
+
+        print(f'Importing {len(items)} file(s) for {lecturer.name}...')
+        results = import_notes(items, lecturer.id, workers=args.workers)
+
+    failed = 0
+    for result in results:
+        if result.ok:
+            note = f'note {result.note_id}' + (', content already stored' if result.duplicate else '')
+            print(f'✓ {result.filename} ({note})')
+        else:
+            failed += 1
+            print(f'✗ {result.filename}: {result.error}')
+    print(f'\n{len(results) - failed} imported, {failed} failed.')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
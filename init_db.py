@@ -1,16 +1,20 @@
 """Database initialization script
 
 This script supports SQLite, MySQL, and PostgreSQL (via Supabase). It will:
-- For SQLite: create the SQLite database file and run SQLAlchemy `create_all()` to create tables.
-- For MySQL: connect to the MySQL server, create the database if it doesn't exist, then run SQLAlchemy `create_all()`.
-- For PostgreSQL: ensure the PostgreSQL database exists, then run SQLAlchemy `create_all()`.
+- For SQLite: create the SQLite database file.
+- For MySQL: connect to the MySQL server and create the database if it doesn't exist.
+- For PostgreSQL: ensure the PostgreSQL database exists.
+- Apply the pending schema migrations (see `migrate.py`): create the tables, add
+  missing columns and indexes, build the full-text search index (SQLite FTS5 or
+  PostgreSQL tsvector/pg_trgm) and the course catalog.
 
 It reads the application's `SQLALCHEMY_DATABASE_URI` from `config.Config`, so you can switch databases by updating `config.py` or setting the `DATABASE_URL` environment variable.
 """
 from urllib.parse import urlparse
 import os
 import sys
-from app import create_app, db
+from app import create_app
+from app.migrations import upgrade, head_version
 from config import Config
 
 
@@ -131,11 +135,11 @@ def main():
     else:
         print('Detected SQLite URI — no additional setup needed.')
 
-    # Create tables using SQLAlchemy
+    # Create tables and bring existing ones up to date
     with app.app_context():
-        print('Creating tables via SQLAlchemy...')
-        db.create_all()
-        print('✓ Tables created (if not present).')
+        print('Applying schema migrations...')
+        applied = upgrade()
+        print(f'✓ Schema at version {head_version()} ({len(applied)} migration(s) applied).')
         print('\nDatabase initialization complete!')
         print('You can now start the application with: python run.py')
 if __name__ == '__main__':
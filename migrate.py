@@ -0,0 +1,41 @@
+"""Database migration script
+
+Applies the pending schema migrations from `app/migrations.py` to the
+configured database, in order, and records each one in the `schema_version`
+table. Databases created before migrations existed are upgraded in place:
+missing tables, columns and indexes are added and existing ones are kept.
+
+Examples:
+    python migrate.py              # apply every pending migration
+    python migrate.py --status     # show applied and pending migrations
+    python migrate.py --to 5       # apply pending migrations up to version 5
+"""
+import argparse
+from app import create_app
+from app.migrations import upgrade, get_applied, pending_migrations
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply pending database migrations.')
+    parser.add_argument('--status', action='store_true', help='Show migrations without applying them')
+    parser.add_argument('--to', type=int, metavar='VERSION', help='Stop after this version')
+    args = parser.parse_args()
+
+    app = create_app('config.Config')
+    with app.app_context():
+        if args.status:
+            for row in get_applied():
+                print(f'✓ {row.version:04d} {row.description} (applied {row.applied_at:%Y-%m-%d %H:%M})')
+            for version, description, _ in pending_migrations():
+                print(f'  {version:04d} {description} (pending)')
+            return
+
+        applied = upgrade(target=args.to)
+        if applied:
+            print(f'✓ Applied {len(applied)} migration(s); schema is at version {applied[-1]}.')
+        else:
+            print('✓ Schema is up to date.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Shared fixtures: an application on a throwaway SQLite database per test,
+a lecturer and a student, and logged-in test clients.
+
+    pip install pytest
+    python -m pytest
+"""
+
+import io
+import os
+
+import pytest
+
+# Read when config is imported: no background workers, no Supabase, and a
+# cheap password hash so logging in doesn't dominate the test run
+os.environ['DB_CONNECTION'] = 'sqlite'
+os.environ['JOB_WORKERS'] = '0'
+os.environ['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+for name in ('SUPABASE_URL', 'SUPABASE_KEY'):
+    os.environ.pop(name, None)
+
+from config import Config
+from app import create_app, db
+from app import fragment_cache, pagination, supabase_client
+from app.models import User, Note
+from app.migrations import upgrade
+
+PASSWORD = 'secret1'
+
+
+@pytest.fixture
+def app(tmp_path):
+    class TestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path / "test.db"}'
+        UPLOAD_FOLDER = str(tmp_path / 'uploads')
+        FRAGMENT_CACHE = 'memory'
+        OBJECT_CACHE_DIR = str(tmp_path / 'object-cache')
+        DOWNLOAD_STATS_ENABLED = False
+
+    # Process-wide caches would otherwise carry pages between tests
+    fragment_cache._reset_backend()
+    pagination._count_cache.clear()
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        # The schema a deployment gets: the models plus every migration
+        upgrade(echo=lambda message: None)
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def supabase(monkeypatch):
+    """Supabase Storage served by the local mock of its REST API (benchmarks/mock_storage.py)"""
+    from benchmarks.mock_storage import MockStorageServer, MOCK_KEY
+
+    server = MockStorageServer().start()
+    monkeypatch.setenv('SUPABASE_URL', server.url)
+    monkeypatch.setenv('SUPABASE_KEY', MOCK_KEY)
+    supabase_client._reset_clients()
+    yield server
+    supabase_client._reset_clients()
+    server.stop()
+
+
+def _add_user(app, name, email, role):
+    with app.app_context():
+        user = User(name=name, email=email, role=role)
+        user.set_password(PASSWORD)
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+@pytest.fixture
+def lecturer_id(app):
+    return _add_user(app, 'Lecturer', 'lecturer@test.local', 'lecturer')
+
+
+@pytest.fixture
+def student_id(app):
+    return _add_user(app, 'Student', 'student@test.local', 'student')
+
+
+def login(app, email):
+    client = app.test_client()
+    response = client.post('/login', data={'email': email, 'password': PASSWORD})
+    assert response.status_code == 302, response.status_code
+    # Show the welcome flash, so later pages are conditional
+    client.get(response.location)
+    return client
+
+
+@pytest.fixture
+def lecturer(app, lecturer_id):
+    return login(app, 'lecturer@test.local')
+
+
+@pytest.fixture
+def student(app, student_id):
+    return login(app, 'student@test.local')
+
+
+@pytest.fixture
+def upload_note(app, lecturer):
+    """Upload a note as the lecturer and return its id; the flash it leaves is consumed"""
+    def upload(course_code='CS101', content=b'%PDF-1.4 lecture notes'):
+        response = lecturer.post('/lecturer/upload', data={
+            'course_title': 'Intro Python',
+            'course_code': course_code,
+            'file': (io.BytesIO(content), f'{course_code}.pdf'),
+        }, content_type='multipart/form-data')
+        assert response.status_code == 302, response.status_code
+        lecturer.get(response.location)
+        with app.app_context():
+            return Note.query.filter_by(course_code=course_code).one().id
+    return upload
@@ -0,0 +1,79 @@
+"""Batch uploads (app/bulk.py)"""
+
+import io
+import os
+import zipfile
+
+from app.models import Note
+
+
+def make_zip(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, data in files.items():
+            archive.writestr(name, data)
+    buffer.seek(0)
+    return buffer
+
+
+def batch_upload(client, archive):
+    return client.post('/lecturer/upload/batch', data={
+        'course_title': 'Intro Python',
+        'course_code': 'CS101',
+        'files': (archive, 'notes.zip'),
+    }, content_type='multipart/form-data')
+
+
+def test_zip_is_imported(app, lecturer):
+    response = batch_upload(lecturer, make_zip({'week1.pdf': b'%PDF-1.4 one', 'week2.pdf': b'%PDF-1.4 two'}))
+    assert response.status_code == 201
+    assert response.json['imported'] == 2
+    with app.app_context():
+        assert Note.query.count() == 2
+
+
+def test_too_many_files_rejected_before_staging(app, lecturer):
+    app.config['BULK_IMPORT_MAX_FILES'] = 3
+    archive = make_zip({f'week{i}.pdf': b'%PDF-1.4' for i in range(4)})
+    response = batch_upload(lecturer, archive)
+    assert response.status_code == 413
+    with app.app_context():
+        assert Note.query.count() == 0
+    assert not os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], '.partial'))
+
+
+def test_uncompressed_size_limit(app, lecturer):
+    # Compresses to a few kB, expands to 3 MB
+    app.config['BULK_IMPORT_MAX_SIZE'] = 2 * 1024 * 1024
+    archive = make_zip({f'week{i}.pdf': b'\0' * 1024 * 1024 for i in range(3)})
+    response = batch_upload(lecturer, archive)
+    assert response.status_code == 413
+    with app.app_context():
+        assert Note.query.count() == 0
+    assert not os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], '.partial'))
+
+
+def fail_transaction(monkeypatch):
+    def index_notes(notes):
+        raise RuntimeError('database went away')
+    monkeypatch.setattr('app.bulk.index_notes', index_notes)
+
+
+def stored_files(folder):
+    return [name for _, _, names in os.walk(folder) for name in names]
+
+
+def test_failed_transaction_removes_moved_blobs(app, lecturer, monkeypatch):
+    fail_transaction(monkeypatch)
+    response = batch_upload(lecturer, make_zip({'week1.pdf': b'%PDF-1.4 one', 'week2.pdf': b'%PDF-1.4 two'}))
+    assert response.status_code == 400
+    assert all('database went away' in result['error'] for result in response.json['results'])
+    assert stored_files(app.config['UPLOAD_FOLDER']) == []
+
+
+def test_failed_transaction_removes_uploaded_objects(app, lecturer, supabase, monkeypatch):
+    fail_transaction(monkeypatch)
+    response = batch_upload(lecturer, make_zip({'week1.pdf': b'%PDF-1.4 one', 'week2.pdf': b'%PDF-1.4 two'}))
+    assert response.status_code == 400
+    assert supabase.storage.calls['upload'] == 2
+    assert os.listdir(supabase.storage.root) == []
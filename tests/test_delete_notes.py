@@ -0,0 +1,44 @@
+"""Bulk note deletion (app/bulk.py, delete_notes.py)"""
+
+import delete_notes as cli
+from app import db
+from app.jobs import enqueue
+from app.models import Note
+
+
+def run_cli(app, monkeypatch, *args):
+    monkeypatch.setattr('sys.argv', ['delete_notes.py', *args])
+    monkeypatch.setattr(cli, 'create_app', lambda config: app)
+    """Exit status of delete_notes.py run on the test app"""
+    try:
+        cli.main()
+    except SystemExit as e:
+        return e.code
+    return 0
+
+
+def test_cli_reports_only_its_own_jobs(app, upload_note, monkeypatch, capsys):
+    upload_note('CS101', b'%PDF-1.4 week 1')
+    upload_note('CS102', b'%PDF-1.4 week 2')
+    with app.app_context():
+        # Another run's batch, waiting for a retry
+        enqueue('storage.delete_batch', delay=3600, files=[{'file_path': '/elsewhere/week1.pdf'}])
+        db.session.commit()
+
+    assert run_cli(app, monkeypatch, '--course-code', 'CS101', '--yes') == 0
+    out = capsys.readouterr().out
+    assert '1 note(s) deleted' in out
+    assert '1 of 1 unused file(s) removed' in out
+    with app.app_context():
+        assert [note.course_code for note in Note.query.all()] == ['CS102']
+
+
+def test_cli_reports_its_failed_batches(app, upload_note, monkeypatch, capsys):
+    upload_note('CS101')
+
+    def fail(file_paths):
+        raise Exception('storage unavailable')
+    monkeypatch.setattr('app.storage.delete_note_files', fail)
+
+    assert run_cli(app, monkeypatch, '--course-code', 'CS101', '--yes') == 1
+    assert '1 file(s) could not be removed yet' in capsys.readouterr().out
@@ -0,0 +1,62 @@
+"""Note downloads from Supabase Storage (student.download_note)"""
+
+import io
+import tracemalloc
+
+from app import db
+from app.models import Note
+
+
+def upload(client, filename, content):
+    response = client.post('/lecturer/upload', data={
+        'course_title': 'Intro Python',
+        'course_code': 'CS101',
+        'file': (io.BytesIO(content), filename),
+    }, content_type='multipart/form-data')
+    assert response.status_code == 302
+
+
+def test_streamed_download_type_follows_filename(app, lecturer, student, supabase):
+    app.config['OBJECT_CACHE_SIZE'] = 0
+    upload(lecturer, 'week1.pdf', b'%PDF-1.4 lecture notes')
+    with app.app_context():
+        note = Note.query.one()
+        # Stored as blobs/<digest>, without an extension
+        assert '/blobs/' in note.file_path
+
+    response = student.get(f'/student/download/{note.id}')
+    assert response.status_code == 200
+    assert response.data == b'%PDF-1.4 lecture notes'
+    assert response.mimetype == 'application/pdf'
+
+
+def test_streamed_download_is_never_buffered(app, lecturer_id, student, supabase):
+    """A large object goes through the worker a chunk at a time"""
+    app.config['OBJECT_CACHE_SIZE'] = 0
+    size = 32 * 1024 * 1024
+    supabase.storage.put_file('lecture-notes/uploads/large.pdf', size)
+    with app.app_context():
+        note = Note(course_title='Large', course_code='BIG1', filename='large.pdf', uploaded_by=lecturer_id,
+                    file_path=f'{supabase.url}/storage/v1/object/public/lecture-notes/uploads/large.pdf')
+        db.session.add(note)
+        db.session.commit()
+        note_id = note.id
+
+    chunk_size = app.config['DOWNLOAD_CHUNK_SIZE']
+    tracemalloc.start()
+    try:
+        response = student.get(f'/student/download/{note_id}', buffered=False)
+        assert response.status_code == 200
+        received = largest = 0
+        for chunk in response.response:
+            received += len(chunk)
+            largest = max(largest, len(chunk))
+        response.close()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert received == size
+    assert largest <= chunk_size
+    # A buffered download would hold all 32 MB at once
+    assert peak < 4 * 1024 * 1024, peak
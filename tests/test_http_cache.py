@@ -0,0 +1,130 @@
+"""Conditional requests for note downloads and dashboards (app/http_cache.py)"""
+
+from datetime import date
+
+from app import db
+from app.download_stats import write_counts
+from app.models import User
+
+CONTENT = b'%PDF-1.4 ' + bytes(range(256)) * 4
+
+
+def test_download_if_none_match(student, upload_note):
+    note_id = upload_note(content=CONTENT)
+    response = student.get(f'/student/download/{note_id}')
+    assert response.status_code == 200
+    assert response.data == CONTENT
+    etag = response.headers['ETag']
+    assert not etag.startswith('W/')
+
+    response = student.get(f'/student/download/{note_id}', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+
+def test_download_if_modified_since(student, upload_note):
+    note_id = upload_note(content=CONTENT)
+    last_modified = student.get(f'/student/download/{note_id}').headers['Last-Modified']
+
+    response = student.get(f'/student/download/{note_id}', headers={'If-Modified-Since': last_modified})
+    assert response.status_code == 304
+    assert response.data == b''
+
+
+def test_download_if_range(student, upload_note):
+    note_id = upload_note(content=CONTENT)
+    etag = student.get(f'/student/download/{note_id}').headers['ETag']
+
+    # Unchanged file: only the requested range is sent
+    response = student.get(f'/student/download/{note_id}', headers={'Range': 'bytes=0-99', 'If-Range': etag})
+    assert response.status_code == 206
+    assert response.data == CONTENT[:100]
+    assert response.headers['Content-Range'] == f'bytes 0-99/{len(CONTENT)}'
+
+    # The client's partial copy is of another file: the whole body is sent
+    response = student.get(f'/student/download/{note_id}', headers={'Range': 'bytes=0-99', 'If-Range': '"stale"'})
+    assert response.status_code == 200
+    assert response.data == CONTENT
+
+
+def test_dashboard_revalidation(student, upload_note):
+    upload_note('CS101')
+    response = student.get('/student/dashboard')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert etag.startswith('W/')
+    assert response.headers['Cache-Control'] in ('private, no-cache', 'no-cache, private')
+
+    response = student.get('/student/dashboard', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+
+
+def test_dashboard_etag_changes_on_upload_and_delete(lecturer, student, upload_note):
+    upload_note('CS101')
+    first = student.get('/student/dashboard').headers['ETag']
+
+    note_id = upload_note('CS102')
+    response = student.get('/student/dashboard', headers={'If-None-Match': first})
+    assert response.status_code == 200
+    assert b'CS102' in response.data
+    second = response.headers['ETag']
+    assert second != first
+
+    response = lecturer.post(f'/lecturer/delete/{note_id}')
+    assert response.status_code == 302
+    response = student.get('/student/dashboard', headers={'If-None-Match': second})
+    assert response.status_code == 200
+    assert b'CS102' not in response.data
+    assert response.headers['ETag'] not in (first, second)
+
+
+def test_pending_flash_is_rendered_without_etag(lecturer, upload_note):
+    upload_note('CS101')
+    etag = lecturer.get('/lecturer/dashboard').headers['ETag']
+
+    response = lecturer.post(f'/lecturer/delete/{upload_note("CS102")}')
+    assert response.status_code == 302
+    # Even a matching validator must not hide the flash message
+    response = lecturer.get('/lecturer/dashboard', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert b'Lecture note deleted successfully!' in response.data
+    assert 'ETag' not in response.headers
+
+    # Once shown, the page is conditional again
+    assert 'ETag' in lecturer.get('/lecturer/dashboard').headers
+
+
+def test_download_counts_only_change_their_uploaders_dashboard(app, lecturer, upload_note):
+    note_id = upload_note('CS101')
+    with app.app_context():
+        other = User(name='Other', email='other@test.local', role='lecturer')
+        other.set_password('secret1')
+        db.session.add(other)
+        db.session.commit()
+    other_lecturer = app.test_client()
+    other_lecturer.post('/login', data={'email': 'other@test.local', 'password': 'secret1'}, follow_redirects=True)
+
+    etags = {client: client.get('/lecturer/dashboard').headers['ETag'] for client in (lecturer, other_lecturer)}
+    with app.app_context():
+        write_counts({(note_id, date.today()): 3})
+        db.session.commit()
+
+    response = lecturer.get('/lecturer/dashboard', headers={'If-None-Match': etags[lecturer]})
+    assert response.status_code == 200
+    response = other_lecturer.get('/lecturer/dashboard', headers={'If-None-Match': etags[other_lecturer]})
+    assert response.status_code == 304
+
+
+def test_new_release_changes_dashboard_etag(app, student, upload_note):
+    upload_note('CS101')
+    app.config['APP_VERSION'] = 'release-1'
+    etag = student.get('/student/dashboard').headers['ETag']
+    assert student.get('/student/dashboard', headers={'If-None-Match': etag}).status_code == 304
+
+    # Same data, new templates: the cached copy must not be reused
+    app.config['APP_VERSION'] = 'release-2'
+    response = student.get('/student/dashboard', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
@@ -0,0 +1,50 @@
+"""Cached current_user (app/identity.py): how often a request reads the users table"""
+
+from app import identity
+from app.instrumentation import count_queries
+
+
+def user_lookups(client, url='/student/dashboard'):
+    """SELECTs from the users table made by one request"""
+    with count_queries() as counter:
+        response = client.get(url)
+    assert response.status_code == 200, response.status_code
+    return [statement for statement in counter.statements if 'FROM users' in statement]
+
+
+def test_warm_cache_needs_no_query(app, student):
+    app.config['USER_SESSION_CLAIMS'] = False
+    # Login cached the identity
+    assert user_lookups(student) == []
+    assert user_lookups(student) == []
+
+
+def test_cold_cache_queries_once_without_claims(app, student, student_id):
+    app.config['USER_SESSION_CLAIMS'] = False
+    identity._user_cache.clear()
+
+    assert len(user_lookups(student)) == 1
+    assert identity._user_cache.get(student_id) is not None
+    assert user_lookups(student) == []
+
+
+def test_cold_cache_uses_session_claims(app, student):
+    app.config['USER_SESSION_CLAIMS'] = True
+    identity._user_cache.clear()
+
+    assert user_lookups(student) == []
+
+
+def test_logout_forgets_identity(app, student, student_id):
+    with student.session_transaction() as session:
+        assert identity.CLAIMS_KEY in session
+    assert identity._user_cache.get(student_id) is not None
+
+    student.get('/logout')
+
+    assert identity._user_cache.get(student_id) is None
+    with student.session_transaction() as session:
+        assert identity.CLAIMS_KEY not in session
+    # The next request is anonymous rather than served from stale claims
+    response = student.get('/student/dashboard')
+    assert response.status_code == 302
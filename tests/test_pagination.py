@@ -0,0 +1,72 @@
+"""Note listings (app/pagination.py) cost a constant number of queries"""
+
+from app import db
+from app.instrumentation import count_queries
+from app.models import User, Note, Course
+from app.pagination import keyset_paginate_courses
+from app.search import index_notes
+
+URLS = ('/student/dashboard', '/student/dashboard?search=python')
+
+
+def add_notes(app, start, stop):
+    """Notes numbered start..stop-1, each from its own lecturer, so lazy uploader loads would show"""
+    with app.app_context():
+        notes = []
+        for i in range(start, stop):
+            uploader = User(name=f'Lecturer {i}', email=f'lecturer{i}@notes.local', role='lecturer')
+            uploader.password_hash = 'x'
+            db.session.add(uploader)
+            db.session.flush()
+            notes.append(Note(course_title='Intro Python', course_code=f'CS{100 + i}', filename=f'week{i}.pdf',
+                              file_path=f'/notes/week{i}.pdf', uploaded_by=uploader.id))
+        db.session.add_all(notes)
+        db.session.flush()
+        index_notes(notes)
+        db.session.commit()
+
+
+def statements_for(client, url, notes):
+    with count_queries() as counter:
+        response = client.get(url)
+    assert response.status_code == 200
+    assert response.data.count(b'Lecturer ') == notes, url
+    return counter.count
+
+
+def test_listing_queries_do_not_grow_with_notes(app, student):
+    # Render the whole listing on every request
+    app.config.update(HTTP_CACHING=False, FRAGMENT_CACHE='none', NOTES_PER_PAGE=25)
+
+    add_notes(app, 0, 1)
+    one_note = {url: statements_for(student, url, 1) for url in URLS}
+    add_notes(app, 1, 20)
+    twenty_notes = {url: statements_for(student, url, 20) for url in URLS}
+    assert twenty_notes == one_note
+
+
+def test_course_catalog_keyset_pages(app, student):
+    codes = [f'CS{100 + i}' for i in range(25)]
+    with app.app_context():
+        db.session.add_all(Course(course_code=code, course_title='Intro', note_count=1) for code in codes)
+        db.session.commit()
+
+        seen, cursor = [], None
+        while True:
+            page = keyset_paginate_courses(Course.query, cursor, per_page=10)
+            seen += [course.course_code for course in page.items]
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        assert seen == codes
+
+        # Back from the last page
+        page = keyset_paginate_courses(Course.query, page.prev_cursor, per_page=10)
+        assert [course.course_code for course in page.items] == codes[10:20]
+        assert page.has_prev and page.has_next
+
+    app.config['COURSES_PER_PAGE'] = 10
+    response = student.get('/student/courses')
+    assert response.status_code == 200
+    assert b'CS109' in response.data and b'CS110' not in response.data
+    assert b'cursor=' in response.data
@@ -0,0 +1,12 @@
+"""The hot note queries use indexes (app/query_plans.py, check_query_plans.py)"""
+
+from app.query_plans import check_query_plans
+
+
+def test_hot_queries_use_indexes(app):
+    with app.app_context():
+        results = check_query_plans()
+    assert results
+    rejected = {name: plan for name, plan, problems in results if problems}
+    assert rejected == {}
+
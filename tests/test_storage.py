@@ -0,0 +1,30 @@
+"""Content-addressed note storage (app/storage.py)"""
+
+import io
+import os
+
+from app.models import Note
+from app.storage import get_staging_dir
+
+
+def test_supabase_upload_never_writes_to_upload_folder(app, lecturer, supabase):
+    response = lecturer.post('/lecturer/upload', data={
+        'course_title': 'Intro Python',
+        'course_code': 'CS101',
+        'file': (io.BytesIO(b'%PDF-1.4 lecture notes'), 'notes.pdf'),
+    }, content_type='multipart/form-data')
+    assert response.status_code == 302
+
+    # UPLOAD_FOLDER may be read-only (e.g. on Vercel)
+    assert os.listdir(app.config['UPLOAD_FOLDER']) == []
+    with app.app_context():
+        note = Note.query.filter_by(course_code='CS101').one()
+        # Uploaded inline, as JOB_WORKERS is 0
+        assert note.file_path.startswith(supabase.url)
+        assert not get_staging_dir().startswith(app.config['UPLOAD_FOLDER'])
+
+
+def test_staging_dir_setting(app, tmp_path):
+    app.config['UPLOAD_STAGING_DIR'] = str(tmp_path / 'staging')
+    with app.app_context():
+        assert get_staging_dir() == str(tmp_path / 'staging')
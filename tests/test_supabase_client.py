@@ -0,0 +1,20 @@
+"""Process-wide Supabase clients (app/supabase_client.py)"""
+
+from app import supabase_client
+
+
+def pool_size(client):
+    return client._transport._pool._max_connections
+
+
+def test_pool_size_covers_sdk_and_direct_clients(monkeypatch, supabase):
+    monkeypatch.setenv('SUPABASE_POOL_SIZE', '3')
+
+    # Uploads, deletes and signed URLs go through the SDK's storage session
+    supabase_client.upload_to_supabase(b'%PDF-1.4 lecture notes', 'uploads/notes.pdf')
+    assert pool_size(supabase_client.get_supabase_client().storage.session) == 3
+    assert supabase_client.get_supabase_signed_url('uploads/notes.pdf')
+
+    # Streamed downloads use the direct client
+    assert b''.join(supabase_client.stream_from_supabase('uploads/notes.pdf')[2]) == b'%PDF-1.4 lecture notes'
+    assert pool_size(supabase_client._get_storage_http_client()) == 3
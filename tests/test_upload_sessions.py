@@ -0,0 +1,88 @@
+"""Resumable chunked uploads (lecturer upload sessions)"""
+
+import hashlib
+import io
+
+from app.models import Note
+
+CONTENT = bytes(range(256)) * 12
+
+
+def create_session(client, size):
+    response = client.post('/lecturer/upload/sessions', data={
+        'course_title': 'Intro Python', 'course_code': 'CS101', 'filename': 'notes.pdf', 'size': size
+    })
+    assert response.status_code == 201, response.status_code
+    return response.json['session_id']
+
+
+def put_chunked(client, session_id, offset, data):
+    """A chunk sent with Transfer-Encoding: chunked, so without Content-Length"""
+    return client.put(
+        f'/lecturer/upload/sessions/{session_id}?offset={offset}',
+        input_stream=io.BytesIO(data),
+        headers={'Transfer-Encoding': 'chunked'},
+        environ_overrides={'wsgi.input_terminated': True}
+    )
+
+
+def test_chunks_complete_upload(app, lecturer):
+    session_id = create_session(lecturer, len(CONTENT))
+    offset = 0
+    while offset < len(CONTENT):
+        response = lecturer.put(f'/lecturer/upload/sessions/{session_id}?offset={offset}',
+                                data=CONTENT[offset:offset + 1000])
+        assert response.status_code == 200
+        offset = response.json['offset']
+
+    response = lecturer.post(f'/lecturer/upload/sessions/{session_id}/complete')
+    assert response.status_code == 200
+
+    with app.app_context():
+        note = Note.query.filter_by(course_code='CS101').one()
+        assert note.file_size == len(CONTENT)
+        assert note.blob_digest == hashlib.sha256(CONTENT).hexdigest()
+        with open(note.file_path, 'rb') as f:
+            assert f.read() == CONTENT
+
+
+def test_wrong_offset_returns_acknowledged_offset(lecturer):
+    session_id = create_session(lecturer, len(CONTENT))
+    lecturer.put(f'/lecturer/upload/sessions/{session_id}?offset=0', data=CONTENT[:1000])
+
+    # A retry of the chunk that was already acknowledged, and a skipped one
+    for offset in (0, 2000):
+        response = lecturer.put(f'/lecturer/upload/sessions/{session_id}?offset={offset}',
+                                data=CONTENT[offset:offset + 1000])
+        assert response.status_code == 409
+        assert response.json['offset'] == 1000
+    assert lecturer.get(f'/lecturer/upload/sessions/{session_id}').json['offset'] == 1000
+
+
+def test_complete_incomplete_session(app, lecturer):
+    session_id = create_session(lecturer, len(CONTENT))
+    lecturer.put(f'/lecturer/upload/sessions/{session_id}?offset=0', data=CONTENT[:1000])
+
+    response = lecturer.post(f'/lecturer/upload/sessions/{session_id}/complete')
+    assert response.status_code == 409
+    assert response.json['offset'] == 1000
+    with app.app_context():
+        assert Note.query.count() == 0
+    # The session is kept, so the upload can still be resumed
+    assert lecturer.get(f'/lecturer/upload/sessions/{session_id}').json['offset'] == 1000
+
+
+def test_chunk_past_declared_size_is_rejected(lecturer):
+    session_id = create_session(lecturer, len(CONTENT))
+    assert put_chunked(lecturer, session_id, 0, CONTENT[:1000]).json['offset'] == 1000
+
+    response = put_chunked(lecturer, session_id, 1000, CONTENT[1000:] + b'overflow')
+    assert response.status_code == 413
+    assert response.json['offset'] == 1000
+    assert lecturer.get(f'/lecturer/upload/sessions/{session_id}').json['offset'] == 1000
+
+    # The client can still finish from the acknowledged offset
+    response = put_chunked(lecturer, session_id, 1000, CONTENT[1000:])
+    assert response.json['offset'] == len(CONTENT)
+    response = lecturer.post(f'/lecturer/upload/sessions/{session_id}/complete')
+    assert response.status_code == 200